@@ -10,6 +10,10 @@ def create_app(config_class=Config):
     app = Flask(__name__)
     app.config.from_object(config_class)
 
+    # Serialize JSON responses with orjson when it is installed
+    from app.views.encoding import FastJSONProvider
+    app.json = FastJSONProvider(app)
+
     # Initialize extensions
     from flask_wtf.csrf import CSRFProtect
     csrf = CSRFProtect()
@@ -22,6 +26,32 @@ def create_app(config_class=Config):
     app.register_blueprint(main_bp)
     app.register_blueprint(dashboard_bp)
 
+    # Keep running analytics and rollups up to date with fetched sleep records
+    from app.api.client import register_record_listener
+    if app.config['SLEEP_ANALYTICS_INCREMENTAL']:
+        from app.analytics.incremental import RECORD_FIELDS as ANALYTICS_FIELDS, get_analytics_store
+        register_record_listener(get_analytics_store(app.config).ingest, fields=ANALYTICS_FIELDS)
+    if app.config['SLEEP_ROLLUPS_ENABLED']:
+        from app.storage.rollups import RECORD_FIELDS, get_rollup_store
+        register_record_listener(get_rollup_store(app.config).ingest, fields=RECORD_FIELDS)
+
+    # Drop derived data of a user along with their cached responses: rendered fragments,
+    # record tables, record metrics, rollups, running analytics and stored time series
+    from app.analytics.metrics_cache import get_metrics_cache
+    from app.api.client import register_invalidation_listener
+    from app.storage.record_tables import get_record_table_store
+    from app.views.fragments import get_fragment_cache
+    register_invalidation_listener(get_fragment_cache(app.config).invalidate_user)
+    register_invalidation_listener(get_record_table_store(app.config).invalidate_user)
+    register_invalidation_listener(get_metrics_cache(app.config).invalidate_user)
+    if app.config['SLEEP_ROLLUPS_ENABLED']:
+        register_invalidation_listener(get_rollup_store(app.config).invalidate_user)
+    if app.config['SLEEP_ANALYTICS_INCREMENTAL']:
+        register_invalidation_listener(get_analytics_store(app.config).invalidate_user)
+    if app.config['SLEEP_TIME_SERIES_CACHE_ENABLED']:
+        from app.storage.timeseries import get_time_series_store
+        register_invalidation_listener(get_time_series_store(app.config).invalidate_user)
+
     # Create a route to test the app
     @app.route('/test')
     def test_page():
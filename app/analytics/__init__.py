@@ -0,0 +1,15 @@
+"""
+Analytics module for the Sleep Data Visualization application.
+"""
+from app.analytics.architecture import batch_sleep_architecture, sleep_architecture, summarize_architecture
+from app.analytics.downsample import downsample, time_series_chart_data
+from app.analytics.engine import compute_sleep_analytics
+from app.analytics.incremental import IncrementalAnalyticsStore, get_analytics_store
+from app.analytics.rolling import batch_night_features, rolling_statistics
+
+__all__ = [
+    'batch_sleep_architecture', 'sleep_architecture', 'summarize_architecture',
+    'compute_sleep_analytics', 'downsample', 'time_series_chart_data',
+    'IncrementalAnalyticsStore', 'get_analytics_store',
+    'batch_night_features', 'rolling_statistics'
+]
@@ -0,0 +1,213 @@
+"""
+Sleep architecture metrics from the stage column of nightly time series.
+
+All nights passed to batch_sleep_architecture are concatenated and processed
+with array operations at once, so a year of nights costs about as much as a
+few large NumPy passes rather than one Python loop per sample.
+"""
+from typing import Any, Dict, List, Mapping, Optional, Sequence
+
+import numpy as np
+
+from app.analytics.metrics_cache import cached_record_metrics
+from app.models.sleep_data import SLEEP_STAGES, SleepRecord, SleepTimeSeries
+
+REM = SLEEP_STAGES.index('rem')
+
+# Stage codes counted as sleep; awake, unknown and unrecognized stages are not
+ASLEEP = [SLEEP_STAGES.index(stage) for stage in ('light', 'deep', 'rem')]
+
+# REM periods closer together than this belong to the same sleep cycle
+REM_MERGE_GAP_MINUTES = 15
+
+
+def _segment_ids(lengths: np.ndarray) -> np.ndarray:
+    """Get, for every concatenated sample, the index of the segment it belongs to."""
+    return np.repeat(np.arange(len(lengths)), lengths)
+
+
+def _runs(values: np.ndarray, segments: np.ndarray) -> np.ndarray:
+    """Get the start indices of runs of equal values, breaking runs at segment borders."""
+    starts = np.ones(len(values), dtype=bool)
+    starts[1:] = (values[1:] != values[:-1]) | (segments[1:] != segments[:-1])
+    return np.flatnonzero(starts)
+
+
+def batch_sleep_architecture(series: Sequence[SleepTimeSeries]) -> List[Optional[Dict[str, Any]]]:
+    """
+    Compute sleep architecture metrics for many nights in one pass.
+
+    Each sample lasts until the next one; the last sample of a night lasts
+    the night's average sampling interval.
+
+    Args:
+        series: Time series of the nights
+
+    Returns:
+        For each night, in order, a dictionary with time in bed, total sleep
+        time, sleep efficiency, sleep latency, wake after sleep onset (WASO),
+        awakenings, stage transitions, REM cycle count, cycle durations and a
+        run-length-encoded hypnogram; None for nights without samples
+    """
+    results: List[Optional[Dict[str, Any]]] = [None] * len(series)
+    nights = [index for index, night in enumerate(series) if len(night)]
+    if not nights:
+        return results
+
+    lengths = np.array([len(series[index]) for index in nights])
+    offsets = np.concatenate([[0], np.cumsum(lengths)])
+    firsts = offsets[:-1]
+    night_of = _segment_ids(lengths)
+
+    codes = np.concatenate([np.asarray(series[index].stage_codes, dtype=np.int16) for index in nights])
+    timestamps = np.concatenate([
+        np.asarray(series[index].timestamps, dtype='datetime64[us]') for index in nights
+    ]).astype(np.int64)
+
+    # Minutes since the start of the night, and the duration of every sample
+    minutes = (timestamps - timestamps[firsts][night_of]) / 60e6
+    span = minutes[offsets[1:] - 1]
+    sample_minutes = np.empty(len(minutes))
+    sample_minutes[:-1] = np.diff(minutes)
+    sample_minutes[offsets[1:] - 1] = np.where(lengths > 1, span / np.maximum(lengths - 1, 1), 0.0)
+
+    asleep = np.isin(codes, ASLEEP)
+    time_in_bed = np.add.reduceat(sample_minutes, firsts)
+    total_sleep = np.add.reduceat(sample_minutes * asleep, firsts)
+
+    # Sleep/wake runs: onset, final awakening, WASO and awakenings
+    wake_starts = _runs(asleep, night_of)
+    wake_night = night_of[wake_starts]
+    wake_asleep = asleep[wake_starts]
+    wake_minutes = np.add.reduceat(sample_minutes, wake_starts)
+    wake_offsets = np.searchsorted(wake_night, np.arange(len(nights)))
+
+    run_index = np.arange(len(wake_starts))
+    first_sleep = np.minimum.reduceat(np.where(wake_asleep, run_index, len(run_index)), wake_offsets)
+    last_sleep = np.maximum.reduceat(np.where(wake_asleep, run_index, -1), wake_offsets)
+    slept = first_sleep < len(run_index)
+
+    latency = np.where(slept, minutes[wake_starts[np.minimum(first_sleep, len(run_index) - 1)]], np.nan)
+    interrupted = (~wake_asleep) & (run_index > first_sleep[wake_night]) & (run_index < last_sleep[wake_night])
+    waso = np.bincount(wake_night, weights=wake_minutes * interrupted, minlength=len(nights))
+    awakenings = np.bincount(wake_night, weights=interrupted, minlength=len(nights)).astype(int)
+
+    # Stage runs: hypnogram and transitions
+    stage_starts = _runs(codes, night_of)
+    stage_night = night_of[stage_starts]
+    stage_codes = codes[stage_starts]
+    stage_minutes = np.add.reduceat(sample_minutes, stage_starts)
+    stage_begin = minutes[stage_starts]
+    stage_offsets = np.concatenate([np.searchsorted(stage_night, np.arange(len(nights))), [len(stage_starts)]])
+    transitions = np.diff(stage_offsets) - 1
+
+    # REM periods, merging REM runs separated by short gaps; each ends a cycle
+    rem = np.flatnonzero(stage_codes == REM)
+    rem_night, rem_begin = stage_night[rem], stage_begin[rem]
+    rem_end = rem_begin + stage_minutes[rem]
+    new_period = np.ones(len(rem), dtype=bool)
+    new_period[1:] = (rem_night[1:] != rem_night[:-1]) | (rem_begin[1:] - rem_end[:-1] >= REM_MERGE_GAP_MINUTES)
+    period_night = rem_night[new_period]
+    period_end = np.maximum.reduceat(rem_end, np.flatnonzero(new_period)) if len(rem) else rem_end
+
+    cycle_start = np.empty(len(period_end))
+    cycle_start[1:] = period_end[:-1]
+    first_cycle = np.ones(len(period_end), dtype=bool)
+    first_cycle[1:] = period_night[1:] != period_night[:-1]
+    onset = np.nan_to_num(latency)
+    cycle_start[first_cycle] = onset[period_night[first_cycle]]
+    cycle_minutes = period_end - cycle_start
+    cycle_offsets = np.searchsorted(period_night, np.arange(len(nights) + 1))
+
+    for position, index in enumerate(nights):
+        labels = series[index].stage_labels
+        first, last = stage_offsets[position], stage_offsets[position + 1]
+        results[index] = {
+            'time_in_bed_minutes': round(float(time_in_bed[position]), 1),
+            'total_sleep_minutes': round(float(total_sleep[position]), 1),
+            'sleep_efficiency': (
+                round(float(total_sleep[position] * 100 / time_in_bed[position]), 1)
+                if time_in_bed[position] > 0 else None
+            ),
+            'sleep_latency_minutes': round(float(latency[position]), 1) if slept[position] else None,
+            'waso_minutes': round(float(waso[position]), 1),
+            'awakenings': int(awakenings[position]),
+            'stage_transitions': int(transitions[position]),
+            'rem_cycles': int(cycle_offsets[position + 1] - cycle_offsets[position]),
+            'cycle_minutes': [
+                round(float(value), 1)
+                for value in cycle_minutes[cycle_offsets[position]:cycle_offsets[position + 1]]
+            ],
+            'hypnogram': {
+                'start': np.datetime_as_string(
+                    timestamps[stage_starts[first:last]].astype('datetime64[us]'), unit='s'
+                ).tolist(),
+                'minutes': np.round(stage_minutes[first:last], 1).tolist(),
+                'stage': [labels[code] if 0 <= code < len(labels) else None for code in stage_codes[first:last]]
+            }
+        }
+
+    return results
+
+
+def sleep_architecture(series: SleepTimeSeries) -> Optional[Dict[str, Any]]:
+    """
+    Compute sleep architecture metrics for one night.
+
+    Args:
+        series: Time series of the night
+
+    Returns:
+        Metrics as described in batch_sleep_architecture, or None without samples
+    """
+    return batch_sleep_architecture([series])[0]
+
+
+def summarize_architecture(results: Sequence[Optional[Dict[str, Any]]]) -> Optional[Dict[str, Any]]:
+    """
+    Average sleep architecture metrics over many nights.
+
+    Args:
+        results: Per-night metrics, None for nights without samples
+
+    Returns:
+        Dictionary with the number of nights and the average of every scalar
+        metric, or None if no night has samples
+    """
+    results = [result for result in results if result]
+    if not results:
+        return None
+
+    summary: Dict[str, Any] = {'nights': len(results)}
+    for key in (
+        'time_in_bed_minutes', 'total_sleep_minutes', 'sleep_efficiency', 'sleep_latency_minutes',
+        'waso_minutes', 'awakenings', 'stage_transitions', 'rem_cycles'
+    ):
+        values = [result[key] for result in results if result[key] is not None]
+        summary[key] = round(sum(values) / len(values), 1) if values else None
+
+    cycles = [value for result in results for value in result['cycle_minutes']]
+    summary['cycle_minutes'] = round(sum(cycles) / len(cycles), 1) if cycles else None
+
+    return summary
+
+
+def records_architecture(
+    config: Mapping[str, Any],
+    user_id: str,
+    records: Sequence[SleepRecord]
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Get sleep architecture metrics for records, computing uncached ones in one batch.
+
+    Args:
+        config: Flask application config
+        user_id: User identifier
+        records: Sleep records, with their time series
+
+    Returns:
+        Metrics by record id; {} for records without time series samples
+    """
+    return cached_record_metrics(
+        config, 'sleep_architecture', user_id, records, batch_sleep_architecture
+    )
@@ -0,0 +1,195 @@
+"""
+Downsampling of sleep time series for charting.
+
+Nights sampled every few seconds have far more points than a chart has
+pixels. These functions pick a representative subset of sample indices so
+payload size and render time depend on the requested point budget only.
+"""
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+from app.models.sleep_data import SleepTimeSeries
+
+DOWNSAMPLING_METHODS = ('lttb', 'minmax')
+
+# Numeric series charted from a time series
+CHART_SERIES = ('heart_rate', 'movement', 'respiration_rate')
+
+
+def lttb(x: np.ndarray, y: np.ndarray, max_points: int) -> np.ndarray:
+    """
+    Select points with Largest-Triangle-Three-Buckets.
+
+    The first and last points are kept; every bucket in between contributes
+    the point forming the largest triangle with the previously selected
+    point and the average of the next bucket.
+
+    Args:
+        x: Ascending x values
+        y: Y values without NaN
+        max_points: Maximum number of points to select
+
+    Returns:
+        Ascending indices of the selected points
+    """
+    n = len(x)
+    if n <= max_points:
+        return np.arange(n)
+    if max_points < 3:
+        return np.array([0, n - 1][:max_points], dtype=np.int64)
+
+    x = x.astype(np.float64)
+    y = y.astype(np.float64)
+
+    # Bucket i spans edges[i]:edges[i + 1]; the last point is excluded
+    edges = np.linspace(1, n - 1, max_points - 1).astype(np.int64)
+    counts = np.diff(edges)
+    average_x = np.add.reduceat(x[:n - 1], edges[:-1]) / counts
+    average_y = np.add.reduceat(y[:n - 1], edges[:-1]) / counts
+    next_x = np.append(average_x[1:], x[-1])
+    next_y = np.append(average_y[1:], y[-1])
+
+    selected = np.empty(max_points, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    anchor_x, anchor_y = x[0], y[0]
+
+    for bucket in range(max_points - 2):
+        first, last = edges[bucket], edges[bucket + 1]
+        area = np.abs(
+            (anchor_x - next_x[bucket]) * (y[first:last] - anchor_y)
+            - (anchor_x - x[first:last]) * (next_y[bucket] - anchor_y)
+        )
+        index = first + int(area.argmax())
+        selected[bucket + 1] = index
+        anchor_x, anchor_y = x[index], y[index]
+
+    return selected
+
+
+def minmax(y: np.ndarray, max_points: int) -> np.ndarray:
+    """
+    Select the minimum and maximum of equally sized buckets.
+
+    Args:
+        y: Y values without NaN
+        max_points: Maximum number of points to select
+
+    Returns:
+        Ascending indices of the selected points
+    """
+    n = len(y)
+    if n <= max_points:
+        return np.arange(n)
+
+    size = -(-n // max(1, max_points // 2))
+    buckets = -(-n // size)
+    padded = np.full(buckets * size, np.nan)
+    padded[:n] = y
+    padded = padded.reshape(buckets, size)
+
+    offsets = np.arange(buckets) * size
+    indices = np.concatenate([
+        offsets + np.nanargmin(padded, axis=1),
+        offsets + np.nanargmax(padded, axis=1)
+    ])
+    return np.unique(indices)
+
+
+def change_points(codes: np.ndarray, max_points: int) -> np.ndarray:
+    """
+    Select the samples where a categorical series changes value.
+
+    Args:
+        codes: Category codes
+        max_points: Maximum number of points to select
+
+    Returns:
+        Ascending indices of the first sample, every change and the last sample
+    """
+    n = len(codes)
+    if n == 0:
+        return np.arange(0)
+
+    indices = np.unique(np.concatenate([[0], np.flatnonzero(np.diff(codes)) + 1, [n - 1]]))
+    if len(indices) > max_points:
+        indices = indices[np.linspace(0, len(indices) - 1, max_points).astype(np.int64)]
+
+    return indices
+
+
+def downsample(x: np.ndarray, y: np.ndarray, max_points: int, method: str = 'lttb') -> np.ndarray:
+    """
+    Select at most max_points samples of a series, skipping missing values.
+
+    Args:
+        x: Ascending x values
+        y: Y values, NaN where missing
+        max_points: Maximum number of points to select
+        method: 'lttb' or 'minmax'
+
+    Returns:
+        Ascending indices into x and y
+    """
+    valid = np.flatnonzero(~np.isnan(y))
+
+    if method == 'minmax':
+        return valid[minmax(y[valid], max_points)]
+    return valid[lttb(x[valid], y[valid], max_points)]
+
+
+def _timestamps(values: np.ndarray) -> list:
+    """Format datetime64 values as ISO strings."""
+    return np.datetime_as_string(values, unit='s').tolist()
+
+
+def time_series_chart_data(
+    series: SleepTimeSeries,
+    max_points: int,
+    method: str = 'lttb',
+    extra: Optional[Dict[str, np.ndarray]] = None
+) -> Dict[str, Any]:
+    """
+    Build the chart payload of a time series, downsampled per series.
+
+    Args:
+        series: Time series, typically already cut to the viewport
+        max_points: Maximum number of points per series
+        method: 'lttb' or 'minmax' for numeric series; stages always keep
+            their change points
+        extra: Optional additional numeric series aligned with the time
+            series (e.g. rolling statistics), downsampled the same way
+
+    Returns:
+        Dictionary with the covered range, the number of samples, and x/y
+        arrays per series
+    """
+    timestamps = series.timestamps
+    x = timestamps.astype('datetime64[us]').astype(np.int64)
+
+    data: Dict[str, Any] = {
+        'start': _timestamps(timestamps[:1])[0] if len(series) else None,
+        'end': _timestamps(timestamps[-1:])[0] if len(series) else None,
+        'total_points': len(series),
+        'method': method,
+        'stage_labels': list(series.stage_labels),
+        'series': {}
+    }
+
+    numeric = {name: getattr(series, name) for name in CHART_SERIES}
+    numeric.update(extra or {})
+
+    for name, values in numeric.items():
+        indices = downsample(x, values, max_points, method)
+        data['series'][name] = {
+            'x': _timestamps(timestamps[indices]),
+            'y': np.round(values[indices].astype(np.float64), 2).tolist()
+        }
+
+    indices = change_points(series.stage_codes, max_points)
+    data['series']['stage'] = {
+        'x': _timestamps(timestamps[indices]),
+        'y': series.stage_codes[indices].tolist()
+    }
+
+    return data
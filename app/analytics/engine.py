@@ -0,0 +1,253 @@
+"""
+Local sleep analytics computed from fetched sleep records.
+
+Produces the same structure as the Sleep API's /sleep/analytics endpoint so
+that SleepAnalytics can be built without a second upstream call.
+"""
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from app.models.sleep_batch import SleepRecordBatch
+
+# Minutes of standard deviation at which consistency scores reach zero
+SCORE_ZERO_STD_MINUTES = 120
+
+# Trends weaker than this correlation are reported as stable
+MIN_TREND_STRENGTH = 0.3
+
+
+def _mean(values: np.ndarray) -> Optional[float]:
+    """Get the mean of the non-NaN values, or None if there are none."""
+    values = values[~np.isnan(values)]
+    return float(values.mean()) if len(values) else None
+
+
+def _std(values: np.ndarray) -> Optional[float]:
+    """Get the standard deviation of the non-NaN values, or None if fewer than two."""
+    values = values[~np.isnan(values)]
+    return float(values.std()) if len(values) >= 2 else None
+
+
+def linear_trend(days: np.ndarray, values: np.ndarray) -> Optional[Dict[str, float]]:
+    """
+    Fit a least-squares line through a series.
+
+    Args:
+        days: Day offsets of the samples
+        values: Sample values, NaN where missing
+
+    Returns:
+        Dictionary with slope per day and strength (absolute correlation),
+        or None if there are fewer than two usable samples
+    """
+    valid = ~np.isnan(values)
+    x, y = days[valid], values[valid]
+    if len(x) < 2:
+        return None
+
+    dx, dy = x - x.mean(), y - y.mean()
+    sxx, syy = (dx * dx).sum(), (dy * dy).sum()
+    if sxx == 0:
+        return None
+
+    slope = (dx * dy).sum() / sxx
+    strength = abs((dx * dy).sum()) / np.sqrt(sxx * syy) if syy > 0 else 0.0
+
+    return {'slope': float(slope), 'strength': float(strength)}
+
+
+def bedtime_minutes(sleep_start: np.ndarray) -> np.ndarray:
+    """
+    Get bedtimes as minutes after noon, so late-evening and after-midnight
+    bedtimes stay close together.
+
+    Args:
+        sleep_start: Sleep start timestamps (datetime64)
+
+    Returns:
+        Minutes after noon, NaN where the start time is missing
+    """
+    minutes = (sleep_start - sleep_start.astype('datetime64[D]')).astype('timedelta64[m]')
+    minutes = minutes.astype(np.float64)
+    minutes[np.isnat(sleep_start)] = np.nan
+    return (minutes - 720) % 1440
+
+
+def consistency_rating(score: float) -> str:
+    """Map a 0-100 consistency score to a rating."""
+    if score >= 85:
+        return 'excellent'
+    if score >= 70:
+        return 'good'
+    if score >= 50:
+        return 'fair'
+    return 'poor'
+
+
+def consistency_score(std_minutes: float) -> Dict[str, Any]:
+    """
+    Score how consistent a series is from its standard deviation.
+
+    Args:
+        std_minutes: Standard deviation in minutes
+
+    Returns:
+        Dictionary with score, rating and the standard deviation
+    """
+    score = round(max(0.0, 100 - std_minutes * 100 / SCORE_ZERO_STD_MINUTES))
+    return {
+        'score': score,
+        'rating': consistency_rating(score),
+        'std_minutes': round(std_minutes, 1)
+    }
+
+
+def _trend(metric: str, trend: Optional[Dict[str, float]], up: str, down: str) -> Optional[Dict[str, Any]]:
+    """Describe a fitted trend in the Sleep API's trend format."""
+    if trend is None:
+        return None
+
+    if trend['strength'] < MIN_TREND_STRENGTH or trend['slope'] == 0:
+        direction = 'stable'
+    else:
+        direction = up if trend['slope'] > 0 else down
+
+    return {
+        'metric': metric,
+        'direction': direction,
+        'strength': round(trend['strength'], 2),
+        'average_change_per_day': trend['slope']
+    }
+
+
+def _recommendations(stats: Dict[str, Any], trends: Dict[str, Any]) -> List[str]:
+    """Derive simple recommendations from the computed stats and trends."""
+    recommendations = []
+
+    duration = stats['average_duration_minutes']
+    if duration is not None and duration < 7 * 60:
+        recommendations.append(
+            'You are averaging less than 7 hours of sleep. Try going to bed earlier.'
+        )
+    elif duration is not None and duration > 9 * 60:
+        recommendations.append(
+            'You are averaging more than 9 hours of sleep. Consider a more regular wake-up time.'
+        )
+
+    consistency = trends.get('schedule_consistency')
+    if consistency and consistency['rating'] in ('fair', 'poor'):
+        recommendations.append(
+            'Your bedtime varies a lot. A consistent sleep schedule can improve sleep quality.'
+        )
+
+    deep = stats['average_deep_sleep_minutes']
+    if deep is not None and duration and deep / duration < 0.13:
+        recommendations.append(
+            'Your deep sleep share is low. Avoid caffeine and alcohol in the evening.'
+        )
+
+    quality_trend = trends.get('quality_trend')
+    if quality_trend and quality_trend['direction'] == 'declining':
+        recommendations.append(
+            'Your sleep quality is declining. Review recent changes to your routine.'
+        )
+
+    return recommendations
+
+
+def analytics_response(
+    user_id: str,
+    start_date: datetime,
+    end_date: datetime,
+    stats: Dict[str, Any],
+    duration_trend: Optional[Dict[str, float]],
+    quality_trend: Optional[Dict[str, float]],
+    bedtime_std: Optional[float],
+    duration_std: Optional[float]
+) -> Dict[str, Any]:
+    """
+    Assemble an analytics response from computed statistics.
+
+    Args:
+        user_id: User identifier
+        start_date: Start of the analysis window
+        end_date: End of the analysis window
+        stats: Averages and record count, keyed as in the Sleep API stats
+        duration_trend: Fitted trend of duration in hours, or None
+        quality_trend: Fitted trend of sleep quality, or None
+        bedtime_std: Standard deviation of bedtimes in minutes, or None
+        duration_std: Standard deviation of durations in minutes, or None
+
+    Returns:
+        Dictionary in the format of the Sleep API analytics response
+    """
+    stats = dict(stats, date_range_days=(end_date.date() - start_date.date()).days)
+
+    trends: Dict[str, Any] = {}
+
+    duration = _trend('duration', duration_trend, 'increasing', 'decreasing')
+    if duration:
+        trends['duration_trend'] = duration
+
+    quality = _trend('quality', quality_trend, 'improving', 'declining')
+    if quality:
+        trends['quality_trend'] = quality
+
+    if bedtime_std is not None:
+        trends['schedule_consistency'] = consistency_score(bedtime_std)
+
+    if duration_std is not None:
+        trends['duration_variability'] = consistency_score(duration_std)
+
+    return {
+        'user_id': user_id,
+        'start_date': start_date.isoformat(),
+        'end_date': end_date.isoformat(),
+        'stats': stats,
+        'trends': trends,
+        'recommendations': _recommendations(stats, trends)
+    }
+
+
+def compute_sleep_analytics(
+    batch: SleepRecordBatch,
+    user_id: str,
+    start_date: datetime,
+    end_date: datetime
+) -> Dict[str, Any]:
+    """
+    Compute sleep analytics for a set of records.
+
+    Args:
+        batch: Sleep records of the analysis window
+        user_id: User identifier
+        start_date: Start of the analysis window
+        end_date: End of the analysis window
+
+    Returns:
+        Dictionary in the format of the Sleep API analytics response
+    """
+    stats = {
+        'average_duration_minutes': _mean(batch.duration_minutes),
+        'average_sleep_quality': _mean(batch.sleep_quality),
+        'average_deep_sleep_minutes': _mean(batch.deep_sleep_minutes),
+        'average_rem_sleep_minutes': _mean(batch.rem_sleep_minutes),
+        'average_light_sleep_minutes': _mean(batch.light_sleep_minutes),
+        'total_records': len(batch)
+    }
+
+    duration_trend = quality_trend = None
+    if len(batch):
+        days = (batch.dates - batch.dates.min()).astype(np.float64)
+        duration_trend = linear_trend(days, batch.duration_minutes / 60)
+        quality_trend = linear_trend(days, batch.sleep_quality)
+
+    return analytics_response(
+        user_id, start_date, end_date, stats,
+        duration_trend=duration_trend,
+        quality_trend=quality_trend,
+        bedtime_std=_std(bedtime_minutes(batch.sleep_start)),
+        duration_std=_std(batch.duration_minutes)
+    )
@@ -0,0 +1,449 @@
+"""
+Incremental per-user sleep analytics.
+
+Running aggregates are kept for a fixed set of trailing windows (7, 30, 365
+days, ...). Records are folded in as the API client fetches them and
+retracted when they change, disappear upstream or age out of a window, so
+analytics for a standard window are answered without revisiting records.
+"""
+import math
+import threading
+from collections import OrderedDict
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Dict, List, Mapping, NamedTuple, Optional, Sequence, Tuple
+
+from app.analytics.engine import analytics_response
+from app.api.ranges import DateRange, merge_ranges, record_day
+
+# Day numbers used as regression x values are counted from this date
+_ORIGIN = date(2000, 1, 1).toordinal()
+
+
+class RecordValues(NamedTuple):
+    """The values of a sleep record that analytics are computed from."""
+
+    day: date
+    duration_minutes: Optional[float]
+    sleep_quality: Optional[float]
+    deep_sleep_minutes: Optional[float]
+    rem_sleep_minutes: Optional[float]
+    light_sleep_minutes: Optional[float]
+    bedtime: Optional[float]
+
+
+def _number(value: Any) -> Optional[float]:
+    """Convert a value to float, keeping None."""
+    return None if value is None else float(value)
+
+
+def _bedtime(value: Any) -> Optional[float]:
+    """Get a sleep start time as minutes after noon, in UTC if timezone-aware."""
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc)
+    return (value.hour * 60 + value.minute - 720) % 1440
+
+
+# Record fields the analytics values are extracted from
+RECORD_FIELDS = ('record_id', 'date', 'duration_minutes', 'sleep_quality', 'sleep_phases', 'sleep_start')
+
+
+def record_values(record: Dict[str, Any]) -> Optional[RecordValues]:
+    """
+    Extract the analytics values of a sleep record.
+
+    Args:
+        record: Sleep record dictionary
+
+    Returns:
+        The record's values, or None if it has no valid date
+    """
+    try:
+        day = date.fromisoformat(record_day(record))
+    except ValueError:
+        return None
+
+    phases = record.get('sleep_phases') or {}
+    return RecordValues(
+        day=day,
+        duration_minutes=_number(record.get('duration_minutes')),
+        sleep_quality=_number(record.get('sleep_quality')),
+        deep_sleep_minutes=_number(phases.get('deep_sleep_minutes')),
+        rem_sleep_minutes=_number(phases.get('rem_sleep_minutes')),
+        light_sleep_minutes=_number(phases.get('light_sleep_minutes')),
+        bedtime=_bedtime(record.get('sleep_start'))
+    )
+
+
+class RunningStats:
+    """Mean and variance of a series supporting removal (Welford's algorithm)."""
+
+    __slots__ = ('count', 'mean', 'm2')
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+
+    def add(self, value: Optional[float]) -> None:
+        """Fold a value in; None is ignored."""
+        if value is None:
+            return
+
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+
+    def remove(self, value: Optional[float]) -> None:
+        """Retract a previously added value; None is ignored."""
+        if value is None:
+            return
+
+        if self.count <= 1:
+            self.__init__()
+            return
+
+        delta = value - self.mean
+        self.count -= 1
+        self.mean -= delta / self.count
+        self.m2 = max(0.0, self.m2 - delta * (value - self.mean))
+
+    @property
+    def average(self) -> Optional[float]:
+        """Get the mean, or None without values."""
+        return self.mean if self.count else None
+
+    @property
+    def std(self) -> Optional[float]:
+        """Get the population standard deviation, or None with fewer than two values."""
+        return math.sqrt(self.m2 / self.count) if self.count >= 2 else None
+
+
+class RunningRegression:
+    """Least-squares line fit over running sums, supporting removal."""
+
+    __slots__ = ('n', 'sx', 'sy', 'sxx', 'sxy', 'syy')
+
+    def __init__(self):
+        self.n = 0
+        self.sx = self.sy = self.sxx = self.sxy = self.syy = 0.0
+
+    def add(self, x: float, y: Optional[float]) -> None:
+        """Fold a sample in; samples without y are ignored."""
+        if y is None:
+            return
+
+        self.n += 1
+        self.sx += x
+        self.sy += y
+        self.sxx += x * x
+        self.sxy += x * y
+        self.syy += y * y
+
+    def remove(self, x: float, y: Optional[float]) -> None:
+        """Retract a previously added sample; samples without y are ignored."""
+        if y is None:
+            return
+
+        self.n -= 1
+        self.sx -= x
+        self.sy -= y
+        self.sxx -= x * x
+        self.sxy -= x * y
+        self.syy -= y * y
+
+    def trend(self) -> Optional[Dict[str, float]]:
+        """
+        Get the fitted trend.
+
+        Returns:
+            Dictionary with slope per x unit and strength (absolute
+            correlation), or None if the fit is undefined
+        """
+        if self.n < 2:
+            return None
+
+        sxx = self.sxx - self.sx * self.sx / self.n
+        sxy = self.sxy - self.sx * self.sy / self.n
+        syy = self.syy - self.sy * self.sy / self.n
+        if sxx <= 0:
+            return None
+
+        strength = min(1.0, abs(sxy) / math.sqrt(sxx * syy)) if syy > 0 else 0.0
+        return {'slope': sxy / sxx, 'strength': strength}
+
+
+class WindowAggregates:
+    """Running aggregates over the records of one trailing window."""
+
+    __slots__ = (
+        'count', 'duration', 'quality', 'deep_sleep', 'rem_sleep', 'light_sleep',
+        'bedtime', 'duration_trend', 'quality_trend'
+    )
+
+    def __init__(self):
+        self.count = 0
+        self.duration = RunningStats()
+        self.quality = RunningStats()
+        self.deep_sleep = RunningStats()
+        self.rem_sleep = RunningStats()
+        self.light_sleep = RunningStats()
+        self.bedtime = RunningStats()
+        self.duration_trend = RunningRegression()
+        self.quality_trend = RunningRegression()
+
+    def add(self, values: RecordValues) -> None:
+        """Fold a record in."""
+        x = values.day.toordinal() - _ORIGIN
+        hours = values.duration_minutes / 60 if values.duration_minutes is not None else None
+
+        self.count += 1
+        self.duration.add(values.duration_minutes)
+        self.quality.add(values.sleep_quality)
+        self.deep_sleep.add(values.deep_sleep_minutes)
+        self.rem_sleep.add(values.rem_sleep_minutes)
+        self.light_sleep.add(values.light_sleep_minutes)
+        self.bedtime.add(values.bedtime)
+        self.duration_trend.add(x, hours)
+        self.quality_trend.add(x, values.sleep_quality)
+
+    def remove(self, values: RecordValues) -> None:
+        """Retract a previously added record."""
+        x = values.day.toordinal() - _ORIGIN
+        hours = values.duration_minutes / 60 if values.duration_minutes is not None else None
+
+        self.count -= 1
+        self.duration.remove(values.duration_minutes)
+        self.quality.remove(values.sleep_quality)
+        self.deep_sleep.remove(values.deep_sleep_minutes)
+        self.rem_sleep.remove(values.rem_sleep_minutes)
+        self.light_sleep.remove(values.light_sleep_minutes)
+        self.bedtime.remove(values.bedtime)
+        self.duration_trend.remove(x, hours)
+        self.quality_trend.remove(x, values.sleep_quality)
+
+
+class _UserState:
+    """Known records, fetched coverage and window aggregates of one user."""
+
+    __slots__ = ('records', 'by_day', 'coverage', 'anchor', 'windows')
+
+    def __init__(self, windows: Sequence[int]):
+        self.records: Dict[str, RecordValues] = {}
+        self.by_day: Dict[date, Dict[str, RecordValues]] = {}
+        self.coverage: List[DateRange] = []
+        self.anchor: Optional[date] = None
+        self.windows = {days: WindowAggregates() for days in windows}
+
+    def covers(self, first: date, last: date) -> bool:
+        """Check whether a date range was completely fetched."""
+        return any(start <= first and last <= end for start, end in self.coverage)
+
+
+class IncrementalAnalyticsStore:
+    """Thread-safe store of per-user running analytics for standard windows."""
+
+    def __init__(self, windows: Sequence[int], max_users: int):
+        """
+        Initialize the store.
+
+        Args:
+            windows: Window lengths in days to keep aggregates for
+            max_users: Maximum number of users to keep state for
+        """
+        self.windows = tuple(windows)
+        self.max_users = max_users
+
+        self._users: 'OrderedDict[str, _UserState]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def ingest(
+        self,
+        user_id: str,
+        records: List[Dict[str, Any]],
+        covered: Optional[DateRange] = None
+    ) -> None:
+        """
+        Fold fetched records into a user's analytics state.
+
+        Args:
+            user_id: User identifier
+            records: Sleep records returned by the Sleep API, with at least RECORD_FIELDS
+            covered: Date range the records completely cover; known records
+                in it that are missing from ``records`` are retracted
+        """
+        with self._lock:
+            state = self._users.get(user_id)
+            if state is None:
+                state = self._users[user_id] = _UserState(self.windows)
+                while len(self._users) > self.max_users:
+                    self._users.popitem(last=False)
+            self._users.move_to_end(user_id)
+
+            seen = set()
+            for record in records:
+                record_id = record.get('record_id')
+                values = record_values(record)
+                if record_id is None or values is None:
+                    continue
+
+                seen.add(record_id)
+                previous = state.records.get(record_id)
+                if previous == values:
+                    continue
+                if previous is not None:
+                    self._retract(state, record_id, previous)
+                self._fold(state, record_id, values)
+
+            if covered is not None:
+                day, last = covered
+                while day <= last:
+                    for record_id, values in list(state.by_day.get(day, {}).items()):
+                        if record_id not in seen:
+                            self._retract(state, record_id, values)
+                    day += timedelta(days=1)
+
+                state.coverage = merge_ranges(state.coverage + [covered])
+
+    def invalidate_user(self, user_id: str) -> None:
+        """
+        Drop the analytics state of a user, e.g. after their records changed upstream.
+
+        Args:
+            user_id: User identifier
+        """
+        with self._lock:
+            self._users.pop(user_id, None)
+
+    def get_analytics(
+        self,
+        user_id: str,
+        start_date: datetime,
+        end_date: datetime
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Get analytics for a standard window from the running aggregates.
+
+        Args:
+            user_id: User identifier
+            start_date: Start of the window
+            end_date: End of the window
+
+        Returns:
+            Dictionary in the format of the Sleep API analytics response, or
+            None if the window is not a standard one or was not fully fetched
+        """
+        first, today = start_date.date(), end_date.date()
+        days = (today - first).days
+
+        with self._lock:
+            state = self._users.get(user_id)
+            if state is None or days not in state.windows or not state.covers(first, today):
+                return None
+
+            self._users.move_to_end(user_id)
+            self._advance(state, today)
+            window = state.windows[days]
+
+            stats = {
+                'average_duration_minutes': window.duration.average,
+                'average_sleep_quality': window.quality.average,
+                'average_deep_sleep_minutes': window.deep_sleep.average,
+                'average_rem_sleep_minutes': window.rem_sleep.average,
+                'average_light_sleep_minutes': window.light_sleep.average,
+                'total_records': window.count
+            }
+            return analytics_response(
+                user_id, start_date, end_date, stats,
+                duration_trend=window.duration_trend.trend(),
+                quality_trend=window.quality_trend.trend(),
+                bedtime_std=window.bedtime.std,
+                duration_std=window.duration.std
+            )
+
+    def _fold(self, state: _UserState, record_id: str, values: RecordValues) -> None:
+        """Add a record to a user's state. Caller must hold the lock."""
+        state.records[record_id] = values
+        state.by_day.setdefault(values.day, {})[record_id] = values
+
+        if state.anchor is not None:
+            for days, window in state.windows.items():
+                if state.anchor - timedelta(days=days) <= values.day <= state.anchor:
+                    window.add(values)
+
+    def _retract(self, state: _UserState, record_id: str, values: RecordValues) -> None:
+        """Remove a record from a user's state. Caller must hold the lock."""
+        del state.records[record_id]
+        day_records = state.by_day[values.day]
+        del day_records[record_id]
+        if not day_records:
+            del state.by_day[values.day]
+
+        if state.anchor is not None:
+            for days, window in state.windows.items():
+                if state.anchor - timedelta(days=days) <= values.day <= state.anchor:
+                    window.remove(values)
+
+    def _advance(self, state: _UserState, today: date) -> None:
+        """
+        Slide the windows of a user to end on a new day. Caller must hold the lock.
+
+        Moving forward by less than a window's length only touches the
+        records entering and leaving it; anything else rebuilds the window.
+        """
+        if state.anchor == today:
+            return
+
+        for days in state.windows:
+            if state.anchor is None or not 0 < (today - state.anchor).days <= days:
+                window = state.windows[days] = WindowAggregates()
+                for values in state.records.values():
+                    if today - timedelta(days=days) <= values.day <= today:
+                        window.add(values)
+                continue
+
+            window = state.windows[days]
+            day = state.anchor - timedelta(days=days)
+            while day < today - timedelta(days=days):
+                for values in state.by_day.get(day, {}).values():
+                    window.remove(values)
+                day += timedelta(days=1)
+
+            day = state.anchor + timedelta(days=1)
+            while day <= today:
+                for values in state.by_day.get(day, {}).values():
+                    window.add(values)
+                day += timedelta(days=1)
+
+        state.anchor = today
+
+
+_analytics_store: Optional[IncrementalAnalyticsStore] = None
+_analytics_store_lock = threading.Lock()
+
+
+def get_analytics_store(config: Mapping[str, Any]) -> IncrementalAnalyticsStore:
+    """
+    Get the process-wide incremental analytics store, creating it on first use.
+
+    Args:
+        config: Flask application config
+
+    Returns:
+        Shared analytics store
+    """
+    global _analytics_store
+
+    if _analytics_store is None:
+        with _analytics_store_lock:
+            if _analytics_store is None:
+                _analytics_store = IncrementalAnalyticsStore(
+                    windows=config['SLEEP_ANALYTICS_WINDOWS'],
+                    max_users=config['SLEEP_ANALYTICS_MAX_USERS']
+                )
+
+    return _analytics_store
@@ -0,0 +1,100 @@
+"""
+Cache of metrics derived from the time series of individual sleep records.
+"""
+import threading
+from typing import Any, Callable, Dict, List, Mapping, Optional, Sequence
+
+from app.api.cache import ResponseCache
+from app.models.sleep_data import SleepRecord, SleepTimeSeries
+
+# Computes metrics for many time series at once, None where there are no samples
+BatchMetrics = Callable[[List[SleepTimeSeries]], List[Optional[Dict[str, Any]]]]
+
+
+class MetricsCache(ResponseCache):
+    """Response cache of per-record metrics, keyed by (kind, user id, record id)."""
+
+    def invalidate_user(self, user_id: str) -> int:
+        """
+        Drop the cached metrics of a user.
+
+        Args:
+            user_id: User identifier
+
+        Returns:
+            Number of removed entries
+        """
+        return self.invalidate(lambda key: key[1] == user_id)
+
+
+def cached_record_metrics(
+    config: Mapping[str, Any],
+    kind: str,
+    user_id: str,
+    records: Sequence[SleepRecord],
+    compute: BatchMetrics,
+    complete: bool = True
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Get per-record metrics, computing all uncached ones in one batch.
+
+    Args:
+        config: Flask application config
+        kind: Name of the metrics, part of the cache key
+        user_id: User identifier
+        records: Sleep records
+        compute: Batch function computing the metrics from time series
+        complete: Whether the records carry their full time series. Records
+            without samples are then cached as having no metrics ({});
+            otherwise they are only looked up.
+
+    Returns:
+        Metrics by record id; {} for records known to have no samples, and
+        no entry for records that are neither cached nor computable
+    """
+    cache = get_metrics_cache(config)
+    ttl = config['SLEEP_METRICS_CACHE_TTL']
+
+    results: Dict[str, Dict[str, Any]] = {}
+    missing = []
+    for record in records:
+        key = (kind, user_id, record.record_id)
+        cached = cache.get(key)
+        if cached is not None:
+            results[record.record_id] = cached
+        elif len(record.time_series) or complete:
+            missing.append((key, record))
+
+    computed = compute([record.time_series for _, record in missing])
+    for (key, record), result in zip(missing, computed):
+        results[record.record_id] = result or {}
+        cache.set(key, results[record.record_id], ttl)
+
+    return results
+
+
+_metrics_cache: Optional[MetricsCache] = None
+_metrics_cache_lock = threading.Lock()
+
+
+def get_metrics_cache(config: Mapping[str, Any]) -> MetricsCache:
+    """
+    Get the process-wide cache of per-record derived metrics.
+
+    Args:
+        config: Flask application config
+
+    Returns:
+        Shared metrics cache
+    """
+    global _metrics_cache
+
+    if _metrics_cache is None:
+        with _metrics_cache_lock:
+            if _metrics_cache is None:
+                _metrics_cache = MetricsCache(
+                    max_entries=config['SLEEP_METRICS_CACHE_MAX_ENTRIES'],
+                    max_bytes=config['SLEEP_METRICS_CACHE_MAX_BYTES']
+                )
+
+    return _metrics_cache
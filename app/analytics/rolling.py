@@ -0,0 +1,258 @@
+"""
+Rolling-window heart rate and respiration statistics from nightly time series.
+
+Rolling sums come from cumulative sums and rolling extremes from strided
+window views, so a night is processed in a few array passes. Nightly
+features are computed for many nights at once over their concatenation.
+"""
+from typing import Any, Dict, List, Mapping, Optional, Sequence
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from app.analytics.metrics_cache import cached_record_metrics
+from app.models.sleep_data import SleepRecord, SleepTimeSeries
+
+
+def window_samples(timestamps: np.ndarray, window_minutes: float) -> int:
+    """
+    Get the number of samples spanning a time window.
+
+    Args:
+        timestamps: Sample timestamps (datetime64)
+        window_minutes: Window length in minutes
+
+    Returns:
+        Window length in samples, at least 1
+    """
+    if len(timestamps) < 2:
+        return 1
+
+    span = (timestamps[-1] - timestamps[0]) / np.timedelta64(1, 'm')
+    interval = span / (len(timestamps) - 1)
+    return max(1, int(round(window_minutes / interval))) if interval > 0 else 1
+
+
+def rr_differences(heart_rate: np.ndarray) -> np.ndarray:
+    """
+    Get successive differences of the beat intervals implied by heart rate.
+
+    Beat intervals are approximated as 60000 / heart rate, so this is only a
+    proxy for true RR intervals.
+
+    Args:
+        heart_rate: Heart rate samples in bpm (NaN if missing)
+
+    Returns:
+        Differences in milliseconds; the first element is NaN
+    """
+    intervals = 60000 / np.asarray(heart_rate, dtype=np.float64)
+    return np.concatenate([[np.nan], np.diff(intervals)])
+
+
+def _rolling_sums(values: np.ndarray, starts: np.ndarray) -> np.ndarray:
+    """
+    Sum values over windows ending at every sample.
+
+    Args:
+        values: Values without NaN
+        starts: Index of the first sample of each sample's window
+
+    Returns:
+        Sum of values[starts[i]:i + 1] for every i
+    """
+    cumulative = np.concatenate([[0.0], np.cumsum(values)])
+    return cumulative[1:] - cumulative[starts]
+
+
+def _rolling_moments(values: np.ndarray, starts: np.ndarray) -> Dict[str, np.ndarray]:
+    """Get rolling mean and standard deviation over the non-NaN values of windows."""
+    valid = ~np.isnan(values)
+    filled = np.where(valid, values, 0.0)
+
+    counts = _rolling_sums(valid.astype(np.float64), starts)
+    sums = _rolling_sums(filled, starts)
+    squares = _rolling_sums(filled * filled, starts)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = np.where(counts > 0, sums / counts, np.nan)
+        variance = np.where(counts > 0, squares / counts - mean * mean, np.nan)
+
+    return {'mean': mean, 'std': np.sqrt(np.maximum(variance, 0.0))}
+
+
+def _rolling_extreme(values: np.ndarray, window: int, maximum: bool) -> np.ndarray:
+    """Get the rolling minimum or maximum over the non-NaN values of trailing windows."""
+    fill = -np.inf if maximum else np.inf
+    padded = np.concatenate([np.full(window - 1, fill), np.where(np.isnan(values), fill, values)])
+    windows = sliding_window_view(padded, window)
+    extreme = windows.max(axis=1) if maximum else windows.min(axis=1)
+    return np.where(np.isinf(extreme), np.nan, extreme)
+
+
+def rolling_statistics(series: SleepTimeSeries, window_minutes: float) -> Dict[str, np.ndarray]:
+    """
+    Compute rolling statistics over trailing windows of one night.
+
+    Args:
+        series: Time series of the night
+        window_minutes: Window length in minutes
+
+    Returns:
+        Arrays aligned with the series: heart rate mean, min, max and std,
+        respiration rate mean and std, and a rolling RMSSD HRV proxy (ms)
+    """
+    window = window_samples(series.timestamps, window_minutes)
+    starts = np.maximum(np.arange(len(series)) - window + 1, 0)
+
+    heart_rate = np.asarray(series.heart_rate, dtype=np.float64)
+    respiration = np.asarray(series.respiration_rate, dtype=np.float64)
+    heart_rate_moments = _rolling_moments(heart_rate, starts)
+    respiration_moments = _rolling_moments(respiration, starts)
+
+    differences = rr_differences(heart_rate)
+    mean_square = _rolling_moments(differences * differences, starts)['mean']
+
+    return {
+        'heart_rate_mean': heart_rate_moments['mean'],
+        'heart_rate_min': _rolling_extreme(heart_rate, window, maximum=False),
+        'heart_rate_max': _rolling_extreme(heart_rate, window, maximum=True),
+        'heart_rate_std': heart_rate_moments['std'],
+        'respiration_rate_mean': respiration_moments['mean'],
+        'respiration_rate_std': respiration_moments['std'],
+        'hrv_rmssd': np.sqrt(mean_square)
+    }
+
+
+def _reduce_moments(values: np.ndarray, firsts: np.ndarray) -> Dict[str, np.ndarray]:
+    """Get the mean and standard deviation of the non-NaN values of every segment."""
+    valid = ~np.isnan(values)
+    filled = np.where(valid, values, 0.0)
+
+    counts = np.add.reduceat(valid.astype(np.float64), firsts)
+    sums = np.add.reduceat(filled, firsts)
+    squares = np.add.reduceat(filled * filled, firsts)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = np.where(counts > 0, sums / counts, np.nan)
+        variance = np.where(counts > 0, squares / counts - mean * mean, np.nan)
+
+    return {'mean': mean, 'std': np.sqrt(np.maximum(variance, 0.0))}
+
+
+def _value(value: float, digits: int = 1) -> Optional[float]:
+    """Round a scalar, mapping NaN to None."""
+    return None if np.isnan(value) else round(float(value), digits)
+
+
+def batch_night_features(
+    series: Sequence[SleepTimeSeries],
+    window_minutes: float
+) -> List[Optional[Dict[str, Any]]]:
+    """
+    Compute nightly heart rate and respiration features for many nights at once.
+
+    The heart rate nadir is the lowest rolling-mean heart rate, so single
+    noisy samples do not define it.
+
+    Args:
+        series: Time series of the nights
+        window_minutes: Rolling window length in minutes
+
+    Returns:
+        For each night, in order, a dictionary with heart rate mean, min,
+        max and std, respiration rate mean and std, heart rate nadir with its
+        time and relative position in the night, and the RMSSD HRV proxy;
+        None for nights without samples
+    """
+    results: List[Optional[Dict[str, Any]]] = [None] * len(series)
+    nights = [index for index, night in enumerate(series) if len(night)]
+    if not nights:
+        return results
+
+    lengths = np.array([len(series[index]) for index in nights])
+    offsets = np.concatenate([[0], np.cumsum(lengths)])
+    firsts = offsets[:-1]
+    night_of = np.repeat(np.arange(len(nights)), lengths)
+
+    timestamps = np.concatenate([
+        np.asarray(series[index].timestamps, dtype='datetime64[us]') for index in nights
+    ])
+    heart_rate = np.concatenate([np.asarray(series[index].heart_rate, dtype=np.float64) for index in nights])
+    respiration = np.concatenate([
+        np.asarray(series[index].respiration_rate, dtype=np.float64) for index in nights
+    ])
+
+    # Per-night window lengths in samples; windows never reach into the previous night
+    windows = np.array([window_samples(series[index].timestamps, window_minutes) for index in nights])
+    positions = np.arange(len(heart_rate))
+    starts = np.maximum(positions - windows[night_of] + 1, firsts[night_of])
+    rolling_heart_rate = _rolling_moments(heart_rate, starts)['mean']
+
+    # Nadir: first sample of each night at its minimum rolling mean
+    filled = np.where(np.isnan(rolling_heart_rate), np.inf, rolling_heart_rate)
+    nadir = np.minimum.reduceat(filled, firsts)
+    at_nadir = np.where(filled == nadir[night_of], positions, len(positions))
+    nadir_index = np.minimum.reduceat(at_nadir, firsts)
+    has_nadir = np.isfinite(nadir)
+    nadir_index = np.where(has_nadir, nadir_index, firsts)
+
+    span = (timestamps[offsets[1:] - 1] - timestamps[firsts]) / np.timedelta64(1, 'm')
+    nadir_offset = (timestamps[nadir_index] - timestamps[firsts]) / np.timedelta64(1, 'm')
+
+    heart_rate_moments = _reduce_moments(heart_rate, firsts)
+    respiration_moments = _reduce_moments(respiration, firsts)
+    heart_rate_min = np.fmin.reduceat(heart_rate, firsts)
+    heart_rate_max = np.fmax.reduceat(heart_rate, firsts)
+
+    differences = rr_differences(heart_rate)
+    differences[firsts] = np.nan
+    rmssd = np.sqrt(_reduce_moments(differences * differences, firsts)['mean'])
+
+    nadir_times = np.datetime_as_string(timestamps[nadir_index], unit='s')
+
+    for position, index in enumerate(nights):
+        found = bool(has_nadir[position])
+        results[index] = {
+            'heart_rate_mean': _value(heart_rate_moments['mean'][position]),
+            'heart_rate_min': _value(heart_rate_min[position]),
+            'heart_rate_max': _value(heart_rate_max[position]),
+            'heart_rate_std': _value(heart_rate_moments['std'][position]),
+            'respiration_rate_mean': _value(respiration_moments['mean'][position]),
+            'respiration_rate_std': _value(respiration_moments['std'][position]),
+            'heart_rate_nadir': _value(nadir[position]) if found else None,
+            'heart_rate_nadir_time': str(nadir_times[position]) if found else None,
+            'heart_rate_nadir_position': (
+                _value(nadir_offset[position] / span[position], 3)
+                if found and span[position] > 0 else None
+            ),
+            'hrv_rmssd': _value(rmssd[position])
+        }
+
+    return results
+
+
+def records_night_features(
+    config: Mapping[str, Any],
+    user_id: str,
+    records: Sequence[SleepRecord],
+    complete: bool = True
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Get nightly features for records, computing uncached ones in one batch.
+
+    Args:
+        config: Flask application config
+        user_id: User identifier
+        records: Sleep records
+        complete: Whether the records carry their full time series
+
+    Returns:
+        Features by record id, as described in cached_record_metrics
+    """
+    window_minutes = config['SLEEP_ROLLING_WINDOW_MINUTES']
+    return cached_record_metrics(
+        config, 'night_features', user_id, records,
+        lambda series: batch_night_features(series, window_minutes),
+        complete=complete
+    )
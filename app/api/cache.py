@@ -0,0 +1,258 @@
+"""
+In-process response cache for the Sleep Data Microservice API.
+"""
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Mapping, Optional, Tuple
+
+
+class _CacheEntry:
+    """A cached value with its expiry time, end of stale use, estimated size and content version."""
+
+    __slots__ = ('value', 'expires_at', 'stale_until', 'size', 'digest', 'modified')
+
+    def __init__(
+        self,
+        value: Any,
+        expires_at: float,
+        stale_until: float,
+        size: int,
+        digest: str,
+        modified: float
+    ):
+        self.value = value
+        self.expires_at = expires_at
+        self.stale_until = stale_until
+        self.size = size
+        self.digest = digest
+        self.modified = modified
+
+
+class ResponseCache:
+    """Thread-safe TTL cache bounded by entry count and memory, with LRU eviction."""
+
+    def __init__(self, max_entries: int, max_bytes: int):
+        """
+        Initialize the response cache.
+
+        Args:
+            max_entries: Maximum number of cached entries
+            max_bytes: Maximum estimated size of all cached values in bytes
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+
+        self._entries: 'OrderedDict[Hashable, _CacheEntry]' = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.stale_hits = 0
+
+    @staticmethod
+    def estimate_size(value: Any) -> int:
+        """
+        Estimate the memory footprint of a JSON-like value.
+
+        Args:
+            value: Value to measure
+
+        Returns:
+            Approximate size in bytes
+        """
+        return len(json.dumps(value, default=str))
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """
+        Get a cached value.
+
+        Args:
+            key: Cache key
+
+        Returns:
+            The cached value, or None if missing or expired
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+
+            if entry is None:
+                self.misses += 1
+                return None
+
+            now = time.monotonic()
+            if entry.expires_at <= now:
+                if entry.stale_until <= now:
+                    self._remove(key)
+                    self.expirations += 1
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry.value
+
+    def get_stale(self, key: Hashable) -> Optional[Any]:
+        """
+        Get an expired value that may still be served while it is refreshed.
+
+        Args:
+            key: Cache key
+
+        Returns:
+            The cached value if it expired but is within its stale period,
+            otherwise None
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            now = time.monotonic()
+
+            if entry is None or entry.expires_at > now or entry.stale_until <= now:
+                return None
+
+            self._entries.move_to_end(key)
+            self.stale_hits += 1
+            return entry.value
+
+    def set(
+        self,
+        key: Hashable,
+        value: Any,
+        ttl: float,
+        size: Optional[int] = None,
+        stale_ttl: float = 0
+    ) -> None:
+        """
+        Store a value in the cache.
+
+        Args:
+            key: Cache key
+            value: Value to cache
+            ttl: Time to live in seconds
+            size: Size of the value in bytes, estimated if omitted
+            stale_ttl: Seconds after expiry during which get_stale still
+                returns the value
+        """
+        if ttl <= 0:
+            return
+
+        # The serialized value gives both the size estimate and a content digest
+        encoded = json.dumps(value, default=str)
+        if size is None:
+            size = len(encoded)
+        digest = hashlib.blake2b(encoded.encode(), digest_size=16).hexdigest()
+
+        # Values larger than the whole budget would evict everything else
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            # Unchanged content keeps its modification time across refreshes
+            modified = time.time()
+            if key in self._entries:
+                previous = self._entries[key]
+                if previous.digest == digest:
+                    modified = previous.modified
+                self._remove(key)
+
+            expires_at = time.monotonic() + ttl
+            self._entries[key] = _CacheEntry(
+                value, expires_at, expires_at + stale_ttl, size, digest, modified
+            )
+            self._bytes += size
+
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                oldest_key = next(iter(self._entries))
+                self._remove(oldest_key)
+                self.evictions += 1
+
+    def version(self, key: Hashable) -> Optional[Tuple[str, float]]:
+        """
+        Get the content version of a fresh entry without counting a lookup.
+
+        Args:
+            key: Cache key
+
+        Returns:
+            Tuple of the content digest and the time (seconds since the
+            epoch) the content last changed, or None if missing or expired
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry.expires_at <= time.monotonic():
+                return None
+            return entry.digest, entry.modified
+
+    def invalidate(self, predicate: Callable[[Hashable], bool]) -> int:
+        """
+        Remove every entry whose key matches a predicate.
+
+        Args:
+            predicate: Function returning True for keys to remove
+
+        Returns:
+            Number of removed entries
+        """
+        with self._lock:
+            keys = [key for key in self._entries if predicate(key)]
+            for key in keys:
+                self._remove(key)
+            return len(keys)
+
+    def clear(self) -> None:
+        """Remove all entries."""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Get cache counters."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else None,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'stale_hits': self.stale_hits
+            }
+
+    def _remove(self, key: Hashable) -> None:
+        """Remove an entry. Caller must hold the lock."""
+        entry = self._entries.pop(key)
+        self._bytes -= entry.size
+
+
+_response_cache: Optional[ResponseCache] = None
+_response_cache_lock = threading.Lock()
+
+
+def get_response_cache(config: Mapping[str, Any]) -> ResponseCache:
+    """
+    Get the process-wide response cache, creating it on first use.
+
+    Args:
+        config: Flask application config
+
+    Returns:
+        Shared response cache
+    """
+    global _response_cache
+
+    if _response_cache is None:
+        with _response_cache_lock:
+            if _response_cache is None:
+                _response_cache = ResponseCache(
+                    max_entries=config['SLEEP_API_CACHE_MAX_ENTRIES'],
+                    max_bytes=config['SLEEP_API_CACHE_MAX_BYTES']
+                )
+
+    return _response_cache
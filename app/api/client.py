@@ -1,13 +1,104 @@
 """
 Client for interacting with the Sleep Data Microservice API.
 """
+import hashlib
 import json
-from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Any
+import threading
+from collections import deque
+from concurrent.futures import FIRST_EXCEPTION, wait
+from datetime import date, datetime, time, timedelta, timezone
+from itertools import islice
+from typing import Callable, Dict, FrozenSet, Iterable, Iterator, List, Optional, Any, Sequence, Tuple
 
-import requests
 from flask import current_app
-from requests.exceptions import RequestException
+from requests.exceptions import HTTPError, RequestException, Timeout
+
+from app.api.cache import get_response_cache
+from app.api.directory import UserDirectory, get_user_directory
+from app.api.index import get_record_index
+from app.api.ranges import merge_adjacent, month_chunks, month_end, record_day
+from app.api.resilience import get_circuit_breaker, get_hedged_caller, is_upstream_failure
+from app.api.singleflight import get_single_flight
+from app.api.transport import get_executor, get_session
+
+# Days after a month ends during which late-synced records may still arrive
+CLOSED_CHUNK_GRACE = timedelta(days=2)
+
+
+# Record fields kept by every projection, needed to chunk, index and sort records
+REQUIRED_FIELDS = ('record_id', 'date')
+
+
+def _projection(fields: Optional[Iterable[str]]) -> Optional[Tuple[str, ...]]:
+    """Normalize requested record fields into a hashable projection (None means all)."""
+    if fields is None:
+        return None
+    return tuple(sorted(set(fields) | set(REQUIRED_FIELDS)))
+
+
+def _project(records: List[Dict[str, Any]], projection: Tuple[str, ...]) -> List[Dict[str, Any]]:
+    """Drop record fields outside a projection."""
+    return [
+        {key: record[key] for key in projection if key in record}
+        for record in records
+    ]
+
+
+# Callables notified with (user_id, records, covered range) for every span of
+# records fetched for a date range, with the record fields they need (None for all)
+RecordListener = Callable[[str, List[Dict[str, Any]], Tuple[date, date]], None]
+_record_listeners: List[Tuple[RecordListener, Optional[FrozenSet[str]]]] = []
+
+
+def register_record_listener(listener: RecordListener, fields: Optional[Iterable[str]] = None) -> None:
+    """
+    Register a callable to be notified of freshly fetched sleep records.
+
+    Args:
+        listener: Called with the user id, the records and the date range
+            they completely cover
+        fields: Record fields the listener needs; it is then also notified
+            of projected fetches including them. None to only be notified
+            of full records.
+    """
+    if listener not in [registered for registered, _ in _record_listeners]:
+        _record_listeners.append((listener, frozenset(fields) if fields is not None else None))
+
+
+# Callables notified with the user id whenever a user's cached data is dropped
+InvalidationListener = Callable[[str], Any]
+_invalidation_listeners: List[InvalidationListener] = []
+
+
+def register_invalidation_listener(listener: InvalidationListener) -> None:
+    """
+    Register a callable to be notified when a user's cached responses are dropped.
+
+    Args:
+        listener: Called with the user id, to drop data derived from the
+            cached responses
+    """
+    if listener not in _invalidation_listeners:
+        _invalidation_listeners.append(listener)
+
+
+# Keys of stale cache entries currently being refreshed in the background
+_pending_refreshes = set()
+_pending_refreshes_lock = threading.Lock()
+
+
+def _day_start(value: date) -> datetime:
+    """Normalize a date or datetime to the start of its day."""
+    if isinstance(value, datetime):
+        value = value.date()
+    return datetime.combine(value, time.min)
+
+
+def _day_end(value: date) -> datetime:
+    """Normalize a date or datetime to the end of its day."""
+    if isinstance(value, datetime):
+        value = value.date()
+    return datetime.combine(value, time.max)
 
 
 class SleepApiClient:
@@ -28,6 +119,10 @@ class SleepApiClient:
         """
         Make a request to the Sleep API.
 
+        Calls are rejected while the circuit breaker is open. GETs that have
+        not answered within SLEEP_API_HEDGE_DELAY are hedged with a second
+        identical request, within the hedge budget.
+
         Args:
             method: HTTP method (GET, POST, etc.)
             endpoint: API endpoint
@@ -37,43 +132,342 @@ class SleepApiClient:
             API response as a dictionary
 
         Raises:
+            CircuitOpenError: If the circuit breaker is open
             RequestException: If the request fails
         """
         url = f"{self.base_url}/{endpoint.lstrip('/')}"
+        config = current_app.config
         
         # Set default timeout if not provided
         kwargs.setdefault('timeout', self.timeout)
         
-        try:
-            response = requests.request(method, url, **kwargs)
+        breaker = get_circuit_breaker(config)
+        breaker.before_call()
+        
+        def attempt() -> Dict:
+            response = get_session(config).request(method, url, **kwargs)
             response.raise_for_status()
             return response.json()
+        
+        try:
+            if method == 'GET' and config['SLEEP_API_HEDGE_DELAY'] > 0:
+                result = get_hedged_caller(config).call(attempt)
+            else:
+                result = attempt()
         except RequestException as e:
+            if is_upstream_failure(e):
+                breaker.record_failure()
+            else:
+                breaker.record_success()
             # Log the error and re-raise
             current_app.logger.error(f"API request failed: {str(e)}")
             raise
+        except Exception:
+            breaker.record_failure()
+            raise
+        
+        breaker.record_success()
+        return result
+
+    def _coalesced(self, key: Tuple, call: Callable[[], Any]) -> Any:
+        """
+        Run an upstream call, sharing it with identical concurrent calls.
+
+        Callers waiting for an identical call make their own once they have
+        waited SLEEP_API_DEADLINE, so a stuck call does not hold them all.
+
+        Args:
+            key: Key identifying the call, starting with the endpoint name
+            call: Zero-argument callable making the call
+
+        Returns:
+            The call's result
+        """
+        if not current_app.config['SLEEP_API_COALESCE_REQUESTS']:
+            return call()
+        return get_single_flight().do(
+            (self.base_url,) + key, call, timeout=current_app.config['SLEEP_API_DEADLINE']
+        )
+
+    def _refresh_in_background(self, key: Tuple, call: Callable[[], Any]) -> None:
+        """
+        Run an upstream call that refreshes cached data on the refresh pool.
+
+        At most one refresh per key is queued or running at a time; failures
+        are logged and leave the stale data in place.
+
+        Args:
+            key: Key identifying the call, starting with the endpoint name
+            call: Zero-argument callable making the call and caching its result
+        """
+        refresh_key = (self.base_url,) + key
+        with _pending_refreshes_lock:
+            if refresh_key in _pending_refreshes:
+                return
+            _pending_refreshes.add(refresh_key)
+        
+        app = current_app._get_current_object()
+        
+        def run() -> None:
+            try:
+                with app.app_context():
+                    self._coalesced(key, call)
+            except Exception as e:
+                app.logger.warning(f"Background refresh failed: {str(e)}")
+            finally:
+                with _pending_refreshes_lock:
+                    _pending_refreshes.discard(refresh_key)
+        
+        get_executor(app.config, 'refresh').submit(run)
+
+    def _cached_request(
+        self,
+        cache_key: Tuple,
+        ttl: int,
+        method: str,
+        endpoint: str,
+        **kwargs
+    ) -> Dict:
+        """
+        Make a request to the Sleep API, serving repeats from the response cache.
+
+        Concurrent misses for the same key share one upstream request. An
+        expired response still within SLEEP_API_CACHE_STALE_TTL is returned
+        immediately while it is refreshed in the background.
+
+        Args:
+            cache_key: Key identifying the request, starting with the endpoint name
+            ttl: Time to live of the cached response in seconds
+            method: HTTP method (GET, POST, etc.)
+            endpoint: API endpoint
+            **kwargs: Additional request parameters
+
+        Returns:
+            API response as a dictionary
+        """
+        cache = get_response_cache(current_app.config)
+        key = (self.base_url,) + cache_key
+
+        response = cache.get(key)
+        if response is None:
+            stale_ttl = current_app.config['SLEEP_API_CACHE_STALE_TTL']
+
+            def fetch() -> Dict:
+                fetched = self._make_request(method, endpoint, **kwargs)
+                cache.set(key, fetched, ttl, stale_ttl=stale_ttl)
+                return fetched
+
+            response = cache.get_stale(key)
+            if response is not None:
+                self._refresh_in_background(cache_key, fetch)
+            else:
+                response = self._coalesced(cache_key, fetch)
+
+        return response
+
+    def invalidate_user(self, user_id: str) -> None:
+        """
+        Drop cached responses for a user, e.g. after new data was generated.
+
+        Args:
+            user_id: User identifier
+        """
+        cache = get_response_cache(current_app.config)
+        cache.invalidate(lambda key: key[0] == self.base_url and key[2] == user_id)
+        get_record_index(current_app.config).invalidate_user(user_id)
+        for listener in _invalidation_listeners:
+            listener(user_id)
+
+    def invalidate_users(self) -> None:
+        """
+        Drop cached user listings and mark the user directory for reloading,
+        e.g. after a user was added or their record count changed.
+        """
+        cache = get_response_cache(current_app.config)
+        cache.invalidate(lambda key: key[0] == self.base_url and key[1] == 'users')
+        get_user_directory(current_app.config).mark_stale()
+
+    def cache_stats(self) -> Dict[str, Any]:
+        """Get hit/miss counters of the response cache and upstream call counters."""
+        stats = get_response_cache(current_app.config).stats()
+        stats['coalescing'] = get_single_flight().stats()
+        stats['circuit_breaker'] = get_circuit_breaker(current_app.config).stats()
+        stats['hedging'] = get_hedged_caller(current_app.config).stats()
+        return stats
+
+    def _cached_version(self, keys: Sequence[Sequence[Tuple]]) -> Optional[Tuple[str, datetime]]:
+        """
+        Combine the content versions of fresh cached responses.
+
+        Args:
+            keys: For every response, its cache keys in lookup order
+
+        Returns:
+            Tuple of a digest of all versions and the latest modification
+            time (UTC), or None if any response is not freshly cached
+        """
+        cache = get_response_cache(current_app.config)
+        digest = hashlib.blake2b(digest_size=16)
+        modified = 0.0
+        
+        for alternatives in keys:
+            for key in alternatives:
+                version = cache.version((self.base_url,) + key)
+                if version is not None:
+                    break
+            else:
+                return None
+            digest.update(version[0].encode())
+            modified = max(modified, version[1])
+        
+        return digest.hexdigest(), datetime.fromtimestamp(modified, timezone.utc)
+
+    def sleep_data_version(
+        self,
+        user_id: str,
+        start_date: datetime,
+        end_date: datetime,
+        fields: Optional[Sequence[str]] = None
+    ) -> Optional[Tuple[str, datetime]]:
+        """
+        Get the version of a date range's sleep data without calling upstream.
+
+        Args:
+            user_id: User identifier
+            start_date: Start of the range
+            end_date: End of the range
+            fields: Record fields the caller needs, or None for all
+
+        Returns:
+            Tuple of a content digest and last modification time (UTC), or
+            None if the range is not freshly cached
+        """
+        projection = _projection(fields)
+        return self._cached_version([
+            [('sleep_chunk', user_id, chunk_start, None)]
+            + ([('sleep_chunk', user_id, chunk_start, projection)] if projection is not None else [])
+            for chunk_start, _ in month_chunks(start_date.date(), end_date.date())
+        ])
+
+    def analytics_version(
+        self,
+        user_id: str,
+        start_date: datetime,
+        end_date: datetime
+    ) -> Optional[Tuple[str, datetime]]:
+        """
+        Get the version of a date range's upstream analytics without calling upstream.
+
+        Args:
+            user_id: User identifier
+            start_date: Start of the range
+            end_date: End of the range
+
+        Returns:
+            Tuple of a content digest and last modification time (UTC), or
+            None if the analytics are not freshly cached
+        """
+        return self._cached_version([[
+            ('analytics', user_id, _day_start(start_date).isoformat(), _day_end(end_date).isoformat())
+        ]])
+
+    def fetch_concurrently(
+        self,
+        calls: Dict[str, Callable[[], Any]],
+        timeout: Optional[float] = None
+    ) -> Dict[str, Any]:
+        """
+        Run several client calls in parallel under a single deadline.
+
+        Args:
+            calls: Mapping of result name to a zero-argument callable
+            timeout: Deadline in seconds for the whole group
+
+        Returns:
+            Dictionary mapping each name to its call's result
+
+        Raises:
+            Timeout: If not every call finished before the deadline
+            RequestException: If any of the calls fails
+        """
+        if timeout is None:
+            timeout = current_app.config['SLEEP_API_DEADLINE']
+
+        app = current_app._get_current_object()
+        executor = get_executor(app.config)
+
+        def run_in_context(call: Callable[[], Any]) -> Any:
+            with app.app_context():
+                return call()
+
+        futures = {
+            name: executor.submit(run_in_context, call)
+            for name, call in calls.items()
+        }
+        done, pending = wait(
+            futures.values(), timeout=timeout, return_when=FIRST_EXCEPTION
+        )
+
+        for future in done:
+            if future.exception() is not None:
+                for other in pending:
+                    other.cancel()
+                raise future.exception()
+
+        if pending:
+            for future in pending:
+                future.cancel()
+            current_app.logger.error(
+                f"API requests did not complete within {timeout}s deadline"
+            )
+            raise Timeout(f"Sleep API did not respond within {timeout}s")
+
+        return {name: future.result() for name, future in futures.items()}
 
     def get_sleep_data(
         self, 
         user_id: str, 
         start_date: Optional[datetime] = None, 
         end_date: Optional[datetime] = None,
-        limit: int = 100,
-        offset: int = 0
+        limit: Optional[int] = 100,
+        offset: int = 0,
+        fields: Optional[Sequence[str]] = None
     ) -> Dict[str, Any]:
         """
         Get sleep data for a specific user and date range.
 
+        Dates are widened to whole days so that requests for the same days
+        share a cache entry. When both dates are given, the range is served
+        from per-month chunks so overlapping windows share cached data.
+
         Args:
             user_id: User identifier
             start_date: Optional start date for filtering
             end_date: Optional end date for filtering
-            limit: Maximum number of records to return
+            limit: Maximum number of records to return, or None for all
             offset: Number of records to skip
+            fields: Record fields the caller needs, or None for all. Records
+                contain at least these fields; others may be omitted.
 
         Returns:
             Dictionary containing sleep records and count
         """
+        projection = _projection(fields)
+        
+        if start_date and end_date:
+            return self._get_sleep_data_chunked(
+                user_id, start_date.date(), end_date.date(), limit, offset, projection
+            )
+        
+        if limit is None:
+            def fetch_all() -> List[Dict[str, Any]]:
+                return list(self.iter_sleep_data(user_id, start_date, end_date, fields=projection))
+
+            records = self._coalesced(
+                ('sleep_data_all', user_id, start_date, end_date, projection), fetch_all
+            )
+            return {'records': records[offset:], 'count': len(records)}
+        
         params = {
             'user_id': user_id,
             'limit': limit,
@@ -81,12 +475,332 @@ class SleepApiClient:
         }
         
         if start_date:
+            start_date = _day_start(start_date)
             params['start_date'] = start_date.isoformat()
         
+        if end_date:
+            end_date = _day_end(end_date)
+            params['end_date'] = end_date.isoformat()
+        
+        if projection is not None and current_app.config['SLEEP_API_SEND_FIELD_HINTS']:
+            params['fields'] = ','.join(projection)
+        
+        cache_key = ('sleep_data', user_id, params.get('start_date'), params.get('end_date'),
+                     limit, offset, projection)
+        response = self._cached_request(
+            cache_key,
+            current_app.config['SLEEP_API_CACHE_TTL_SLEEP_DATA'],
+            'GET', '/sleep/data', params=params
+        )
+        
+        if projection is None:
+            get_record_index(current_app.config).add(
+                user_id, response.get('records', []), (self.base_url,) + cache_key
+            )
+        
+        return response
+
+    def _iter_pages(
+        self,
+        endpoint: str,
+        params: Dict[str, Any],
+        items_key: str,
+        page_size: int,
+        max_in_flight: int,
+        transform: Optional[Callable[[List[Dict[str, Any]]], List[Dict[str, Any]]]] = None
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Iterate over the items of a paginated upstream listing, walking all pages.
+
+        The first page is fetched on its own; once its ``count`` reveals the
+        total, the remaining pages are fetched concurrently with at most
+        ``max_in_flight`` requests outstanding. Pages are yielded in offset
+        order, so at most ``max_in_flight`` fetched pages wait for an earlier one.
+
+        Args:
+            endpoint: API endpoint of the listing
+            params: Query parameters other than limit and offset
+            items_key: Key of the item list in each page
+            page_size: Items per upstream request
+            max_in_flight: Maximum number of concurrent page requests
+            transform: Optional function applied to the items of each page
+
+        Yields:
+            Items of the listing
+        """
+        app = current_app._get_current_object()
+        params = dict(params, limit=page_size)
+        
+        def fetch_page(offset: int) -> Dict[str, Any]:
+            with app.app_context():
+                page = self._make_request('GET', endpoint, params=dict(params, offset=offset))
+            page[items_key] = page.get(items_key, [])
+            if transform is not None:
+                page[items_key] = transform(page[items_key])
+            return page
+        
+        first_page = fetch_page(0)
+        items = first_page[items_key]
+        yield from items
+        
+        if len(items) < page_size:
+            return
+        
+        total = first_page.get('count')
+        if not isinstance(total, int) or total <= len(items):
+            # The count is not a grand total, so walk the pages in order
+            offset = len(items)
+            while True:
+                items = fetch_page(offset)[items_key]
+                yield from items
+                if len(items) < page_size:
+                    return
+                offset += len(items)
+        
+        executor = get_executor(app.config, 'pages')
+        offsets = iter(range(page_size, total, page_size))
+        in_flight = deque(
+            executor.submit(fetch_page, offset)
+            for offset in islice(offsets, max_in_flight)
+        )
+        
+        try:
+            while in_flight:
+                page = in_flight.popleft().result()
+                next_offset = next(offsets, None)
+                if next_offset is not None:
+                    in_flight.append(executor.submit(fetch_page, next_offset))
+                yield from page[items_key]
+        finally:
+            for future in in_flight:
+                future.cancel()
+
+    def iter_sleep_data(
+        self,
+        user_id: str,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        page_size: Optional[int] = None,
+        max_in_flight: Optional[int] = None,
+        fields: Optional[Sequence[str]] = None
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Iterate over every sleep record of a user, walking all upstream pages.
+
+        Pages are fetched concurrently and yielded in the upstream order.
+
+        Args:
+            user_id: User identifier
+            start_date: Optional start date for filtering
+            end_date: Optional end date for filtering
+            page_size: Records per upstream request
+            max_in_flight: Maximum number of concurrent page requests
+            fields: Record fields to keep, or None for all
+
+        Yields:
+            Sleep records
+        """
+        config = current_app.config
+        projection = _projection(fields)
+        
+        params = {'user_id': user_id}
+        if start_date:
+            params['start_date'] = start_date.isoformat()
         if end_date:
             params['end_date'] = end_date.isoformat()
+        if projection is not None and config['SLEEP_API_SEND_FIELD_HINTS']:
+            params['fields'] = ','.join(projection)
         
-        return self._make_request('GET', '/sleep/data', params=params)
+        yield from self._iter_pages(
+            '/sleep/data', params, 'records',
+            page_size or config['SLEEP_API_PAGE_SIZE'],
+            max_in_flight or config['SLEEP_API_MAX_PAGES_IN_FLIGHT'],
+            transform=(lambda records: _project(records, projection)) if projection is not None else None
+        )
+
+    def _chunk_ttl(self, chunk_start: date) -> int:
+        """Get the cache TTL for a month chunk; closed months are kept much longer."""
+        if month_end(chunk_start) + CLOSED_CHUNK_GRACE < date.today():
+            return current_app.config['SLEEP_API_CACHE_TTL_CLOSED_CHUNK']
+        return current_app.config['SLEEP_API_CACHE_TTL_SLEEP_DATA']
+
+    def _get_sleep_data_chunked(
+        self,
+        user_id: str,
+        start_day: date,
+        end_day: date,
+        limit: Optional[int],
+        offset: int,
+        projection: Optional[Tuple[str, ...]] = None
+    ) -> Dict[str, Any]:
+        """
+        Get sleep data for a date range from cached month chunks.
+
+        Only the months missing from the cache are fetched, with adjacent
+        missing months combined into a single upstream request; concurrent
+        fetches of the same span are shared. Stale months are served as-is
+        and refreshed in the background. Projected chunks are cached
+        separately; a cached full chunk serves any projection.
+
+        Args:
+            user_id: User identifier
+            start_day: First day of the range
+            end_day: Last day of the range
+            limit: Maximum number of records to return, or None for all
+            offset: Number of records to skip
+            projection: Normalized record fields to fetch, or None for all
+
+        Returns:
+            Dictionary containing sleep records (newest first) and count
+        """
+        cache = get_response_cache(current_app.config)
+        index = get_record_index(current_app.config)
+        chunks = month_chunks(start_day, end_day)
+        
+        stale_ttl = current_app.config['SLEEP_API_CACHE_STALE_TTL']
+        
+        def cached_chunk(chunk_start: date, lookup: Callable) -> Optional[List[Dict[str, Any]]]:
+            cached = lookup((self.base_url, 'sleep_chunk', user_id, chunk_start, None))
+            if cached is None and projection is not None:
+                cached = lookup((self.base_url, 'sleep_chunk', user_id, chunk_start, projection))
+            return cached
+        
+        chunk_records: Dict[date, List[Dict[str, Any]]] = {}
+        missing = []
+        stale = []
+        for chunk_start, chunk_end in chunks:
+            cached = cached_chunk(chunk_start, cache.get)
+            if cached is None:
+                cached = cached_chunk(chunk_start, cache.get_stale)
+                if cached is not None:
+                    stale.append((chunk_start, chunk_end))
+            if cached is None:
+                missing.append((chunk_start, chunk_end))
+            else:
+                chunk_records[chunk_start] = cached
+        
+        def fetch_span(span_start: date, span_end: date) -> Dict[date, List[Dict[str, Any]]]:
+            fetched = {
+                chunk_start.isoformat()[:7]: []
+                for chunk_start, _ in month_chunks(span_start, span_end)
+            }
+            span_records = list(self.iter_sleep_data(
+                user_id, _day_start(span_start), _day_end(span_end), fields=projection
+            ))
+            for record in span_records:
+                fetched.setdefault(record_day(record)[:7], []).append(record)
+            
+            for listener, needed in _record_listeners:
+                if projection is not None and (needed is None or not needed.issubset(projection)):
+                    continue
+                try:
+                    listener(user_id, span_records, (span_start, span_end))
+                except Exception as e:
+                    current_app.logger.exception(f"Record listener failed: {str(e)}")
+            
+            span_chunks = {}
+            for chunk_start, _ in month_chunks(span_start, span_end):
+                records = fetched[chunk_start.isoformat()[:7]]
+                chunk_key = (self.base_url, 'sleep_chunk', user_id, chunk_start, projection)
+                cache.set(chunk_key, records, self._chunk_ttl(chunk_start), stale_ttl=stale_ttl)
+                if projection is None:
+                    index.add(user_id, records, chunk_key)
+                span_chunks[chunk_start] = records
+            return span_chunks
+        
+        for span_start, span_end in merge_adjacent(missing):
+            chunk_records.update(self._coalesced(
+                ('sleep_span', user_id, span_start, span_end, projection),
+                lambda: fetch_span(span_start, span_end)
+            ))
+        
+        for span_start, span_end in merge_adjacent(stale):
+            self._refresh_in_background(
+                ('sleep_span', user_id, span_start, span_end, projection),
+                lambda span_start=span_start, span_end=span_end: fetch_span(span_start, span_end)
+            )
+        
+        first_day, last_day = start_day.isoformat(), end_day.isoformat()
+        records = [
+            record
+            for chunk_start, _ in chunks
+            for record in chunk_records[chunk_start]
+            if first_day <= record_day(record) <= last_day
+        ]
+        records.sort(key=record_day, reverse=True)
+        
+        return {
+            'records': records[offset:offset + limit if limit is not None else None],
+            'count': len(records)
+        }
+
+    def get_cached_sleep_record(self, user_id: str, record_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Get a full sleep record only if a cached response holds it, never calling upstream.
+
+        Args:
+            user_id: User identifier
+            record_id: Record identifier
+
+        Returns:
+            The full sleep record, time series included, or None if not cached
+        """
+        index = get_record_index(current_app.config)
+        cache_key = index.get(user_id, record_id)
+        if cache_key is None:
+            return None
+        
+        cached = get_response_cache(current_app.config).get(cache_key)
+        if isinstance(cached, dict):
+            cached = cached.get('records')
+        if cached is not None:
+            record = next((r for r in cached if r.get('record_id') == record_id), None)
+            if record is not None:
+                return record
+        
+        index.discard(user_id, record_id)
+        return None
+
+    def get_sleep_record(
+        self,
+        user_id: str,
+        record_id: str,
+        fields: Optional[Sequence[str]] = None
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Get a single sleep record.
+
+        Records already seen in a sleep data response are served from the
+        record index; otherwise only that record is requested upstream.
+
+        Args:
+            user_id: User identifier
+            record_id: Record identifier
+            fields: Record fields the caller needs, or None for all. The
+                record contains at least these fields; others may be omitted.
+
+        Returns:
+            The sleep record, or None if it does not exist
+        """
+        record = self.get_cached_sleep_record(user_id, record_id)
+        if record is not None:
+            return record
+        
+        projection = _projection(fields)
+        params = {'user_id': user_id}
+        if projection is not None and current_app.config['SLEEP_API_SEND_FIELD_HINTS']:
+            params['fields'] = ','.join(projection)
+        
+        try:
+            return self._cached_request(
+                ('sleep_record', user_id, record_id, projection),
+                current_app.config['SLEEP_API_CACHE_TTL_SLEEP_DATA'],
+                'GET', f'/sleep/data/{record_id}', params=params
+            )
+        except HTTPError as e:
+            if e.response is not None and e.response.status_code == 404:
+                return None
+            raise
 
     def get_sleep_analytics(
         self, 
@@ -97,6 +811,9 @@ class SleepApiClient:
         """
         Get sleep analytics for a specific user and date range.
 
+        Dates are widened to whole days so that requests for the same days
+        share a cache entry.
+
         Args:
             user_id: User identifier
             start_date: Start date for analysis
@@ -107,11 +824,15 @@ class SleepApiClient:
         """
         params = {
             'user_id': user_id,
-            'start_date': start_date.isoformat(),
-            'end_date': end_date.isoformat()
+            'start_date': _day_start(start_date).isoformat(),
+            'end_date': _day_end(end_date).isoformat()
         }
         
-        return self._make_request('GET', '/sleep/analytics', params=params)
+        return self._cached_request(
+            ('analytics', user_id, params['start_date'], params['end_date']),
+            current_app.config['SLEEP_API_CACHE_TTL_ANALYTICS'],
+            'GET', '/sleep/analytics', params=params
+        )
 
     def generate_dummy_data(
         self, 
@@ -150,7 +871,11 @@ class SleepApiClient:
         if sleep_duration_trend:
             payload['sleep_duration_trend'] = sleep_duration_trend
         
-        return self._make_request('POST', '/sleep/generate', json=payload)
+        response = self._make_request('POST', '/sleep/generate', json=payload)
+        self.invalidate_user(user_id)
+        self.invalidate_users()
+        
+        return response
     
     def get_users(
         self,
@@ -172,4 +897,50 @@ class SleepApiClient:
             'offset': offset
         }
         
-        return self._make_request('GET', '/sleep/users', params=params)
\ No newline at end of file
+        return self._cached_request(
+            ('users', None, limit, offset),
+            current_app.config['SLEEP_API_CACHE_TTL_USERS'],
+            'GET', '/sleep/users', params=params
+        )
+
+    def iter_users(
+        self,
+        page_size: Optional[int] = None,
+        max_in_flight: Optional[int] = None
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Iterate over every user with their record count, walking all upstream pages.
+
+        Args:
+            page_size: Users per upstream request
+            max_in_flight: Maximum number of concurrent page requests
+
+        Yields:
+            Users with their 'user_id' and 'record_count'
+        """
+        config = current_app.config
+        yield from self._iter_pages(
+            '/sleep/users', {}, 'users',
+            page_size or config['SLEEP_API_PAGE_SIZE'],
+            max_in_flight or config['SLEEP_API_MAX_PAGES_IN_FLIGHT']
+        )
+
+    def get_user_directory(self) -> UserDirectory:
+        """
+        Get the directory of all users, for searches that do not call upstream.
+
+        The directory is never loaded in the request: its first load and
+        reloads once stale run on the refresh pool, and searches are served
+        from the previous contents meanwhile.
+
+        Returns:
+            User directory, possibly not loaded yet
+        """
+        directory = get_user_directory(current_app.config)
+
+        if directory.is_stale():
+            self._refresh_in_background(
+                ('users_directory',), lambda: directory.load(self.iter_users())
+            )
+
+        return directory
@@ -0,0 +1,260 @@
+"""
+Locally maintained directory of all users of the Sleep Data Microservice.
+
+The whole user listing is loaded page by page and indexed in memory: user
+ids sorted case-insensitively for prefix lookups, plus a trigram index for
+matches anywhere in an id. Searches never call upstream; the directory is
+reloaded in the background once it is older than its TTL.
+"""
+import hashlib
+import threading
+import time
+from bisect import bisect_left
+from datetime import datetime, timezone
+from functools import reduce
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Tuple
+
+import numpy as np
+
+# Sorts after every character that can follow a prefix
+_PREFIX_END = '\U0010ffff'
+
+
+def _trigrams(text: str) -> set:
+    """Get the set of three-character substrings of a text."""
+    return {text[index:index + 3] for index in range(len(text) - 2)}
+
+
+class _DirectoryIndex:
+    """Immutable snapshot of indexed users; replaced as a whole on reload."""
+
+    __slots__ = ('user_ids', 'keys', 'record_counts', 'by_count', 'trigrams', 'digest')
+
+    def __init__(self, users: Iterable[Dict[str, Any]]):
+        entries = sorted(
+            ((str(user['user_id']), int(user.get('record_count') or 0))
+             for user in users if user.get('user_id') is not None),
+            key=lambda entry: (entry[0].lower(), entry[0])
+        )
+
+        self.user_ids = [user_id for user_id, _ in entries]
+        self.keys = [user_id.lower() for user_id in self.user_ids]
+        self.record_counts = np.array([count for _, count in entries], dtype=np.int64)
+
+        # Users by record count (highest first), ties in id order
+        self.by_count = np.argsort(-self.record_counts, kind='stable')
+
+        postings: Dict[str, List[int]] = {}
+        for position, key in enumerate(self.keys):
+            for trigram in _trigrams(key):
+                postings.setdefault(trigram, []).append(position)
+        self.trigrams = {
+            trigram: np.array(positions, dtype=np.int32) for trigram, positions in postings.items()
+        }
+
+        self.digest = hashlib.blake2b(repr(entries).encode(), digest_size=16).hexdigest()
+
+    def _ranked(self, positions: np.ndarray) -> np.ndarray:
+        """Order positions by record count (highest first), then by id."""
+        return positions[np.lexsort((positions, -self.record_counts[positions]))]
+
+    def search(self, query: str, limit: int) -> List[int]:
+        """
+        Find the positions of the best matching users.
+
+        The exact match comes first, then ids starting with the query, then
+        ids containing it elsewhere (for queries of three or more
+        characters); each group is ordered by record count.
+
+        Args:
+            query: Lowercase search text; empty to list the users with the most records
+            limit: Maximum number of matches
+
+        Returns:
+            Positions of matching users, best first
+        """
+        if not query:
+            return self.by_count[:limit].tolist()
+
+        start = bisect_left(self.keys, query)
+        end = bisect_left(self.keys, query + _PREFIX_END, start)
+
+        exact = start < end and self.keys[start] == query
+        prefix = np.arange(start + exact, end)
+        if len(prefix) > limit:
+            prefix = prefix[np.argpartition(-self.record_counts[prefix], limit)[:limit]]
+        matches = ([start] if exact else []) + self._ranked(prefix).tolist()
+
+        if len(matches) >= limit or len(query) < 3:
+            return matches[:limit]
+
+        postings = sorted(
+            (self.trigrams.get(trigram) for trigram in _trigrams(query)),
+            key=lambda positions: -1 if positions is None else len(positions)
+        )
+        if postings[0] is None:
+            return matches
+
+        candidates = reduce(lambda left, right: np.intersect1d(left, right, assume_unique=True), postings)
+        candidates = candidates[(candidates < start) | (candidates >= end)]
+
+        # Trigrams may occur apart from each other, so candidates are checked
+        for position in self._ranked(candidates).tolist():
+            if query in self.keys[position]:
+                matches.append(position)
+                if len(matches) >= limit:
+                    break
+
+        return matches
+
+
+class UserDirectory:
+    """Thread-safe, searchable directory of all users and their record counts."""
+
+    def __init__(self, ttl: float):
+        """
+        Initialize an empty directory.
+
+        Args:
+            ttl: Seconds after a load at which the directory is stale
+        """
+        self.ttl = ttl
+
+        self._index: Optional[_DirectoryIndex] = None
+        self._loaded_at = 0.0
+        self._modified = 0.0
+        self._stale = False
+        self._generation = 0
+        self._lock = threading.Lock()
+
+        self.loads = 0
+        self.last_load_seconds: Optional[float] = None
+        self.searches = 0
+
+    @property
+    def loaded(self) -> bool:
+        """Whether the directory was loaded at least once."""
+        return self._index is not None
+
+    def is_stale(self) -> bool:
+        """Check whether the directory should be reloaded."""
+        return self._stale or time.monotonic() - self._loaded_at >= self.ttl
+
+    def mark_stale(self) -> None:
+        """Mark the directory for reloading, e.g. after a user's data changed."""
+        with self._lock:
+            self._stale = True
+            self._generation += 1
+
+    def load(self, users: Iterable[Dict[str, Any]]) -> None:
+        """
+        Replace the directory's contents, indexing them before they are visible.
+
+        The directory stays stale if it was marked so while the users were
+        read, since the load may have missed that change.
+
+        Args:
+            users: Users with their 'user_id' and 'record_count'
+        """
+        started = time.monotonic()
+        generation = self._generation
+        index = _DirectoryIndex(users)
+
+        with self._lock:
+            if self._index is None or self._index.digest != index.digest:
+                self._modified = time.time()
+            self._index = index
+            self._loaded_at = time.monotonic()
+            if self._generation == generation:
+                self._stale = False
+            self.loads += 1
+            self.last_load_seconds = self._loaded_at - started
+
+    def search(self, query: str = '', limit: int = 10) -> List[Dict[str, Any]]:
+        """
+        Find users by id, case-insensitively.
+
+        Args:
+            query: Search text; empty to list the users with the most records
+            limit: Maximum number of users
+
+        Returns:
+            Matching users with their 'user_id' and 'record_count', best first
+        """
+        index = self._index
+        with self._lock:
+            self.searches += 1
+        if index is None:
+            return []
+
+        return [
+            {'user_id': index.user_ids[position], 'record_count': int(index.record_counts[position])}
+            for position in index.search(query.strip().lower(), limit)
+        ]
+
+    def version(self) -> Optional[Tuple[str, datetime]]:
+        """
+        Get the version of the directory's contents.
+
+        Returns:
+            Tuple of a content digest and the time (UTC) the contents last
+            changed, or None if never loaded
+        """
+        index = self._index
+        if index is None:
+            return None
+        return index.digest, datetime.fromtimestamp(self._modified, timezone.utc)
+
+    def stats(self) -> Dict[str, Any]:
+        """Get directory size, freshness and counters."""
+        index = self._index
+        return {
+            'users': len(index.user_ids) if index is not None else 0,
+            'trigrams': len(index.trigrams) if index is not None else 0,
+            'age_seconds': time.monotonic() - self._loaded_at if index is not None else None,
+            'stale': self.is_stale(),
+            'loads': self.loads,
+            'last_load_seconds': self.last_load_seconds,
+            'searches': self.searches
+        }
+
+
+def search_users(users: Iterable[Dict[str, Any]], query: str = '', limit: int = 10) -> List[Dict[str, Any]]:
+    """
+    Search a list of users once, ranked like UserDirectory.search, without keeping an index.
+
+    Args:
+        users: Users with their 'user_id' and 'record_count'
+        query: Search text; empty to list the users with the most records
+        limit: Maximum number of users
+
+    Returns:
+        Matching users with their 'user_id' and 'record_count', best first
+    """
+    directory = UserDirectory(ttl=0)
+    directory.load(users)
+    return directory.search(query, limit)
+
+
+_user_directory: Optional[UserDirectory] = None
+_user_directory_lock = threading.Lock()
+
+
+def get_user_directory(config: Mapping[str, Any]) -> UserDirectory:
+    """
+    Get the process-wide user directory, creating it on first use.
+
+    Args:
+        config: Flask application config
+
+    Returns:
+        Shared user directory
+    """
+    global _user_directory
+
+    if _user_directory is None:
+        with _user_directory_lock:
+            if _user_directory is None:
+                _user_directory = UserDirectory(config['SLEEP_USER_DIRECTORY_TTL'])
+
+    return _user_directory
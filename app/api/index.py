@@ -0,0 +1,107 @@
+"""
+Per-user index of sleep records seen by the API client.
+
+The index only holds locators: the response cache key of the cached month
+chunk or page holding a record. Records themselves stay in the
+byte-bounded response cache, so an entry costs the same few bytes however
+large its record's time series is.
+"""
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Iterable, Mapping, Optional, Tuple
+
+
+class RecordIndex:
+    """Thread-safe, size-bounded map of (user_id, record_id) to response cache keys."""
+
+    def __init__(self, max_entries: int):
+        """
+        Initialize the record index.
+
+        Args:
+            max_entries: Maximum number of indexed records across all users
+        """
+        self.max_entries = max_entries
+
+        self._entries: 'OrderedDict[Tuple[str, str], Hashable]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add(
+        self,
+        user_id: str,
+        records: Iterable[Dict[str, Any]],
+        cache_key: Hashable
+    ) -> None:
+        """
+        Index records of a user by the cached response holding them.
+
+        Args:
+            user_id: User identifier
+            records: Sleep records to index
+            cache_key: Response cache key of the month chunk or page holding the records
+        """
+        with self._lock:
+            for record in records:
+                record_id = record.get('record_id')
+                if record_id is None:
+                    continue
+
+                key = (user_id, record_id)
+                self._entries[key] = cache_key
+                self._entries.move_to_end(key)
+
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get(self, user_id: str, record_id: str) -> Optional[Hashable]:
+        """
+        Look up where a record is held.
+
+        Args:
+            user_id: User identifier
+            record_id: Record identifier
+
+        Returns:
+            Response cache key of the response holding the record, or None
+            if the record was never seen
+        """
+        with self._lock:
+            cache_key = self._entries.get((user_id, record_id))
+            if cache_key is not None:
+                self._entries.move_to_end((user_id, record_id))
+            return cache_key
+
+    def discard(self, user_id: str, record_id: str) -> None:
+        """Remove a stale entry."""
+        with self._lock:
+            self._entries.pop((user_id, record_id), None)
+
+    def invalidate_user(self, user_id: str) -> None:
+        """Remove all entries of a user."""
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == user_id]:
+                del self._entries[key]
+
+
+_record_index: Optional[RecordIndex] = None
+_record_index_lock = threading.Lock()
+
+
+def get_record_index(config: Mapping[str, Any]) -> RecordIndex:
+    """
+    Get the process-wide record index, creating it on first use.
+
+    Args:
+        config: Flask application config
+
+    Returns:
+        Shared record index
+    """
+    global _record_index
+
+    if _record_index is None:
+        with _record_index_lock:
+            if _record_index is None:
+                _record_index = RecordIndex(config['SLEEP_API_RECORD_INDEX_MAX_ENTRIES'])
+
+    return _record_index
@@ -0,0 +1,90 @@
+"""
+Calendar chunking of date ranges for the sleep data cache.
+
+Requested ranges are split into whole calendar months so that overlapping
+windows (7, 30, 90 days, ...) share cached chunks.
+"""
+from datetime import date, timedelta
+from typing import Any, Dict, Iterable, List, Tuple
+
+DateRange = Tuple[date, date]
+
+
+def month_start(day: date) -> date:
+    """Get the first day of the month containing a date."""
+    return day.replace(day=1)
+
+
+def month_end(day: date) -> date:
+    """Get the last day of the month containing a date."""
+    next_month = (day.replace(day=28) + timedelta(days=4)).replace(day=1)
+    return next_month - timedelta(days=1)
+
+
+def month_chunks(start: date, end: date) -> List[DateRange]:
+    """
+    Split a date range into the calendar months that cover it.
+
+    Args:
+        start: First day of the range
+        end: Last day of the range
+
+    Returns:
+        List of (first day, last day) month ranges in ascending order
+    """
+    chunks = []
+    current = month_start(start)
+
+    while current <= end:
+        last = month_end(current)
+        chunks.append((current, last))
+        current = last + timedelta(days=1)
+
+    return chunks
+
+
+def merge_adjacent(chunks: Iterable[DateRange]) -> List[DateRange]:
+    """
+    Merge consecutive chunks into continuous spans.
+
+    Args:
+        chunks: Chunks in ascending order
+
+    Returns:
+        List of spans, each covering one or more adjacent chunks
+    """
+    spans: List[DateRange] = []
+
+    for first, last in chunks:
+        if spans and spans[-1][1] + timedelta(days=1) == first:
+            spans[-1] = (spans[-1][0], last)
+        else:
+            spans.append((first, last))
+
+    return spans
+
+
+def merge_ranges(ranges: Iterable[DateRange]) -> List[DateRange]:
+    """
+    Merge overlapping or adjacent date ranges.
+
+    Args:
+        ranges: Date ranges in any order
+
+    Returns:
+        List of disjoint ranges in ascending order
+    """
+    merged: List[DateRange] = []
+
+    for first, last in sorted(ranges):
+        if merged and first <= merged[-1][1] + timedelta(days=1):
+            merged[-1] = (merged[-1][0], max(merged[-1][1], last))
+        else:
+            merged.append((first, last))
+
+    return merged
+
+
+def record_day(record: Dict[str, Any]) -> str:
+    """Get the ISO day (YYYY-MM-DD) a sleep record belongs to."""
+    return str(record.get('date', ''))[:10]
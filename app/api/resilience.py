@@ -0,0 +1,309 @@
+"""
+Failure isolation for calls to the Sleep Data Microservice API.
+
+A circuit breaker stops calling upstream after repeated failures so requests
+fail fast instead of each waiting for a timeout, and periodically lets a
+single probe through to detect recovery. Hedged calls send a second identical
+request when the first is unusually slow and use whichever answers first.
+"""
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, Mapping, Optional
+
+from requests.exceptions import ConnectionError, HTTPError, RequestException, Timeout
+
+from app.api.transport import get_executor
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+# Hedges that may be sent in a burst after a quiet period, beyond the budget's share
+_HEDGE_BURST = 10
+
+
+class CircuitOpenError(RequestException):
+    """Raised instead of calling upstream while the circuit breaker is open."""
+
+
+def is_upstream_failure(error: BaseException) -> bool:
+    """
+    Check whether an error indicates an unhealthy upstream.
+
+    Timeouts, connection errors and 5xx responses count; client errors such as
+    404 mean upstream answered and do not.
+
+    Args:
+        error: Error raised by an upstream call
+
+    Returns:
+        True if the error should count against the circuit breaker
+    """
+    if isinstance(error, (Timeout, ConnectionError)):
+        return True
+    if isinstance(error, HTTPError):
+        return error.response is None or error.response.status_code >= 500
+    return False
+
+
+class CircuitBreaker:
+    """Thread-safe consecutive-failure circuit breaker."""
+
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        """
+        Initialize a closed circuit breaker.
+
+        Args:
+            failure_threshold: Consecutive failures that open the circuit
+            reset_timeout: Seconds the circuit stays open before a probe call
+                is let through
+        """
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+
+        self.state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+        self.rejected = 0
+        self.trips = 0
+
+    def before_call(self) -> None:
+        """
+        Check that a call may be made.
+
+        Raises:
+            CircuitOpenError: If the circuit is open, or half open with a
+                probe call already in flight
+        """
+        with self._lock:
+            if self.state == OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+                self.state = HALF_OPEN
+                self._probing = False
+
+            if self.state == HALF_OPEN and not self._probing:
+                self._probing = True
+                return
+
+            if self.state != CLOSED:
+                self.rejected += 1
+                raise CircuitOpenError('Sleep API circuit breaker is open')
+
+    def record_success(self) -> None:
+        """Record a successful call, closing the circuit."""
+        with self._lock:
+            self.state = CLOSED
+            self._failures = 0
+            self._probing = False
+
+    def record_failure(self) -> None:
+        """Record a failed call, opening the circuit at the threshold or after a failed probe."""
+        with self._lock:
+            self._failures += 1
+            self._probing = False
+            if self.state == HALF_OPEN or (
+                self.state == CLOSED and self._failures >= self.failure_threshold
+            ):
+                self.state = OPEN
+                self._opened_at = time.monotonic()
+                self.trips += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Get circuit breaker state and counters."""
+        with self._lock:
+            return {
+                'state': self.state,
+                'consecutive_failures': self._failures,
+                'trips': self.trips,
+                'rejected': self.rejected
+            }
+
+
+class HedgedCaller:
+    """Runs calls with a second, hedged attempt when the first is slow, within a hedge budget."""
+
+    def __init__(
+        self,
+        delay: float,
+        executor: ThreadPoolExecutor,
+        max_attempts: int,
+        hedge_executor: ThreadPoolExecutor,
+        max_hedges: int,
+        budget_percent: float
+    ):
+        """
+        Initialize the caller.
+
+        Args:
+            delay: Seconds to wait for the first attempt before hedging
+            executor: Pool to run first attempts on
+            max_attempts: Number of workers of the first attempts' pool
+            hedge_executor: Pool to run hedged attempts on
+            max_hedges: Number of workers of the hedged attempts' pool
+            budget_percent: Maximum share of calls that are hedged, in percent
+        """
+        self.delay = delay
+        self.executor = executor
+        self.max_attempts = max_attempts
+        self.hedge_executor = hedge_executor
+        self.max_hedges = max_hedges
+        self.budget = budget_percent / 100
+        self._lock = threading.Lock()
+
+        self._attempts_running = 0
+        self._hedges_running = 0
+        self._tokens = float(_HEDGE_BURST)
+
+        self.calls = 0
+        self.unwatched = 0
+        self.hedged = 0
+        self.hedges_denied = 0
+        self.hedge_wins = 0
+
+    def call(self, attempt: Callable[[], Any]) -> Any:
+        """
+        Run an idempotent call, hedging it if the first attempt is slow.
+
+        The first attempt only goes to the pool when a worker is free, so
+        queueing never counts against the delay; otherwise it runs on the
+        calling thread without hedging. A hedge is only sent while the
+        budget and a hedge worker allow it.
+
+        Args:
+            attempt: Zero-argument callable making one attempt
+
+        Returns:
+            The result of the first successful attempt
+
+        Raises:
+            Exception: The first attempt's error if every attempt failed
+        """
+        with self._lock:
+            self.calls += 1
+            self._tokens = min(self._tokens + self.budget, _HEDGE_BURST)
+            watched = self._attempts_running < self.max_attempts
+            if watched:
+                self._attempts_running += 1
+            else:
+                self.unwatched += 1
+
+        if not watched:
+            return attempt()
+
+        def run_primary() -> Any:
+            try:
+                return attempt()
+            finally:
+                with self._lock:
+                    self._attempts_running -= 1
+
+        primary = self.executor.submit(run_primary)
+        done, _ = wait([primary], timeout=self.delay)
+        if done:
+            return primary.result()
+
+        with self._lock:
+            allowed = self._tokens >= 1 and self._hedges_running < self.max_hedges
+            if allowed:
+                self._tokens -= 1
+                self._hedges_running += 1
+                self.hedged += 1
+            else:
+                self.hedges_denied += 1
+
+        if not allowed:
+            return primary.result()
+
+        def run_hedge() -> Any:
+            try:
+                return attempt()
+            finally:
+                with self._lock:
+                    self._hedges_running -= 1
+
+        hedge = self.hedge_executor.submit(run_hedge)
+
+        pending = {primary, hedge}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    for other in pending:
+                        other.cancel()
+                    if future is hedge:
+                        with self._lock:
+                            self.hedge_wins += 1
+                    return future.result()
+
+        raise primary.exception()
+
+    def stats(self) -> Dict[str, Any]:
+        """Get hedging counters and the remaining hedge budget."""
+        with self._lock:
+            return {
+                'delay': self.delay,
+                'budget_percent': self.budget * 100,
+                'budget_tokens': round(self._tokens, 2),
+                'calls': self.calls,
+                'unwatched': self.unwatched,
+                'hedged': self.hedged,
+                'hedges_denied': self.hedges_denied,
+                'hedge_wins': self.hedge_wins
+            }
+
+_circuit_breaker: Optional[CircuitBreaker] = None
+_hedged_caller: Optional[HedgedCaller] = None
+_resilience_lock = threading.Lock()
+
+
+def get_circuit_breaker(config: Mapping[str, Any]) -> CircuitBreaker:
+    """
+    Get the process-wide circuit breaker, creating it on first use.
+
+    Args:
+        config: Flask application config
+
+    Returns:
+        Shared circuit breaker
+    """
+    global _circuit_breaker
+
+    if _circuit_breaker is None:
+        with _resilience_lock:
+            if _circuit_breaker is None:
+                _circuit_breaker = CircuitBreaker(
+                    failure_threshold=config['SLEEP_API_BREAKER_FAILURE_THRESHOLD'],
+                    reset_timeout=config['SLEEP_API_BREAKER_RESET_TIMEOUT']
+                )
+
+    return _circuit_breaker
+
+
+def get_hedged_caller(config: Mapping[str, Any]) -> HedgedCaller:
+    """
+    Get the process-wide hedged caller, creating it on first use.
+
+    Args:
+        config: Flask application config
+
+    Returns:
+        Shared hedged caller
+    """
+    global _hedged_caller
+
+    if _hedged_caller is None:
+        with _resilience_lock:
+            if _hedged_caller is None:
+                _hedged_caller = HedgedCaller(
+                    delay=config['SLEEP_API_HEDGE_DELAY'],
+                    executor=get_executor(config, 'attempts'),
+                    max_attempts=config['SLEEP_API_MAX_HEDGEABLE_CALLS'],
+                    hedge_executor=get_executor(config, 'hedge'),
+                    max_hedges=config['SLEEP_API_MAX_HEDGED_ATTEMPTS'],
+                    budget_percent=config['SLEEP_API_HEDGE_BUDGET_PERCENT']
+                )
+
+    return _hedged_caller
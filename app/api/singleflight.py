@@ -0,0 +1,112 @@
+"""
+Coalescing of identical concurrent upstream calls.
+
+When several threads of a worker ask for the same data at nearly the same
+moment (e.g. a page render and its follow-up chart request), only the first
+one calls upstream; the others wait for and share its result or error. A
+follower that waits longer than its timeout makes the call itself.
+"""
+import threading
+from typing import Any, Callable, Dict, Hashable, Optional
+
+
+class _Call:
+    """An in-flight call and its outcome."""
+
+    __slots__ = ('done', 'result', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """Thread-safe deduplication of concurrent calls by key."""
+
+    def __init__(self):
+        """Initialize with no calls in flight."""
+        self._calls: Dict[Hashable, _Call] = {}
+        self._lock = threading.Lock()
+
+        self.executions = 0
+        self.coalesced = 0
+        self.timeouts = 0
+
+    def do(self, key: Hashable, call: Callable[[], Any], timeout: Optional[float] = None) -> Any:
+        """
+        Run a call, or wait for an identical one already in flight.
+
+        Args:
+            key: Key identifying the call
+            call: Zero-argument callable to run if no call with the key is in flight
+            timeout: Seconds to wait for a call in flight before running
+                ``call`` independently, or None to wait until it finishes
+
+        Returns:
+            The result of the call, shared by every caller that waited for it
+
+        Raises:
+            Exception: Whatever the shared call raised
+        """
+        with self._lock:
+            flight = self._calls.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._calls[key] = _Call()
+                self.executions += 1
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            if not flight.done.wait(timeout):
+                with self._lock:
+                    self.timeouts += 1
+                return call()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+
+        try:
+            flight.result = call()
+            return flight.result
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            flight.done.set()
+
+    def stats(self) -> Dict[str, Any]:
+        """Get coalescing counters."""
+        with self._lock:
+            calls = self.executions + self.coalesced
+            return {
+                'in_flight': len(self._calls),
+                'executions': self.executions,
+                'coalesced': self.coalesced,
+                'timeouts': self.timeouts,
+                'coalesced_rate': self.coalesced / calls if calls else None
+            }
+
+
+_single_flight: Optional[SingleFlight] = None
+_single_flight_lock = threading.Lock()
+
+
+def get_single_flight() -> SingleFlight:
+    """
+    Get the process-wide call coalescer, creating it on first use.
+
+    Returns:
+        Shared call coalescer
+    """
+    global _single_flight
+
+    if _single_flight is None:
+        with _single_flight_lock:
+            if _single_flight is None:
+                _single_flight = SingleFlight()
+
+    return _single_flight
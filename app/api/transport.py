@@ -0,0 +1,127 @@
+"""
+Shared HTTP transport for the Sleep Data Microservice API.
+
+All ``SleepApiClient`` instances in a process share one pooled
+``requests.Session`` so upstream connections are kept alive and reused
+instead of being re-established for every call. A shared worker pool
+lets independent calls run concurrently on top of that session.
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Mapping, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# Only idempotent methods are retried automatically
+RETRY_METHODS = frozenset(['GET', 'HEAD', 'OPTIONS'])
+RETRY_STATUS_CODES = (502, 503, 504)
+
+_session: Optional[requests.Session] = None
+_session_lock = threading.Lock()
+
+# Worker pools by name and the setting that sizes each. Page fetches get
+# their own pool because they are started from inside 'calls' workers;
+# first and hedged request attempts and background cache refreshes get
+# theirs so they never wait behind the calls that depend on them.
+POOL_SIZE_SETTINGS = {
+    'calls': 'SLEEP_API_MAX_CONCURRENCY',
+    'pages': 'SLEEP_API_MAX_PAGES_IN_FLIGHT',
+    'attempts': 'SLEEP_API_MAX_HEDGEABLE_CALLS',
+    'hedge': 'SLEEP_API_MAX_HEDGED_ATTEMPTS',
+    'refresh': 'SLEEP_API_MAX_BACKGROUND_REFRESHES'
+}
+
+_executors: Dict[str, ThreadPoolExecutor] = {}
+_executor_lock = threading.Lock()
+
+
+def _build_session(config: Mapping[str, Any]) -> requests.Session:
+    """
+    Build a pooled session from application configuration.
+
+    Args:
+        config: Flask application config
+
+    Returns:
+        Configured requests session
+    """
+    retry = Retry(
+        total=config['SLEEP_API_MAX_RETRIES'],
+        backoff_factor=config['SLEEP_API_RETRY_BACKOFF'],
+        status_forcelist=RETRY_STATUS_CODES,
+        allowed_methods=RETRY_METHODS,
+        raise_on_status=False
+    )
+    adapter = HTTPAdapter(
+        pool_connections=config['SLEEP_API_POOL_CONNECTIONS'],
+        pool_maxsize=config['SLEEP_API_POOL_MAXSIZE'],
+        pool_block=config['SLEEP_API_POOL_BLOCK'],
+        max_retries=retry
+    )
+
+    session = requests.Session()
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+
+    if not config['SLEEP_API_KEEP_ALIVE']:
+        session.headers['Connection'] = 'close'
+
+    return session
+
+
+def get_session(config: Mapping[str, Any]) -> requests.Session:
+    """
+    Get the process-wide session, creating it on first use.
+
+    Args:
+        config: Flask application config
+
+    Returns:
+        Shared requests session
+    """
+    global _session
+
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = _build_session(config)
+
+    return _session
+
+
+def get_executor(config: Mapping[str, Any], pool: str = 'calls') -> ThreadPoolExecutor:
+    """
+    Get a process-wide worker pool used for concurrent upstream calls.
+
+    Args:
+        config: Flask application config
+        pool: Pool name, one of POOL_SIZE_SETTINGS
+
+    Returns:
+        Shared thread pool executor
+    """
+    executor = _executors.get(pool)
+
+    if executor is None:
+        with _executor_lock:
+            executor = _executors.get(pool)
+            if executor is None:
+                executor = ThreadPoolExecutor(
+                    max_workers=config[POOL_SIZE_SETTINGS[pool]],
+                    thread_name_prefix=f'sleep-api-{pool}'
+                )
+                _executors[pool] = executor
+
+    return executor
+
+
+def close_session() -> None:
+    """Close the shared session and release its pooled connections."""
+    global _session
+
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+            _session = None
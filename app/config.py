@@ -2,6 +2,7 @@
 Configuration settings for the Sleep Data Visualization application.
 """
 import os
+import tempfile
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
@@ -20,6 +21,125 @@ class Config:
     )
     SLEEP_API_TIMEOUT = int(os.environ.get('SLEEP_API_TIMEOUT', 10))
     
+    # Connection pooling for the Sleep Data Microservice API
+    SLEEP_API_POOL_CONNECTIONS = int(os.environ.get('SLEEP_API_POOL_CONNECTIONS', 10))
+    SLEEP_API_POOL_MAXSIZE = int(os.environ.get('SLEEP_API_POOL_MAXSIZE', 20))
+    SLEEP_API_POOL_BLOCK = os.environ.get('SLEEP_API_POOL_BLOCK', 'False').lower() == 'true'
+    SLEEP_API_KEEP_ALIVE = os.environ.get('SLEEP_API_KEEP_ALIVE', 'True').lower() == 'true'
+    SLEEP_API_MAX_RETRIES = int(os.environ.get('SLEEP_API_MAX_RETRIES', 2))
+    SLEEP_API_RETRY_BACKOFF = float(os.environ.get('SLEEP_API_RETRY_BACKOFF', 0.2))
+    
+    # Concurrent upstream calls
+    SLEEP_API_MAX_CONCURRENCY = int(os.environ.get('SLEEP_API_MAX_CONCURRENCY', 8))
+    SLEEP_API_DEADLINE = float(os.environ.get('SLEEP_API_DEADLINE', 10))
+    
+    # Response cache (TTLs in seconds, 0 disables caching for that endpoint)
+    SLEEP_API_CACHE_MAX_ENTRIES = int(os.environ.get('SLEEP_API_CACHE_MAX_ENTRIES', 512))
+    SLEEP_API_CACHE_MAX_BYTES = int(os.environ.get('SLEEP_API_CACHE_MAX_BYTES', 64 * 1024 * 1024))
+    SLEEP_API_CACHE_TTL_SLEEP_DATA = int(os.environ.get('SLEEP_API_CACHE_TTL_SLEEP_DATA', 300))
+    SLEEP_API_CACHE_TTL_ANALYTICS = int(os.environ.get('SLEEP_API_CACHE_TTL_ANALYTICS', 300))
+    SLEEP_API_CACHE_TTL_USERS = int(os.environ.get('SLEEP_API_CACHE_TTL_USERS', 60))
+    SLEEP_API_CACHE_TTL_CLOSED_CHUNK = int(os.environ.get('SLEEP_API_CACHE_TTL_CLOSED_CHUNK', 7 * 24 * 3600))
+    
+    # Pagination of upstream record listings
+    SLEEP_API_PAGE_SIZE = int(os.environ.get('SLEEP_API_PAGE_SIZE', 100))
+    SLEEP_API_MAX_PAGES_IN_FLIGHT = int(os.environ.get('SLEEP_API_MAX_PAGES_IN_FLIGHT', 4))
+    
+    # Pass requested record fields upstream as a 'fields' hint
+    SLEEP_API_SEND_FIELD_HINTS = os.environ.get('SLEEP_API_SEND_FIELD_HINTS', 'True').lower() == 'true'
+    
+    # Serve expired cached responses for this long while refreshing them in the background
+    SLEEP_API_CACHE_STALE_TTL = int(os.environ.get('SLEEP_API_CACHE_STALE_TTL', 600))
+    SLEEP_API_MAX_BACKGROUND_REFRESHES = int(os.environ.get('SLEEP_API_MAX_BACKGROUND_REFRESHES', 2))
+    
+    # Fail fast after consecutive upstream failures, probing again after the reset timeout
+    SLEEP_API_BREAKER_FAILURE_THRESHOLD = int(os.environ.get('SLEEP_API_BREAKER_FAILURE_THRESHOLD', 5))
+    SLEEP_API_BREAKER_RESET_TIMEOUT = float(os.environ.get('SLEEP_API_BREAKER_RESET_TIMEOUT', 30))
+    
+    # Send a second GET when the first has not answered within the delay (0 disables),
+    # for at most SLEEP_API_HEDGE_BUDGET_PERCENT of GETs; GETs beyond
+    # SLEEP_API_MAX_HEDGEABLE_CALLS at once run unhedged on the calling thread
+    SLEEP_API_HEDGE_DELAY = float(os.environ.get('SLEEP_API_HEDGE_DELAY', 1.5))
+    SLEEP_API_MAX_HEDGEABLE_CALLS = int(os.environ.get('SLEEP_API_MAX_HEDGEABLE_CALLS', 32))
+    SLEEP_API_MAX_HEDGED_ATTEMPTS = int(os.environ.get('SLEEP_API_MAX_HEDGED_ATTEMPTS', 16))
+    SLEEP_API_HEDGE_BUDGET_PERCENT = float(os.environ.get('SLEEP_API_HEDGE_BUDGET_PERCENT', 5))
+    
+    # Share one upstream call between identical concurrent requests of a worker
+    SLEEP_API_COALESCE_REQUESTS = os.environ.get('SLEEP_API_COALESCE_REQUESTS', 'True').lower() == 'true'
+    
+    # Index of where records seen in sleep data responses are held in the response cache
+    SLEEP_API_RECORD_INDEX_MAX_ENTRIES = int(os.environ.get('SLEEP_API_RECORD_INDEX_MAX_ENTRIES', 50000))
+    
+    # Directory of all users for the user picker, reloaded in the background after the TTL
+    SLEEP_USER_DIRECTORY_TTL = int(os.environ.get('SLEEP_USER_DIRECTORY_TTL', 600))
+    SLEEP_USER_SEARCH_LIMIT = int(os.environ.get('SLEEP_USER_SEARCH_LIMIT', 10))
+    SLEEP_USER_SEARCH_MAX_LIMIT = int(os.environ.get('SLEEP_USER_SEARCH_MAX_LIMIT', 100))
+    
+    # Analytics source: 'local' computes analytics from the fetched records,
+    # 'upstream' asks the Sleep API's analytics endpoint
+    SLEEP_ANALYTICS_SOURCE = os.environ.get('SLEEP_ANALYTICS_SOURCE', 'local')
+    
+    # Running per-user analytics for standard windows (days), updated as records are fetched
+    SLEEP_ANALYTICS_INCREMENTAL = os.environ.get('SLEEP_ANALYTICS_INCREMENTAL', 'True').lower() == 'true'
+    SLEEP_ANALYTICS_WINDOWS = tuple(
+        int(days) for days in os.environ.get('SLEEP_ANALYTICS_WINDOWS', '7,14,30,90,180,365').split(',')
+    )
+    SLEEP_ANALYTICS_MAX_USERS = int(os.environ.get('SLEEP_ANALYTICS_MAX_USERS', 1000))
+    
+    # Directory for data persisted across restarts and shared by worker processes
+    SLEEP_DATA_DIR = os.environ.get(
+        'SLEEP_DATA_DIR', os.path.join(tempfile.gettempdir(), 'sleep-metrics-visu')
+    )
+    
+    # Daily/weekly/monthly rollups; long windows are charted at the finest
+    # resolution that fits in SLEEP_ROLLUP_MAX_POINTS points
+    SLEEP_ROLLUPS_ENABLED = os.environ.get('SLEEP_ROLLUPS_ENABLED', 'True').lower() == 'true'
+    SLEEP_ROLLUP_DB_PATH = os.environ.get('SLEEP_ROLLUP_DB_PATH', os.path.join(SLEEP_DATA_DIR, 'rollups.sqlite3'))
+    SLEEP_ROLLUP_MAX_POINTS = int(os.environ.get('SLEEP_ROLLUP_MAX_POINTS', 60))
+    
+    # Memory-mapped cache of nightly time series column files, bounded in bytes on disk
+    SLEEP_TIME_SERIES_CACHE_ENABLED = os.environ.get('SLEEP_TIME_SERIES_CACHE_ENABLED', 'True').lower() == 'true'
+    SLEEP_TIME_SERIES_DIR = os.environ.get('SLEEP_TIME_SERIES_DIR', os.path.join(SLEEP_DATA_DIR, 'timeseries'))
+    SLEEP_TIME_SERIES_MAX_BYTES = int(os.environ.get('SLEEP_TIME_SERIES_MAX_BYTES', 1024 * 1024 * 1024))
+    
+    # Point budget per series of downsampled time series charts
+    SLEEP_TIME_SERIES_DEFAULT_POINTS = int(os.environ.get('SLEEP_TIME_SERIES_DEFAULT_POINTS', 500))
+    SLEEP_TIME_SERIES_MAX_POINTS = int(os.environ.get('SLEEP_TIME_SERIES_MAX_POINTS', 5000))
+    
+    # Compression of dashboard JSON responses (brotli when installed, else gzip)
+    SLEEP_COMPRESSION_ENABLED = os.environ.get('SLEEP_COMPRESSION_ENABLED', 'True').lower() == 'true'
+    SLEEP_COMPRESSION_MIN_BYTES = int(os.environ.get('SLEEP_COMPRESSION_MIN_BYTES', 1024))
+    SLEEP_COMPRESSION_GZIP_LEVEL = int(os.environ.get('SLEEP_COMPRESSION_GZIP_LEVEL', 6))
+    SLEEP_COMPRESSION_BROTLI_QUALITY = int(os.environ.get('SLEEP_COMPRESSION_BROTLI_QUALITY', 5))
+    
+    # Night digests of chart payloads, kept this long in their own cache to answer delta requests
+    SLEEP_CHART_DELTA_TTL = int(os.environ.get('SLEEP_CHART_DELTA_TTL', 3600))
+    SLEEP_CHART_DELTA_MAX_ENTRIES = int(os.environ.get('SLEEP_CHART_DELTA_MAX_ENTRIES', 5000))
+    SLEEP_CHART_DELTA_MAX_BYTES = int(os.environ.get('SLEEP_CHART_DELTA_MAX_BYTES', 16 * 1024 * 1024))
+    
+    # Seconds between background chart refreshes on the dashboard (0 disables)
+    SLEEP_CHART_REFRESH_SECONDS = int(os.environ.get('SLEEP_CHART_REFRESH_SECONDS', 300))
+    
+    # Streamed exports are sent in blocks of at least this many bytes
+    SLEEP_EXPORT_CHUNK_BYTES = int(os.environ.get('SLEEP_EXPORT_CHUNK_BYTES', 64 * 1024))
+    
+    # Cache of rendered dashboard fragments (summary cards, breakdown tables) per data version
+    SLEEP_FRAGMENT_CACHE_MAX_ENTRIES = int(os.environ.get('SLEEP_FRAGMENT_CACHE_MAX_ENTRIES', 2000))
+    SLEEP_FRAGMENT_CACHE_MAX_BYTES = int(os.environ.get('SLEEP_FRAGMENT_CACHE_MAX_BYTES', 16 * 1024 * 1024))
+    SLEEP_FRAGMENT_CACHE_TTL = int(os.environ.get('SLEEP_FRAGMENT_CACHE_TTL', 3600))
+    
+    # Cache of metrics derived from record time series (architecture, rolling statistics)
+    SLEEP_METRICS_CACHE_MAX_ENTRIES = int(os.environ.get('SLEEP_METRICS_CACHE_MAX_ENTRIES', 20000))
+    SLEEP_METRICS_CACHE_MAX_BYTES = int(os.environ.get('SLEEP_METRICS_CACHE_MAX_BYTES', 32 * 1024 * 1024))
+    SLEEP_METRICS_CACHE_TTL = int(os.environ.get('SLEEP_METRICS_CACHE_TTL', 7 * 24 * 3600))
+    
+    # Window of rolling heart rate and respiration statistics
+    SLEEP_ROLLING_WINDOW_MINUTES = float(os.environ.get('SLEEP_ROLLING_WINDOW_MINUTES', 5))
+    
+    # Sorted record indexes behind the paginated records table
+    SLEEP_RECORD_TABLE_MAX_TABLES = int(os.environ.get('SLEEP_RECORD_TABLE_MAX_TABLES', 200))
+    SLEEP_RECORD_TABLE_MAX_PER_PAGE = int(os.environ.get('SLEEP_RECORD_TABLE_MAX_PER_PAGE', 100))
+    
     # Application settings
     ITEMS_PER_PAGE = int(os.environ.get('ITEMS_PER_PAGE', 10))
     DEFAULT_DATE_RANGE_DAYS = int(os.environ.get('DEFAULT_DATE_RANGE_DAYS', 7))
\ No newline at end of file
@@ -5,16 +5,20 @@ from app.models.sleep_data import (
     SleepPhases,
     HeartRateData,
     SleepTimeSeriesPoint,
+    SleepTimeSeries,
     SleepRecord,
     SleepTrend,
     SleepAnalytics
 )
+from app.models.sleep_batch import SleepRecordBatch
 
 __all__ = [
     'SleepPhases',
     'HeartRateData',
     'SleepTimeSeriesPoint',
+    'SleepTimeSeries',
     'SleepRecord',
     'SleepTrend',
-    'SleepAnalytics'
+    'SleepAnalytics',
+    'SleepRecordBatch'
 ]
\ No newline at end of file
@@ -0,0 +1,140 @@
+"""
+Columnar model for many sleep records.
+"""
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+import numpy as np
+
+from app.models.sleep_data import SleepRecord, parse_timestamps
+
+_EMPTY: Dict[str, Any] = {}
+
+
+def _column(values: List[Dict[str, Any]], key: str) -> np.ndarray:
+    """Extract a numeric field from a list of dictionaries, using NaN for missing values."""
+    return np.fromiter(
+        (np.nan if item.get(key) is None else item[key] for item in values),
+        dtype=np.float64,
+        count=len(values)
+    )
+
+
+def _to_list(values: np.ndarray) -> List[Optional[float]]:
+    """Convert a float column to a JSON-friendly list with None for NaN."""
+    return np.where(np.isnan(values), None, values).tolist()
+
+
+class SleepRecordBatch:
+    """Columnar view of many sleep records backed by NumPy arrays."""
+
+    # Record fields needed to build the chart payload
+    CHART_FIELDS = ('date', 'duration_minutes', 'sleep_quality', 'sleep_phases', 'heart_rate')
+
+    def __init__(self, records: List[Dict[str, Any]], fields: Optional[Iterable[str]] = None):
+        """
+        Initialize the batch from a list of sleep record dictionaries.
+
+        Args:
+            records: Sleep records as returned by the Sleep API
+            fields: Optional fields to parse; columns of nested data outside
+                them (sleep phases, heart rate) are left as NaN
+        """
+        self._records = records
+        self._fields = tuple(fields) if fields is not None else None
+
+        no_data = [_EMPTY] * len(records)
+        phases = (
+            [record.get('sleep_phases') or _EMPTY for record in records]
+            if fields is None or 'sleep_phases' in self._fields else no_data
+        )
+        heart_rate = (
+            [record.get('heart_rate') or _EMPTY for record in records]
+            if fields is None or 'heart_rate' in self._fields else no_data
+        )
+
+        self.dates = np.array(
+            [str(record.get('date'))[:10] for record in records], dtype='datetime64[D]'
+        )
+        self.sleep_start = parse_timestamps([record.get('sleep_start') for record in records])
+        self.duration_minutes = _column(records, 'duration_minutes')
+        self.sleep_quality = _column(records, 'sleep_quality')
+
+        self.deep_sleep_minutes = _column(phases, 'deep_sleep_minutes')
+        self.rem_sleep_minutes = _column(phases, 'rem_sleep_minutes')
+        self.light_sleep_minutes = _column(phases, 'light_sleep_minutes')
+        self.awake_minutes = _column(phases, 'awake_minutes')
+
+        self.heart_rate_average = _column(heart_rate, 'average')
+        self.heart_rate_min = _column(heart_rate, 'min')
+        self.heart_rate_max = _column(heart_rate, 'max')
+        self.heart_rate_resting = _column(heart_rate, 'resting')
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def __iter__(self) -> Iterator[SleepRecord]:
+        """Iterate over row-level SleepRecord views, e.g. for templates."""
+        return (SleepRecord(record, self._fields) for record in self._records)
+
+    def __getitem__(self, index: int) -> SleepRecord:
+        return SleepRecord(self._records[index], self._fields)
+
+    @property
+    def duration_hours(self) -> np.ndarray:
+        """Get sleep durations in hours."""
+        return np.nan_to_num(self.duration_minutes) / 60
+
+    def _percentage(self, minutes: np.ndarray) -> np.ndarray:
+        """Get phase minutes as a percentage of total sleep time, NaN where unavailable."""
+        valid = (minutes > 0) & (self.duration_minutes > 0)
+        return np.divide(
+            minutes * 100, self.duration_minutes,
+            out=np.full(len(minutes), np.nan), where=valid
+        )
+
+    @property
+    def deep_sleep_percentage(self) -> np.ndarray:
+        """Get deep sleep as a percentage of total sleep time."""
+        return self._percentage(self.deep_sleep_minutes)
+
+    @property
+    def rem_sleep_percentage(self) -> np.ndarray:
+        """Get REM sleep as a percentage of total sleep time."""
+        return self._percentage(self.rem_sleep_minutes)
+
+    @property
+    def light_sleep_percentage(self) -> np.ndarray:
+        """Get light sleep as a percentage of total sleep time."""
+        return self._percentage(self.light_sleep_minutes)
+
+    @property
+    def awake_percentage(self) -> np.ndarray:
+        """Get awake time as a percentage of total sleep time."""
+        return self._percentage(self.awake_minutes)
+
+    def to_chart_data(self, extra: Optional[Dict[str, List[Any]]] = None) -> Dict[str, List[Any]]:
+        """
+        Build the chart payload, one aligned entry per night in date order.
+
+        Args:
+            extra: Optional additional series, aligned with the batch's records
+
+        Returns:
+            Dictionary of chart series, with None for missing values
+        """
+        order = np.argsort(self.dates, kind='stable')
+
+        chart_data = {
+            'dates': self.dates[order].astype(str).tolist(),
+            'sleep_quality': _to_list(self.sleep_quality[order]),
+            'duration_hours': self.duration_hours[order].tolist(),
+            'deep_sleep_percentage': _to_list(self.deep_sleep_percentage[order]),
+            'rem_sleep_percentage': _to_list(self.rem_sleep_percentage[order]),
+            'light_sleep_percentage': _to_list(self.light_sleep_percentage[order]),
+            'heart_rate_avg': _to_list(self.heart_rate_average[order]),
+        }
+
+        for name, values in (extra or {}).items():
+            chart_data[name] = [values[index] for index in order]
+
+        return chart_data
@@ -1,8 +1,16 @@
 """
 Data models for sleep metrics.
 """
-from datetime import datetime
-from typing import Dict, List, Optional, Any, Union
+from datetime import datetime, timezone
+from typing import TYPE_CHECKING, Dict, Iterable, Iterator, List, Optional, Any, Union
+
+import numpy as np
+
+if TYPE_CHECKING:
+    from app.models.sleep_batch import SleepRecordBatch
+
+# Known sleep stages; their position is the stage code used in arrays
+SLEEP_STAGES = ('awake', 'light', 'deep', 'rem')
 
 
 class SleepPhases:
@@ -69,6 +77,8 @@ class HeartRateData:
 class SleepTimeSeriesPoint:
     """Model for a single point in sleep time series data."""
     
+    __slots__ = ('timestamp', 'stage', 'heart_rate', 'movement', 'respiration_rate')
+    
     def __init__(self, data: Dict[str, Any]):
         """
         Initialize time series point from dictionary.
@@ -85,6 +95,24 @@ class SleepTimeSeriesPoint:
         self.movement = data.get('movement')
         self.respiration_rate = data.get('respiration_rate')
     
+    @classmethod
+    def from_values(
+        cls,
+        timestamp: datetime,
+        stage: Optional[str],
+        heart_rate: Optional[float],
+        movement: Optional[float],
+        respiration_rate: Optional[float]
+    ) -> 'SleepTimeSeriesPoint':
+        """Create a point from already parsed values."""
+        point = cls.__new__(cls)
+        point.timestamp = timestamp
+        point.stage = stage
+        point.heart_rate = heart_rate
+        point.movement = movement
+        point.respiration_rate = respiration_rate
+        return point
+    
     def to_dict(self) -> Dict[str, Any]:
         """Convert to dictionary."""
         return {
@@ -96,16 +124,252 @@ class SleepTimeSeriesPoint:
         }
 
 
+def parse_timestamps(values: List[Any]) -> np.ndarray:
+    """
+    Parse ISO timestamps into a datetime64 array.
+    
+    Timezone-aware timestamps are converted to naive UTC; missing values
+    become NaT.
+    
+    Args:
+        values: ISO strings, datetime objects or None
+        
+    Returns:
+        Array of datetime64[us]
+    """
+    # NumPy only parses naive ISO strings cleanly (it warns on timezones),
+    # so strings with a 'Z' or '+hh:mm' suffix, or a '-' beyond the two of
+    # the date, and datetime objects take the slower per-value path
+    try:
+        joined = ''.join(filter(None, values))
+    except TypeError:
+        joined = None
+    
+    if (joined is not None and 'Z' not in joined and '+' not in joined
+            and joined.count('-') <= 2 * (len(values) - values.count(None))):
+        try:
+            return np.array(values, dtype='datetime64[us]')
+        except ValueError:
+            pass
+    
+    parsed = []
+    for value in values:
+        if isinstance(value, str):
+            value = datetime.fromisoformat(value)
+        if value is not None and value.tzinfo is not None:
+            value = value.astimezone(timezone.utc).replace(tzinfo=None)
+        parsed.append(value)
+    return np.array(parsed, dtype='datetime64[us]')
+
+
+def _float_column(points: List[Dict[str, Any]], key: str) -> np.ndarray:
+    """Extract a numeric field from time series points, using NaN for missing values."""
+    return np.fromiter(
+        (np.nan if point.get(key) is None else point[key] for point in points),
+        dtype=np.float32,
+        count=len(points)
+    )
+
+
+class SleepTimeSeries:
+    """
+    Compact, lazily parsed time series of a sleep record.
+    
+    The raw points are kept as received and only parsed into typed arrays
+    (timestamps, stage codes, heart rate, movement, respiration rate) on
+    first access. Series can also be backed by existing arrays, such as
+    memory maps. Iterating yields SleepTimeSeriesPoint views.
+    """
+    
+    __slots__ = (
+        '_points', '_timestamps', '_stage_codes', '_stage_labels',
+        '_heart_rate', '_movement', '_respiration_rate'
+    )
+    
+    def __init__(self, points: Optional[List[Dict[str, Any]]] = None):
+        """
+        Initialize the time series from a list of point dictionaries.
+        
+        Args:
+            points: Time series points as returned by the Sleep API
+        """
+        self._points = points or []
+        self._timestamps = None
+    
+    @classmethod
+    def from_arrays(
+        cls,
+        timestamps: np.ndarray,
+        stage_codes: np.ndarray,
+        stage_labels: Iterable[str],
+        heart_rate: np.ndarray,
+        movement: np.ndarray,
+        respiration_rate: np.ndarray
+    ) -> 'SleepTimeSeries':
+        """
+        Create a time series from already parsed, aligned arrays.
+        
+        The arrays are used as given (e.g. memory maps) without copying.
+        """
+        series = cls.__new__(cls)
+        series._points = None
+        series._timestamps = timestamps
+        series._stage_codes = stage_codes
+        series._stage_labels = tuple(stage_labels)
+        series._heart_rate = heart_rate
+        series._movement = movement
+        series._respiration_rate = respiration_rate
+        return series
+    
+    def __len__(self) -> int:
+        if self._points is None:
+            return len(self._timestamps)
+        return len(self._points)
+    
+    def _parse(self) -> None:
+        """Parse the raw points into typed arrays."""
+        points = self._points
+        
+        stages = [point.get('stage') for point in points]
+        labels = list(SLEEP_STAGES) + sorted(
+            {stage for stage in stages if stage is not None} - set(SLEEP_STAGES)
+        )
+        codes = {label: code for code, label in enumerate(labels)}
+        
+        self._stage_labels = tuple(labels)
+        self._stage_codes = np.fromiter(
+            (codes.get(stage, -1) for stage in stages), dtype=np.int8, count=len(points)
+        )
+        self._heart_rate = _float_column(points, 'heart_rate')
+        self._movement = _float_column(points, 'movement')
+        self._respiration_rate = _float_column(points, 'respiration_rate')
+        self._timestamps = parse_timestamps([point['timestamp'] for point in points])
+    
+    @property
+    def timestamps(self) -> np.ndarray:
+        """Get sample timestamps as datetime64[us]."""
+        if self._timestamps is None:
+            self._parse()
+        return self._timestamps
+    
+    @property
+    def stage_codes(self) -> np.ndarray:
+        """Get sleep stage codes, indexing stage_labels (-1 if unknown)."""
+        if self._timestamps is None:
+            self._parse()
+        return self._stage_codes
+    
+    @property
+    def stage_labels(self) -> tuple:
+        """Get the stage names that stage codes refer to."""
+        if self._timestamps is None:
+            self._parse()
+        return self._stage_labels
+    
+    @property
+    def heart_rate(self) -> np.ndarray:
+        """Get heart rate samples (NaN if missing)."""
+        if self._timestamps is None:
+            self._parse()
+        return self._heart_rate
+    
+    @property
+    def movement(self) -> np.ndarray:
+        """Get movement samples (NaN if missing)."""
+        if self._timestamps is None:
+            self._parse()
+        return self._movement
+    
+    @property
+    def respiration_rate(self) -> np.ndarray:
+        """Get respiration rate samples (NaN if missing)."""
+        if self._timestamps is None:
+            self._parse()
+        return self._respiration_rate
+    
+    def __getitem__(self, index: int) -> SleepTimeSeriesPoint:
+        """Get a point view."""
+        code = int(self.stage_codes[index])
+        
+        def value(column: np.ndarray) -> Optional[float]:
+            item = column[index].item()
+            return None if item != item else item
+        
+        return SleepTimeSeriesPoint.from_values(
+            timestamp=self.timestamps[index].item(),
+            stage=self.stage_labels[code] if code >= 0 else None,
+            heart_rate=value(self.heart_rate),
+            movement=value(self.movement),
+            respiration_rate=value(self.respiration_rate)
+        )
+    
+    def __iter__(self) -> Iterator[SleepTimeSeriesPoint]:
+        return (self[index] for index in range(len(self)))
+    
+    def index_range(self, start: Optional[datetime] = None, end: Optional[datetime] = None) -> slice:
+        """
+        Get the positions of the samples within a time range.
+        
+        Args:
+            start: Optional first timestamp to include (naive UTC)
+            end: Optional last timestamp to include (naive UTC)
+            
+        Returns:
+            Slice selecting the samples in aligned arrays
+        """
+        first = 0 if start is None else np.searchsorted(self.timestamps, np.datetime64(start, 'us'), 'left')
+        last = len(self) if end is None else np.searchsorted(self.timestamps, np.datetime64(end, 'us'), 'right')
+        return slice(int(first), int(last))
+    
+    def between(self, start: Optional[datetime] = None, end: Optional[datetime] = None) -> 'SleepTimeSeries':
+        """
+        Get the samples within a time range, as views of this series' arrays.
+        
+        Args:
+            start: Optional first timestamp to include (naive UTC)
+            end: Optional last timestamp to include (naive UTC)
+            
+        Returns:
+            Time series sharing this series' array memory
+        """
+        window = self.index_range(start, end)
+        
+        return SleepTimeSeries.from_arrays(
+            timestamps=self.timestamps[window],
+            stage_codes=self.stage_codes[window],
+            stage_labels=self.stage_labels,
+            heart_rate=self.heart_rate[window],
+            movement=self.movement[window],
+            respiration_rate=self.respiration_rate[window]
+        )
+    
+    def to_list(self) -> List[Dict[str, Any]]:
+        """Convert to a list of point dictionaries."""
+        if self._points is None:
+            return [point.to_dict() for point in self]
+        return self._points
+
+
 class SleepRecord:
     """Model for a sleep record."""
     
-    def __init__(self, data: Dict[str, Any]):
+    # Record fields other than the time series
+    SUMMARY_FIELDS = (
+        'record_id', 'user_id', 'date', 'sleep_start', 'sleep_end',
+        'duration_minutes', 'sleep_phases', 'sleep_quality', 'heart_rate'
+    )
+    
+    def __init__(self, data: Dict[str, Any], fields: Optional[Iterable[str]] = None):
         """
         Initialize sleep record from dictionary.
         
         Args:
             data: Dictionary containing sleep record data
+            fields: Optional fields to parse; nested data outside them
+                (sleep phases, heart rate, time series) is skipped
         """
+        fields = set(fields) if fields is not None else None
+        
         self.record_id = data.get('record_id')
         self.user_id = data.get('user_id')
         self.date = data.get('date')
@@ -113,11 +377,11 @@ class SleepRecord:
         # Convert string timestamps to datetime objects
         self.sleep_start = (
             datetime.fromisoformat(data['sleep_start']) 
-            if isinstance(data['sleep_start'], str) else data['sleep_start']
+            if isinstance(data.get('sleep_start'), str) else data.get('sleep_start')
         )
         self.sleep_end = (
             datetime.fromisoformat(data['sleep_end']) 
-            if isinstance(data['sleep_end'], str) else data['sleep_end']
+            if isinstance(data.get('sleep_end'), str) else data.get('sleep_end')
         )
         
         self.duration_minutes = data.get('duration_minutes')
@@ -125,7 +389,8 @@ class SleepRecord:
         # Process sleep phases if available
         self.sleep_phases = (
             SleepPhases(data['sleep_phases']) 
-            if data.get('sleep_phases') else None
+            if data.get('sleep_phases') and (fields is None or 'sleep_phases' in fields)
+            else None
         )
         
         self.sleep_quality = data.get('sleep_quality')
@@ -133,13 +398,13 @@ class SleepRecord:
         # Process heart rate data if available
         self.heart_rate = (
             HeartRateData(data['heart_rate']) 
-            if data.get('heart_rate') else None
+            if data.get('heart_rate') and (fields is None or 'heart_rate' in fields)
+            else None
         )
         
-        # Process time series data if available
-        self.time_series = (
-            [SleepTimeSeriesPoint(point) for point in data['time_series']]
-            if data.get('time_series') else []
+        # Keep time series data compact; it is parsed on first access
+        self.time_series = SleepTimeSeries(
+            data.get('time_series') if fields is None or 'time_series' in fields else None
         )
     
     @property
@@ -185,8 +450,8 @@ class SleepRecord:
             'record_id': self.record_id,
             'user_id': self.user_id,
             'date': self.date,
-            'sleep_start': self.sleep_start.isoformat(),
-            'sleep_end': self.sleep_end.isoformat(),
+            'sleep_start': self.sleep_start.isoformat() if self.sleep_start else None,
+            'sleep_end': self.sleep_end.isoformat() if self.sleep_end else None,
             'duration_minutes': self.duration_minutes,
             'duration_hours': self.duration_hours,
             'sleep_quality': self.sleep_quality
@@ -206,7 +471,7 @@ class SleepRecord:
         
         # Add time series data if available
         if self.time_series:
-            result['time_series'] = [point.to_dict() for point in self.time_series]
+            result['time_series'] = self.time_series.to_list()
         
         return result
 
@@ -278,6 +543,31 @@ class SleepAnalytics:
         # Process recommendations
         self.recommendations = data.get('recommendations', [])
     
+    @classmethod
+    def from_records(
+        cls,
+        batch: 'SleepRecordBatch',
+        user_id: str,
+        start_date: datetime,
+        end_date: datetime
+    ) -> 'SleepAnalytics':
+        """
+        Compute sleep analytics locally from already fetched records.
+        
+        Args:
+            batch: Sleep records of the analysis window
+            user_id: User identifier
+            start_date: Start of the analysis window
+            end_date: End of the analysis window
+            
+        Returns:
+            Sleep analytics computed from the records
+        """
+        # Imported here because the engine depends on this module
+        from app.analytics.engine import compute_sleep_analytics
+        
+        return cls(compute_sleep_analytics(batch, user_id, start_date, end_date))
+    
     @property
     def average_duration_hours(self) -> Optional[float]:
         """Get average sleep duration in hours."""
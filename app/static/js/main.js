@@ -48,6 +48,36 @@ const fetchData = async (url, options = {}) => {
     }
 };
 
+// Typed arrays: replace {dtype, bdata[, offset]} objects of compact chart
+// payloads with typed arrays, which Plotly plots directly
+const TYPED_ARRAYS = { float32: Float32Array, float64: Float64Array, int32: Int32Array };
+
+const decodeTypedArrays = (value) => {
+    if (Array.isArray(value)) {
+        return value.map(decodeTypedArrays);
+    }
+    if (value === null || typeof value !== 'object') {
+        return value;
+    }
+    if (typeof value.bdata === 'string' && TYPED_ARRAYS[value.dtype]) {
+        const binary = atob(value.bdata);
+        const bytes = new Uint8Array(binary.length);
+        for (let i = 0; i < binary.length; i++) {
+            bytes[i] = binary.charCodeAt(i);
+        }
+        const array = new TYPED_ARRAYS[value.dtype](bytes.buffer);
+        return value.offset ? Float64Array.from(array, item => item + value.offset) : array;
+    }
+    return Object.fromEntries(
+        Object.entries(value).map(([key, item]) => [key, decodeTypedArrays(item)])
+    );
+};
+
+// Whether a series has any value (missing values are null or NaN)
+const hasValues = (values) => {
+    return Boolean(values) && Array.prototype.some.call(values, value => Number.isFinite(value));
+};
+
 // Chart configuration
 const chartConfig = {
     responsive: true,
@@ -62,5 +92,7 @@ window.sleepMetricsUtils = {
     formatDuration,
     handleError,
     fetchData,
+    decodeTypedArrays,
+    hasValues,
     chartConfig
 }; 
\ No newline at end of file
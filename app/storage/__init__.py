@@ -0,0 +1,10 @@
+"""
+Persistent local storage for the Sleep Data Visualization application.
+"""
+from app.storage.rollups import RollupStore, choose_resolution, get_rollup_store, rollup_averages, rollup_chart_data
+from app.storage.timeseries import TimeSeriesStore, get_time_series_store
+
+__all__ = [
+    'RollupStore', 'choose_resolution', 'get_rollup_store', 'rollup_averages', 'rollup_chart_data',
+    'TimeSeriesStore', 'get_time_series_store'
+]
@@ -0,0 +1,251 @@
+"""
+In-memory sorted indexes of sleep records for paginated tables.
+
+The records of a dashboard window are turned once into columns with their
+sort orders precomputed. Every page request then only filters and slices
+index arrays, so its cost and size do not depend on how many records the
+window holds.
+"""
+import threading
+from collections import OrderedDict
+from datetime import date
+from typing import Any, Dict, Hashable, List, Mapping, Optional, Tuple
+
+import numpy as np
+
+from app.models.sleep_batch import SleepRecordBatch
+
+# Columns records can be sorted and filtered by
+SORT_COLUMNS = ('date', 'quality', 'duration')
+
+# Inclusive (low, high) bounds per column; either bound may be None
+Filters = Mapping[str, Tuple[Any, Any]]
+
+
+def _value(value: float) -> Optional[float]:
+    """Convert a column value to a JSON-friendly number, None for NaN."""
+    return None if np.isnan(value) else float(value)
+
+
+class RecordTable:
+    """Sorted, filterable and paginated view of the records of a window."""
+
+    def __init__(self, records: List[Dict[str, Any]]):
+        """
+        Index records.
+
+        Args:
+            records: Sleep records as returned by the Sleep API
+        """
+        batch = SleepRecordBatch(records)
+        self.record_ids = [record.get('record_id') for record in records]
+
+        self.columns = {
+            'date': batch.dates,
+            'quality': batch.sleep_quality,
+            'duration': batch.duration_minutes / 60
+        }
+        self._rows = {
+            'deep_sleep_minutes': batch.deep_sleep_minutes,
+            'rem_sleep_minutes': batch.rem_sleep_minutes,
+            'heart_rate_average': batch.heart_rate_average
+        }
+
+        # Ascending orders, ties by date and missing values last
+        self._orders = {'date': np.argsort(batch.dates, kind='stable')}
+        self._missing = {'date': 0}
+        for column in ('quality', 'duration'):
+            values = self.columns[column]
+            order = np.lexsort((batch.dates, values))
+            self._orders[column] = order
+            self._missing[column] = int(np.isnan(values).sum())
+
+    def __len__(self) -> int:
+        return len(self.record_ids)
+
+    def _order(self, sort: str, descending: bool) -> np.ndarray:
+        """Get the record order for a sort column, keeping missing values last."""
+        order = self._orders[sort]
+        if not descending:
+            return order
+
+        present = len(order) - self._missing[sort]
+        return np.concatenate([order[:present][::-1], order[present:]])
+
+    def _mask(self, filters: Filters) -> np.ndarray:
+        """Get which records pass all filters."""
+        mask = np.ones(len(self), dtype=bool)
+        for column, (low, high) in filters.items():
+            values = self.columns[column]
+            if column == 'date':
+                low = np.datetime64(low, 'D') if low is not None else None
+                high = np.datetime64(high, 'D') if high is not None else None
+            if low is not None:
+                mask &= values >= low
+            if high is not None:
+                mask &= values <= high
+        return mask
+
+    def row(self, index: int) -> Dict[str, Any]:
+        """
+        Get the table row of a record.
+
+        Args:
+            index: Position of the record
+
+        Returns:
+            Dictionary of the record's id, date and table values, None where missing
+        """
+        row = {
+            'record_id': self.record_ids[index],
+            'date': str(self.columns['date'][index]),
+            'sleep_quality': _value(self.columns['quality'][index]),
+            'duration_hours': _value(self.columns['duration'][index])
+        }
+        for name, values in self._rows.items():
+            row[name] = _value(values[index])
+        return row
+
+    def page(
+        self,
+        page: int,
+        per_page: int,
+        sort: str = 'date',
+        descending: bool = True,
+        filters: Optional[Filters] = None
+    ) -> Dict[str, Any]:
+        """
+        Get a page of records.
+
+        Args:
+            page: Page number, starting at 1
+            per_page: Records per page
+            sort: One of SORT_COLUMNS
+            descending: Whether to sort in descending order
+            filters: Inclusive bounds per column of SORT_COLUMNS; dates as
+                date objects or YYYY-MM-DD strings
+
+        Returns:
+            Dictionary with the page's 'records' rows, the 'page' number,
+            'per_page', the 'total' of matching records and the number of 'pages'
+        """
+        order = self._order(sort, descending)
+        if filters:
+            order = order[self._mask(filters)[order]]
+
+        total = len(order)
+        pages = max(1, -(-total // per_page))
+        page = min(max(page, 1), pages)
+        start = (page - 1) * per_page
+
+        return {
+            'records': [self.row(index) for index in order[start:start + per_page]],
+            'page': page,
+            'per_page': per_page,
+            'total': total,
+            'pages': pages
+        }
+
+
+class RecordTableStore:
+    """Thread-safe LRU cache of record tables per user, window and data version."""
+
+    def __init__(self, max_tables: int):
+        """
+        Initialize the store.
+
+        Args:
+            max_tables: Maximum number of tables kept across all users
+        """
+        self.max_tables = max_tables
+
+        self._tables: 'OrderedDict[Tuple[str, date, date], Tuple[Hashable, RecordTable]]' = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, user_id: str, start: date, end: date, version: Hashable) -> Optional[RecordTable]:
+        """
+        Get the table of a window if it was built from the current data.
+
+        Args:
+            user_id: User identifier
+            start: First day of the window
+            end: Last day of the window
+            version: Current version of the window's data
+
+        Returns:
+            The table, or None if missing or built from another version
+        """
+        key = (user_id, start, end)
+        with self._lock:
+            entry = self._tables.get(key)
+            if entry is None or entry[0] != version:
+                self.misses += 1
+                return None
+
+            self._tables.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, user_id: str, start: date, end: date, version: Hashable, table: RecordTable) -> None:
+        """
+        Store the table of a window, replacing older versions.
+
+        Args:
+            user_id: User identifier
+            start: First day of the window
+            end: Last day of the window
+            version: Version of the data the table was built from
+            table: Record table
+        """
+        key = (user_id, start, end)
+        with self._lock:
+            self._tables[key] = (version, table)
+            self._tables.move_to_end(key)
+
+            while len(self._tables) > self.max_tables:
+                self._tables.popitem(last=False)
+
+    def invalidate_user(self, user_id: str) -> None:
+        """Remove all tables of a user."""
+        with self._lock:
+            for key in [key for key in self._tables if key[0] == user_id]:
+                del self._tables[key]
+
+    def stats(self) -> Dict[str, Any]:
+        """Get table counts and hit/miss counters."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'tables': len(self._tables),
+                'records': sum(len(table) for _, table in self._tables.values()),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else None
+            }
+
+
+_record_table_store: Optional[RecordTableStore] = None
+_record_table_store_lock = threading.Lock()
+
+
+def get_record_table_store(config: Mapping[str, Any]) -> RecordTableStore:
+    """
+    Get the process-wide store of record tables, creating it on first use.
+
+    Args:
+        config: Flask application config
+
+    Returns:
+        Shared record table store
+    """
+    global _record_table_store
+
+    if _record_table_store is None:
+        with _record_table_store_lock:
+            if _record_table_store is None:
+                _record_table_store = RecordTableStore(config['SLEEP_RECORD_TABLE_MAX_TABLES'])
+
+    return _record_table_store
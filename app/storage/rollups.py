@@ -0,0 +1,383 @@
+"""
+Precomputed daily, weekly and monthly sleep rollups.
+
+Fetched sleep records are aggregated per user into daily rows, from which
+weekly (starting Monday) and monthly rows are derived. Long windows are then
+charted from tens of coarse rows instead of hundreds of full records.
+Rollups live in a SQLite database, so they survive restarts and are shared
+by all worker processes.
+"""
+import os
+import sqlite3
+import threading
+from datetime import date, timedelta
+from typing import Any, Dict, List, Mapping, Optional
+
+from app.api.ranges import DateRange, merge_ranges, month_end, month_start, record_day
+
+RESOLUTIONS = ('day', 'week', 'month')
+
+# Record fields the rollups are computed from
+RECORD_FIELDS = ('date', 'duration_minutes', 'sleep_quality', 'sleep_phases', 'heart_rate')
+
+# Aggregated measures; each is stored as a count of available values and their sum
+MEASURES = ('duration', 'quality', 'deep_sleep', 'rem_sleep', 'light_sleep', 'heart_rate')
+
+# SQL expressions mapping a day row's period to its week / month period
+_PERIOD_SQL = {
+    'week': "date(period, '-' || ((CAST(strftime('%w', period) AS INTEGER) + 6) % 7) || ' days')",
+    'month': "strftime('%Y-%m-01', period)"
+}
+
+_COLUMNS = ['records'] + [f'{measure}_{part}' for measure in MEASURES for part in ('count', 'sum')]
+
+_SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS sleep_rollups (
+    user_id TEXT NOT NULL,
+    resolution TEXT NOT NULL,
+    period TEXT NOT NULL,
+    {', '.join(f"{column} {'REAL' if column.endswith('_sum') else 'INTEGER'} NOT NULL" for column in _COLUMNS)},
+    PRIMARY KEY (user_id, resolution, period)
+);
+CREATE TABLE IF NOT EXISTS sleep_rollup_coverage (
+    user_id TEXT NOT NULL,
+    first_day TEXT NOT NULL,
+    last_day TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS sleep_rollup_coverage_user ON sleep_rollup_coverage (user_id);
+"""
+
+
+def period_start(day: date, resolution: str) -> date:
+    """Get the first day of the period of a resolution containing a date."""
+    if resolution == 'week':
+        return day - timedelta(days=day.weekday())
+    if resolution == 'month':
+        return month_start(day)
+    return day
+
+
+def period_end(day: date, resolution: str) -> date:
+    """Get the last day of the period of a resolution containing a date."""
+    if resolution == 'week':
+        return period_start(day, resolution) + timedelta(days=6)
+    if resolution == 'month':
+        return month_end(day)
+    return day
+
+
+def choose_resolution(days: int, max_points: int) -> str:
+    """
+    Choose the finest resolution that charts a window in at most max_points points.
+
+    Args:
+        days: Window length in days
+        max_points: Maximum number of points per series
+
+    Returns:
+        'day', 'week' or 'month'
+    """
+    if days + 1 <= max_points:
+        return 'day'
+    if days // 7 + 1 <= max_points:
+        return 'week'
+    return 'month'
+
+
+def _record_measures(record: Dict[str, Any]) -> Dict[str, Optional[float]]:
+    """Extract the aggregated measures of a sleep record."""
+    phases = record.get('sleep_phases') or {}
+    heart_rate = record.get('heart_rate') or {}
+    return {
+        'duration': record.get('duration_minutes'),
+        'quality': record.get('sleep_quality'),
+        'deep_sleep': phases.get('deep_sleep_minutes'),
+        'rem_sleep': phases.get('rem_sleep_minutes'),
+        'light_sleep': phases.get('light_sleep_minutes'),
+        'heart_rate': heart_rate.get('average')
+    }
+
+
+def _empty_row(period: str) -> Dict[str, Any]:
+    """Create a rollup row with no records."""
+    row: Dict[str, Any] = dict.fromkeys(_COLUMNS, 0)
+    row['period'] = period
+    return row
+
+
+def _average(row: Dict[str, Any], measure: str) -> Optional[float]:
+    """Get the average of a measure in a rollup row, or None without values."""
+    count = row[f'{measure}_count']
+    return row[f'{measure}_sum'] / count if count else None
+
+
+def rollup_averages(row: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Get the per-night averages of a rollup row.
+
+    Args:
+        row: Rollup row
+
+    Returns:
+        Dictionary with the period, number of records and average measures
+        (None where no values were available)
+    """
+    return {
+        'period': row['period'],
+        'records': row['records'],
+        'duration_minutes': _average(row, 'duration'),
+        'sleep_quality': _average(row, 'quality'),
+        'deep_sleep_minutes': _average(row, 'deep_sleep'),
+        'rem_sleep_minutes': _average(row, 'rem_sleep'),
+        'light_sleep_minutes': _average(row, 'light_sleep'),
+        'heart_rate_avg': _average(row, 'heart_rate')
+    }
+
+
+def rollup_chart_data(rows: List[Dict[str, Any]], resolution: str) -> Dict[str, Any]:
+    """
+    Build the chart payload from rollup rows, one entry per period.
+
+    Args:
+        rows: Rollup rows in period order
+        resolution: Resolution of the rows
+
+    Returns:
+        Dictionary of chart series in the format of SleepRecordBatch.to_chart_data,
+        plus the resolution
+    """
+    averages = [rollup_averages(row) for row in rows]
+
+    def percentage(row: Dict[str, Any], key: str) -> Optional[float]:
+        minutes, duration = row[key], row['duration_minutes']
+        return minutes * 100 / duration if minutes and duration else None
+
+    return {
+        'dates': [row['period'] for row in averages],
+        'sleep_quality': [row['sleep_quality'] for row in averages],
+        'duration_hours': [(row['duration_minutes'] or 0.0) / 60 for row in averages],
+        'deep_sleep_percentage': [percentage(row, 'deep_sleep_minutes') for row in averages],
+        'rem_sleep_percentage': [percentage(row, 'rem_sleep_minutes') for row in averages],
+        'light_sleep_percentage': [percentage(row, 'light_sleep_minutes') for row in averages],
+        'heart_rate_avg': [row['heart_rate_avg'] for row in averages],
+        'resolution': resolution
+    }
+
+
+class RollupStore:
+    """Thread-safe SQLite store of per-user sleep rollups."""
+
+    def __init__(self, path: str):
+        """
+        Initialize the store, creating the database if needed.
+
+        Args:
+            path: Path of the SQLite database file
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.executescript(_SCHEMA)
+        self._lock = threading.Lock()
+
+    def ingest(self, user_id: str, records: List[Dict[str, Any]], covered: DateRange) -> None:
+        """
+        Replace the rollups of a fetched date range.
+
+        Args:
+            user_id: User identifier
+            records: Sleep records of the range, with at least RECORD_FIELDS
+            covered: Date range the records completely cover
+        """
+        first, last = covered
+
+        daily: Dict[str, Dict[str, Any]] = {}
+        for record in records:
+            day = record_day(record)
+            if not first.isoformat() <= day <= last.isoformat():
+                continue
+
+            row = daily.setdefault(day, _empty_row(day))
+            row['records'] += 1
+            for measure, value in _record_measures(record).items():
+                if value is not None:
+                    row[f'{measure}_count'] += 1
+                    row[f'{measure}_sum'] += value
+
+        columns = ', '.join(_COLUMNS)
+        placeholders = ', '.join('?' * len(_COLUMNS))
+        sums = ', '.join(f'SUM({column})' for column in _COLUMNS)
+
+        with self._lock, self._conn:
+            self._conn.execute(
+                "DELETE FROM sleep_rollups WHERE user_id = ? AND resolution = 'day' "
+                "AND period BETWEEN ? AND ?",
+                (user_id, first.isoformat(), last.isoformat())
+            )
+            self._conn.executemany(
+                f"INSERT INTO sleep_rollups (user_id, resolution, period, {columns}) "
+                f"VALUES (?, 'day', ?, {placeholders})",
+                [
+                    (user_id, day, *(row[column] for column in _COLUMNS))
+                    for day, row in daily.items()
+                ]
+            )
+
+            for resolution, period_sql in _PERIOD_SQL.items():
+                span = (
+                    period_start(first, resolution).isoformat(),
+                    period_end(last, resolution).isoformat()
+                )
+                self._conn.execute(
+                    "DELETE FROM sleep_rollups WHERE user_id = ? AND resolution = ? "
+                    "AND period BETWEEN ? AND ?",
+                    (user_id, resolution) + span
+                )
+                self._conn.execute(
+                    f"INSERT INTO sleep_rollups (user_id, resolution, period, {columns}) "
+                    f"SELECT user_id, ?, {period_sql} AS bucket, {sums} FROM sleep_rollups "
+                    f"WHERE user_id = ? AND resolution = 'day' AND period BETWEEN ? AND ? "
+                    f"GROUP BY bucket",
+                    (resolution, user_id) + span
+                )
+
+            coverage = merge_ranges(self._coverage(user_id) + [covered])
+            self._conn.execute("DELETE FROM sleep_rollup_coverage WHERE user_id = ?", (user_id,))
+            self._conn.executemany(
+                "INSERT INTO sleep_rollup_coverage (user_id, first_day, last_day) VALUES (?, ?, ?)",
+                [(user_id, start.isoformat(), end.isoformat()) for start, end in coverage]
+            )
+
+    def invalidate_user(self, user_id: str) -> None:
+        """
+        Drop the rollups and coverage of a user, e.g. after their records changed upstream.
+
+        Args:
+            user_id: User identifier
+        """
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM sleep_rollups WHERE user_id = ?", (user_id,))
+            self._conn.execute("DELETE FROM sleep_rollup_coverage WHERE user_id = ?", (user_id,))
+
+    def covers(self, user_id: str, first: date, last: date) -> bool:
+        """
+        Check whether a window has been fully ingested.
+
+        Args:
+            user_id: User identifier
+            first: First day of the window
+            last: Last day of the window
+
+        Returns:
+            Whether get_series can answer the window
+        """
+        with self._lock:
+            return any(start <= first and last <= end for start, end in self._coverage(user_id))
+
+    def get_series(
+        self,
+        user_id: str,
+        first: date,
+        last: date,
+        resolution: str
+    ) -> Optional[List[Dict[str, Any]]]:
+        """
+        Get the rollups of a window at a resolution.
+
+        Periods fully inside the window are read from their precomputed rows;
+        partial periods at the window edges are summed from day rows, so the
+        result covers exactly the window.
+
+        Args:
+            user_id: User identifier
+            first: First day of the window
+            last: Last day of the window
+            resolution: 'day', 'week' or 'month'
+
+        Returns:
+            Rollup rows in period order (periods without records are
+            omitted), or None if the window has not been fully ingested
+        """
+        with self._lock:
+            if not any(start <= first and last <= end for start, end in self._coverage(user_id)):
+                return None
+
+            if resolution == 'day':
+                return self._rows(user_id, 'day', first, last)
+
+            # Periods fully inside the window, and the partial ones at its edges
+            day = timedelta(days=1)
+            inner_first = first if period_start(first, resolution) == first else period_end(first, resolution) + day
+            inner_last = last if period_end(last, resolution) == last else period_start(last, resolution) - day
+
+            rows = []
+            if inner_first <= inner_last:
+                rows = self._rows(user_id, resolution, inner_first, period_start(inner_last, resolution))
+
+            edges = []
+            if inner_first > first:
+                edges.append((first, min(inner_first - day, last)))
+            if inner_last < last:
+                edges.append((max(inner_last + day, first), last))
+
+            for edge_first, edge_last in dict.fromkeys(edges):
+                day_rows = self._rows(user_id, 'day', edge_first, edge_last)
+                if not day_rows:
+                    continue
+
+                row = _empty_row(period_start(edge_first, resolution).isoformat())
+                for day_row in day_rows:
+                    for column in _COLUMNS:
+                        row[column] += day_row[column]
+                rows.append(row)
+
+        rows.sort(key=lambda row: row['period'])
+        return rows
+
+    def _rows(self, user_id: str, resolution: str, first: date, last: date) -> List[Dict[str, Any]]:
+        """Read the rows of a resolution with periods starting in a range. Caller must hold the lock."""
+        cursor = self._conn.execute(
+            f"SELECT period, {', '.join(_COLUMNS)} FROM sleep_rollups "
+            f"WHERE user_id = ? AND resolution = ? AND period BETWEEN ? AND ? ORDER BY period",
+            (user_id, resolution, first.isoformat(), last.isoformat())
+        )
+        return [dict(row) for row in cursor]
+
+    def _coverage(self, user_id: str) -> List[DateRange]:
+        """Read the ingested date ranges of a user. Caller must hold the lock."""
+        cursor = self._conn.execute(
+            "SELECT first_day, last_day FROM sleep_rollup_coverage WHERE user_id = ?",
+            (user_id,)
+        )
+        return [
+            (date.fromisoformat(row['first_day']), date.fromisoformat(row['last_day']))
+            for row in cursor
+        ]
+
+
+_rollup_store: Optional[RollupStore] = None
+_rollup_store_lock = threading.Lock()
+
+
+def get_rollup_store(config: Mapping[str, Any]) -> RollupStore:
+    """
+    Get the process-wide rollup store, creating it on first use.
+
+    Args:
+        config: Flask application config
+
+    Returns:
+        Shared rollup store
+    """
+    global _rollup_store
+
+    if _rollup_store is None:
+        with _rollup_store_lock:
+            if _rollup_store is None:
+                _rollup_store = RollupStore(config['SLEEP_ROLLUP_DB_PATH'])
+
+    return _rollup_store
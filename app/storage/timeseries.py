@@ -0,0 +1,257 @@
+"""
+Memory-mapped on-disk cache of nightly sleep time series.
+
+Each record's time series is stored as one fixed-dtype .npy file per column.
+Columns are opened with mmap, so worker processes share their pages through
+the OS page cache and slices are views rather than copies.
+
+Every save writes a new version directory next to the record's current one
+and then atomically replaces the record's pointer file, so readers see
+either the old or the new series, never a missing or partial one. The store
+is bounded in bytes; the least recently saved records are evicted first.
+"""
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from typing import Any, List, Mapping, Optional, Tuple
+from urllib.parse import quote
+
+import numpy as np
+
+from app.models.sleep_data import SleepTimeSeries
+
+# Array columns of a time series and their on-disk dtypes
+COLUMNS = {
+    'timestamps': np.dtype('datetime64[us]'),
+    'stage_codes': np.dtype(np.int8),
+    'heart_rate': np.dtype(np.float32),
+    'movement': np.dtype(np.float32),
+    'respiration_rate': np.dtype(np.float32)
+}
+
+# File holding the stage names that stage codes refer to
+_LABELS_FILE = 'stage_labels.json'
+
+# File in a record's directory naming its current version directory
+_CURRENT_FILE = 'CURRENT'
+
+# Number of locks serializing saves, shared by records hashing to the same one
+_SAVE_LOCKS = 64
+
+
+def _directory_size(path: str) -> int:
+    """Get the total size of the files below a directory in bytes."""
+    total = 0
+    for directory, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(directory, name))
+            except OSError:
+                pass
+    return total
+
+
+class TimeSeriesStore:
+    """Per-user, per-record store of time series column files, bounded in bytes."""
+
+    def __init__(self, root: str, max_bytes: int):
+        """
+        Initialize the store.
+
+        Args:
+            root: Directory to keep the column files in
+            max_bytes: Maximum size of all stored column files in bytes
+        """
+        self.root = root
+        self.max_bytes = max_bytes
+        os.makedirs(root, exist_ok=True)
+
+        self._save_locks = [threading.Lock() for _ in range(_SAVE_LOCKS)]
+        self._evict_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self._written = 0
+
+        self.evictions = 0
+
+    def _path(self, user_id: str, record_id: str) -> str:
+        """Get the directory of a record's versions."""
+        return os.path.join(self.root, quote(str(user_id), safe=''), quote(str(record_id), safe=''))
+
+    def load(self, user_id: str, record_id: str) -> Optional[SleepTimeSeries]:
+        """
+        Open a stored time series.
+
+        Args:
+            user_id: User identifier
+            record_id: Record identifier
+
+        Returns:
+            Time series backed by read-only memory maps, or None if not stored
+        """
+        path = self._path(user_id, record_id)
+
+        # A save may replace and remove the version between reading the
+        # pointer and opening its files; the new version is then opened
+        for _ in range(2):
+            try:
+                with open(os.path.join(path, _CURRENT_FILE)) as f:
+                    version = os.path.join(path, f.read().strip())
+            except OSError:
+                return None
+
+            try:
+                with open(os.path.join(version, _LABELS_FILE)) as f:
+                    labels = tuple(json.load(f))
+                columns = {
+                    name: np.load(os.path.join(version, f'{name}.npy'), mmap_mode='r')
+                    for name in COLUMNS
+                }
+            except (OSError, ValueError):
+                continue
+
+            return SleepTimeSeries.from_arrays(stage_labels=labels, **columns)
+
+        return None
+
+    def save(self, user_id: str, record_id: str, series: SleepTimeSeries) -> SleepTimeSeries:
+        """
+        Store a time series, replacing any stored version.
+
+        Columns are written to a new version directory, which then replaces
+        the current one by atomically rewriting the record's pointer file.
+        If writing fails, e.g. because the disk is full, the series is
+        returned unstored.
+
+        Args:
+            user_id: User identifier
+            record_id: Record identifier
+            series: Time series to store
+
+        Returns:
+            The stored time series, backed by memory maps
+        """
+        path = self._path(user_id, record_id)
+        written = 0
+
+        with self._save_locks[hash((user_id, record_id)) % _SAVE_LOCKS]:
+            version = None
+            try:
+                os.makedirs(path, exist_ok=True)
+                version = tempfile.mkdtemp(dir=path, prefix='v-')
+                for name, dtype in COLUMNS.items():
+                    column = np.asarray(getattr(series, name), dtype=dtype)
+                    np.save(os.path.join(version, f'{name}.npy'), column)
+                    written += column.nbytes
+                with open(os.path.join(version, _LABELS_FILE), 'w') as f:
+                    json.dump(list(series.stage_labels), f)
+
+                try:
+                    with open(os.path.join(path, _CURRENT_FILE)) as f:
+                        previous = f.read().strip()
+                except OSError:
+                    previous = None
+
+                descriptor, pointer = tempfile.mkstemp(dir=path, prefix='.tmp-')
+                with os.fdopen(descriptor, 'w') as f:
+                    f.write(os.path.basename(version))
+                os.replace(pointer, os.path.join(path, _CURRENT_FILE))
+            except OSError:
+                # Disk full, or the record was evicted meanwhile; serve the series unstored
+                if version is not None:
+                    shutil.rmtree(version, ignore_errors=True)
+                return series
+            except Exception:
+                if version is not None:
+                    shutil.rmtree(version, ignore_errors=True)
+                raise
+
+            if previous:
+                shutil.rmtree(os.path.join(path, previous), ignore_errors=True)
+
+        with self._lock:
+            self._written += written
+            evict = self._written * 10 >= self.max_bytes
+            if evict:
+                self._written = 0
+        if evict:
+            self.evict()
+
+        return self.load(user_id, record_id) or series
+
+    def invalidate_user(self, user_id: str) -> None:
+        """
+        Remove all stored time series of a user, e.g. after their records changed upstream.
+
+        Args:
+            user_id: User identifier
+        """
+        shutil.rmtree(os.path.join(self.root, quote(str(user_id), safe='')), ignore_errors=True)
+
+    def evict(self) -> int:
+        """
+        Remove the least recently saved records until the store fits max_bytes.
+
+        Runs after every tenth of max_bytes saved by this process. The
+        directory is scanned, so records saved by other processes count too.
+
+        Returns:
+            Number of removed records
+        """
+        if not self._evict_lock.acquire(blocking=False):
+            return 0
+
+        try:
+            records: List[Tuple[float, int, str]] = []
+            for user in os.scandir(self.root):
+                if not user.is_dir():
+                    continue
+                for record in os.scandir(user.path):
+                    # Records being saved for the first time have no pointer yet
+                    try:
+                        saved_at = os.stat(os.path.join(record.path, _CURRENT_FILE)).st_mtime
+                    except OSError:
+                        saved_at = time.time()
+                    records.append((saved_at, _directory_size(record.path), record.path))
+
+            total = sum(size for _, size, _ in records)
+            removed = 0
+            for _, size, path in sorted(records):
+                if total <= self.max_bytes:
+                    break
+                shutil.rmtree(path, ignore_errors=True)
+                total -= size
+                removed += 1
+
+            self.evictions += removed
+            return removed
+        finally:
+            self._evict_lock.release()
+
+
+_time_series_store: Optional[TimeSeriesStore] = None
+_time_series_store_lock = threading.Lock()
+
+
+def get_time_series_store(config: Mapping[str, Any]) -> TimeSeriesStore:
+    """
+    Get the process-wide time series store, creating it on first use.
+
+    Args:
+        config: Flask application config
+
+    Returns:
+        Shared time series store
+    """
+    global _time_series_store
+
+    if _time_series_store is None:
+        with _time_series_store_lock:
+            if _time_series_store is None:
+                _time_series_store = TimeSeriesStore(
+                    config['SLEEP_TIME_SERIES_DIR'], config['SLEEP_TIME_SERIES_MAX_BYTES']
+                )
+
+    return _time_series_store
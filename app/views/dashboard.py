@@ -1,16 +1,413 @@
 """
 Dashboard routes for the Sleep Data Visualization application.
 """
+import hashlib
 import json
-from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Any
+from datetime import date, datetime, time, timedelta
+from itertools import chain
+from typing import Callable, Dict, List, Optional, Any, Sequence, Tuple
 
-from flask import Blueprint, render_template, request, flash, redirect, url_for, current_app, jsonify
+from flask import (
+    Blueprint, render_template, request, flash, redirect, url_for, current_app, jsonify, Response,
+    stream_with_context
+)
+from werkzeug.utils import secure_filename
 
+from app.analytics.architecture import records_architecture, summarize_architecture
+from app.analytics.downsample import DOWNSAMPLING_METHODS, time_series_chart_data
+from app.analytics.incremental import get_analytics_store
+from app.analytics.rolling import records_night_features, rolling_statistics
 from app.api.client import SleepApiClient
+from app.api.directory import get_user_directory, search_users
 from app.models.sleep_data import SleepRecord, SleepAnalytics
+from app.models.sleep_batch import SleepRecordBatch
+from app.storage.record_tables import SORT_COLUMNS, RecordTable, get_record_table_store
+from app.storage.rollups import choose_resolution, get_rollup_store, rollup_averages, rollup_chart_data
+from app.storage.timeseries import get_time_series_store
+from app.views.delta import get_chart_digest_cache, versioned_chart_data
+from app.views.encoding import chart_response, compress_response
+from app.views.export import EXPORT_FORMATS, buffered, export_lines
+from app.views.fragments import cached_fragments, get_fragment_cache
 
 dashboard_bp = Blueprint('dashboard', __name__, url_prefix='/dashboard')
+dashboard_bp.after_request(compress_response)
+
+# Partial templates of the dashboard pages, cached as rendered HTML
+VIEW_FRAGMENTS = {
+    'summary_cards': 'dashboard/_summary_cards.html',
+    'insights': 'dashboard/_insights.html'
+}
+ANALYTICS_FRAGMENTS = {
+    'summary': 'dashboard/_analytics_summary.html',
+    'breakdown': 'dashboard/_analytics_breakdown.html'
+}
+
+
+def _with_validators(response: Response, version: Tuple[str, datetime], *parts: Any) -> Response:
+    """
+    Add ETag and Last-Modified headers, answering matching conditional requests with 304.
+
+    Args:
+        response: Response to send
+        version: Content digest and modification time of the underlying data
+        *parts: Request parameters that also shape the response
+
+    Returns:
+        The response, or a 304 response if the client's copy is current
+    """
+    digest, modified = version
+    etag = hashlib.blake2b(repr((digest,) + parts).encode(), digest_size=16).hexdigest()
+    
+    # Weak, since compression may change the bytes of an unchanged response
+    response.set_etag(etag, weak=True)
+    response.last_modified = modified
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
+
+
+def _not_modified(version: Optional[Tuple[str, datetime]], *parts: Any) -> Optional[Response]:
+    """
+    Get a 304 response if the client's copy of cached data is current.
+
+    Args:
+        version: Content digest and modification time, or None if unknown
+        *parts: Request parameters that also shape the response
+
+    Returns:
+        A 304 response, or None if the response has to be built
+    """
+    if version is None:
+        return None
+    
+    response = _with_validators(current_app.response_class(), version, *parts)
+    return response if response.status_code == 304 else None
+
+
+def _data_version(
+    client: SleepApiClient,
+    user_id: str,
+    start_date: datetime,
+    end_date: datetime,
+    fields: Optional[Sequence[str]] = None,
+    records: bool = True
+) -> Optional[str]:
+    """
+    Get the version of the data shown for a dashboard window without calling upstream.
+
+    Local analytics, rollups and architecture are derived from the records,
+    so the version of the records covers them; upstream analytics have a
+    version of their own.
+
+    Args:
+        client: Sleep API client
+        user_id: User identifier
+        start_date: Start of the window
+        end_date: End of the window
+        fields: Record fields the page is built from, or None for full records
+        records: Whether the page shows anything derived from the records
+
+    Returns:
+        Digest of the data versions, or None if the data is not freshly cached
+    """
+    upstream = current_app.config['SLEEP_ANALYTICS_SOURCE'] == 'upstream'
+    
+    versions = []
+    if records or not upstream:
+        versions.append(client.sleep_data_version(user_id, start_date, end_date, fields))
+    if upstream:
+        versions.append(client.analytics_version(user_id, start_date, end_date))
+    
+    if None in versions:
+        return None
+    return ':'.join(digest for digest, _ in versions)
+
+
+def _load_analytics(
+    client: SleepApiClient,
+    user_id: str,
+    start_date: datetime,
+    end_date: datetime
+) -> SleepAnalytics:
+    """
+    Load the analytics of a dashboard window without its full records.
+
+    Upstream analytics are requested on their own. Otherwise standard
+    windows are answered from the running analytics store, and other
+    windows are computed from records fetched with SleepRecord.SUMMARY_FIELDS.
+
+    Args:
+        client: Sleep API client
+        user_id: User identifier
+        start_date: Start of the window
+        end_date: End of the window
+
+    Returns:
+        Sleep analytics of the window
+    """
+    if current_app.config['SLEEP_ANALYTICS_SOURCE'] == 'upstream':
+        return SleepAnalytics(client.get_sleep_analytics(
+            user_id=user_id,
+            start_date=start_date,
+            end_date=end_date
+        ))
+    
+    if current_app.config['SLEEP_ANALYTICS_INCREMENTAL']:
+        analytics = get_analytics_store(current_app.config).get_analytics(
+            user_id, start_date, end_date
+        )
+        if analytics is not None:
+            return SleepAnalytics(analytics)
+    
+    response = client.get_sleep_data(
+        user_id=user_id,
+        start_date=start_date,
+        end_date=end_date,
+        limit=None,
+        fields=SleepRecord.SUMMARY_FIELDS
+    )
+    sleep_records = SleepRecordBatch(response.get('records', []), fields=SleepRecord.SUMMARY_FIELDS)
+    return SleepAnalytics.from_records(sleep_records, user_id, start_date, end_date)
+
+
+def _load_records_and_analytics(
+    client: SleepApiClient,
+    user_id: str,
+    start_date: datetime,
+    end_date: datetime
+) -> Tuple[SleepRecordBatch, SleepAnalytics]:
+    """
+    Load the sleep records and analytics of a dashboard window.
+
+    Analytics are computed locally unless SLEEP_ANALYTICS_SOURCE is
+    'upstream', in which case both upstream calls are issued in parallel.
+    Standard windows are answered from the running analytics store, other
+    windows from the fetched records.
+
+    Args:
+        client: Sleep API client
+        user_id: User identifier
+        start_date: Start of the window
+        end_date: End of the window
+
+    Returns:
+        Tuple of the sleep records and their analytics
+    """
+    def get_sleep_data():
+        return client.get_sleep_data(
+            user_id=user_id,
+            start_date=start_date,
+            end_date=end_date,
+            limit=None
+        )
+    
+    if current_app.config['SLEEP_ANALYTICS_SOURCE'] == 'upstream':
+        responses = client.fetch_concurrently({
+            'sleep_data': get_sleep_data,
+            'analytics': lambda: client.get_sleep_analytics(
+                user_id=user_id,
+                start_date=start_date,
+                end_date=end_date
+            )
+        })
+        sleep_records = SleepRecordBatch(responses['sleep_data'].get('records', []))
+        return sleep_records, SleepAnalytics(responses['analytics'])
+    
+    sleep_records = SleepRecordBatch(get_sleep_data().get('records', []))
+    
+    analytics = None
+    if current_app.config['SLEEP_ANALYTICS_INCREMENTAL']:
+        analytics = get_analytics_store(current_app.config).get_analytics(
+            user_id, start_date, end_date
+        )
+    
+    if analytics is not None:
+        sleep_analytics = SleepAnalytics(analytics)
+    else:
+        sleep_analytics = SleepAnalytics.from_records(sleep_records, user_id, start_date, end_date)
+    
+    return sleep_records, sleep_analytics
+
+
+def _load_rollups(
+    client: SleepApiClient,
+    user_id: str,
+    start_date: datetime,
+    end_date: datetime,
+    days: int
+) -> Tuple[str, Optional[List[Dict[str, Any]]]]:
+    """
+    Load the rollups of a window at the resolution it is charted at.
+
+    Args:
+        client: Sleep API client
+        user_id: User identifier
+        start_date: Start of the window
+        end_date: End of the window
+        days: Window length in days
+
+    Returns:
+        Tuple of the resolution and the rollup rows, which are None for
+        daily resolution or when rollups are unavailable
+    """
+    resolution = choose_resolution(days, current_app.config['SLEEP_ROLLUP_MAX_POINTS'])
+    if resolution == 'day' or not current_app.config['SLEEP_ROLLUPS_ENABLED']:
+        return resolution, None
+    
+    # Refresh expired or missing chunks of the window, which updates its rollups
+    client.get_sleep_data(
+        user_id=user_id,
+        start_date=start_date,
+        end_date=end_date,
+        limit=0,
+        fields=SleepRecordBatch.CHART_FIELDS
+    )
+    
+    rows = get_rollup_store(current_app.config).get_series(
+        user_id, start_date.date(), end_date.date(), resolution
+    )
+    return resolution, rows
+
+
+def _rollups_version(
+    client: SleepApiClient,
+    user_id: str,
+    start_date: datetime,
+    end_date: datetime,
+    days: int
+) -> Optional[str]:
+    """
+    Get the version of the rollups a window is broken down by without calling upstream.
+
+    Rollups are ingested from the chart field chunks, so the version of
+    those chunks covers them.
+
+    Args:
+        client: Sleep API client
+        user_id: User identifier
+        start_date: Start of the window
+        end_date: End of the window
+        days: Window length in days
+
+    Returns:
+        Digest of the chunk version, '' if the window has no rollup breakdown,
+        or None if unknown or the rollups do not cover the window yet
+    """
+    resolution = choose_resolution(days, current_app.config['SLEEP_ROLLUP_MAX_POINTS'])
+    if resolution == 'day' or not current_app.config['SLEEP_ROLLUPS_ENABLED']:
+        return ''
+    
+    version = client.sleep_data_version(user_id, start_date, end_date, SleepRecordBatch.CHART_FIELDS)
+    if version is None:
+        return None
+    if not get_rollup_store(current_app.config).covers(user_id, start_date.date(), end_date.date()):
+        return None
+    return version[0]
+
+
+def _load_record_table(
+    client: SleepApiClient,
+    user_id: str,
+    start_date: datetime,
+    end_date: datetime
+) -> Tuple[RecordTable, Optional[Tuple[str, datetime]]]:
+    """
+    Load the sorted record index of a window, rebuilding it only when its data changed.
+
+    Args:
+        client: Sleep API client
+        user_id: User identifier
+        start_date: Start of the window
+        end_date: End of the window
+
+    Returns:
+        Tuple of the record table and the version of its data, None if unknown
+    """
+    store = get_record_table_store(current_app.config)
+    window = (user_id, start_date.date(), end_date.date())
+    
+    version = client.sleep_data_version(user_id, start_date, end_date, SleepRecord.SUMMARY_FIELDS)
+    table = store.get(*window, version[0]) if version else None
+    if table is not None:
+        return table, version
+    
+    response = client.get_sleep_data(
+        user_id=user_id,
+        start_date=start_date,
+        end_date=end_date,
+        limit=None,
+        fields=SleepRecord.SUMMARY_FIELDS
+    )
+    table = RecordTable(response.get('records', []))
+    
+    version = client.sleep_data_version(user_id, start_date, end_date, SleepRecord.SUMMARY_FIELDS)
+    if version:
+        store.put(*window, version[0], table)
+    return table, version
+
+
+def _load_local_time_series(client: SleepApiClient, user_id: str, record: SleepRecord) -> bool:
+    """
+    Attach a record's time series if it is held locally, without calling upstream.
+
+    The series is taken from the memory-mapped cache, or from a cached
+    response holding the full record.
+
+    Args:
+        client: Sleep API client
+        user_id: User identifier
+        record: Sleep record whose time series was left out
+
+    Returns:
+        Whether the time series was attached
+    """
+    if current_app.config['SLEEP_TIME_SERIES_CACHE_ENABLED']:
+        series = get_time_series_store(current_app.config).load(user_id, record.record_id)
+        if series is not None:
+            record.time_series = series
+            return True
+    
+    full_record = client.get_cached_sleep_record(user_id, record.record_id)
+    if full_record is None:
+        return False
+    
+    record.time_series = SleepRecord(full_record).time_series
+    return True
+
+
+def _load_record(client: SleepApiClient, user_id: str, record_id: str) -> Optional[SleepRecord]:
+    """
+    Load a sleep record, with its time series from the memory-mapped cache.
+
+    A cached time series spares downloading and parsing it again; otherwise
+    the fetched time series is stored for later requests.
+
+    Args:
+        client: Sleep API client
+        user_id: User identifier
+        record_id: Record identifier
+
+    Returns:
+        The sleep record, or None if it does not exist
+    """
+    store = None
+    series = None
+    if current_app.config['SLEEP_TIME_SERIES_CACHE_ENABLED']:
+        store = get_time_series_store(current_app.config)
+        series = store.load(user_id, record_id)
+    
+    fields = SleepRecord.SUMMARY_FIELDS if series is not None else None
+    record = client.get_sleep_record(user_id, record_id, fields=fields)
+    if not record:
+        return None
+    
+    sleep_record = SleepRecord(record, fields)
+    if series is not None:
+        sleep_record.time_series = series
+    elif store is not None and len(sleep_record.time_series):
+        sleep_record.time_series = store.save(user_id, record_id, sleep_record.time_series)
+    
+    return sleep_record
 
 
 @dashboard_bp.route('/')
@@ -41,36 +438,27 @@ def view():
     start_date = end_date - timedelta(days=days)
     
     try:
-        # Get sleep data
         client = SleepApiClient()
-        sleep_data_response = client.get_sleep_data(
-            user_id=user_id,
-            start_date=start_date,
-            end_date=end_date,
-            limit=100
-        )
         
-        # Process sleep records
-        sleep_records = [
-            SleepRecord(record) for record in sleep_data_response.get('records', [])
-        ]
+        def load() -> Dict[str, Any]:
+            return {'sleep_analytics': _load_analytics(client, user_id, start_date, end_date)}
         
-        # Get analytics data
-        analytics_response = client.get_sleep_analytics(
-            user_id=user_id,
-            start_date=start_date,
-            end_date=end_date
+        # Summary cards and insights are only rendered when their data changed; the
+        # records table is a shell that loads its rows page by page from api_records
+        fragments = cached_fragments(
+            current_app.config, VIEW_FRAGMENTS, user_id, start_date, end_date,
+            lambda: _data_version(
+                client, user_id, start_date, end_date, SleepRecord.SUMMARY_FIELDS, records=False
+            ),
+            load
         )
         
-        sleep_analytics = SleepAnalytics(analytics_response)
-        
         return render_template(
             'dashboard/view.html',
             title=f'Sleep Dashboard - {user_id}',
             user_id=user_id,
             days=days,
-            sleep_records=sleep_records,
-            sleep_analytics=sleep_analytics,
+            fragments=fragments,
             start_date=start_date,
             end_date=end_date
         )
@@ -96,46 +484,135 @@ def api_sleep_data():
     
     try:
         client = SleepApiClient()
+        validator_parts = (
+            'sleep-data', user_id, start_date.date(), end_date.date(),
+            request.args.get('encoding'), request.args.get('since')
+        )
+        
+        # Revalidations of unchanged data are answered before the payload is
+        # built; clients holding an earlier version (?since=) only get the
+        # nights that changed
+        def respond(build: Callable[[], Dict[str, Any]], *parts: Any) -> Response:
+            version = client.sleep_data_version(
+                user_id, start_date, end_date, SleepRecordBatch.CHART_FIELDS
+            )
+            not_modified = _not_modified(version, *validator_parts, *parts)
+            if not_modified is not None:
+                return not_modified
+            
+            data = versioned_chart_data(current_app.config, user_id, build(), request.args.get('since'))
+            response = chart_response(data)
+            return _with_validators(response, version, *validator_parts, *parts) if version else response
+        
+        # Long windows are charted per week or month from the rollups
+        resolution, rollups = _load_rollups(client, user_id, start_date, end_date, days)
+        if rollups is not None:
+            return respond(lambda: rollup_chart_data(rollups, resolution))
+        
         sleep_data_response = client.get_sleep_data(
             user_id=user_id,
             start_date=start_date,
             end_date=end_date,
-            limit=100
+            limit=None,
+            fields=SleepRecordBatch.CHART_FIELDS
         )
         
-        # Process sleep records
-        sleep_records = [
-            SleepRecord(record).to_dict() 
-            for record in sleep_data_response.get('records', [])
+        sleep_records = SleepRecordBatch(
+            sleep_data_response.get('records', []),
+            fields=SleepRecordBatch.CHART_FIELDS
+        )
+        
+        # Nightly heart rate features need the time series, which the chart
+        # fields leave out; nights without cached features are computed from
+        # series already held locally, the others are charted without them
+        records = list(sleep_records)
+        features = records_night_features(current_app.config, user_id, records, complete=False)
+        local = [
+            record for record in records
+            if record.record_id not in features and _load_local_time_series(client, user_id, record)
         ]
+        if local:
+            features.update(records_night_features(current_app.config, user_id, local))
         
-        # Format data for charts
-        chart_data = {
-            'dates': [],
-            'sleep_quality': [],
-            'duration_hours': [],
-            'deep_sleep_percentage': [],
-            'rem_sleep_percentage': [],
-            'light_sleep_percentage': [],
-            'heart_rate_avg': [],
+        extra = {
+            name: [features.get(record.record_id, {}).get(feature) for record in records]
+            for name, feature in (
+                ('heart_rate_nadir', 'heart_rate_nadir'),
+                ('hrv_rmssd', 'hrv_rmssd'),
+                ('respiration_rate_avg', 'respiration_rate_mean')
+            )
         }
         
-        for record in sorted(sleep_records, key=lambda x: x['date']):
-            chart_data['dates'].append(record['date'])
-            chart_data['sleep_quality'].append(record.get('sleep_quality'))
-            chart_data['duration_hours'].append(record.get('duration_hours'))
-            
-            # Add sleep phases data if available
-            if 'sleep_phases' in record:
-                chart_data['deep_sleep_percentage'].append(record.get('deep_sleep_percentage'))
-                chart_data['rem_sleep_percentage'].append(record.get('rem_sleep_percentage'))
-                chart_data['light_sleep_percentage'].append(record.get('light_sleep_percentage'))
-            
-            # Add heart rate data if available
-            if 'heart_rate' in record:
-                chart_data['heart_rate_avg'].append(record.get('heart_rate', {}).get('average'))
+        # Features fill in as series are held locally while the chart fields
+        # stay unchanged, so their digest is part of the validators
+        features_digest = hashlib.blake2b(repr(extra).encode(), digest_size=16).hexdigest()
+        
+        # Format data for charts straight from the record columns
+        return respond(lambda: sleep_records.to_chart_data(extra=extra), features_digest)
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@dashboard_bp.route('/api/records')
+def api_records():
+    """API endpoint for a page of a user's sleep records, sorted and filtered."""
+    user_id = request.args.get('user_id')
+    if not user_id:
+        return jsonify({'error': 'User ID is required'}), 400
+    
+    try:
+        days = int(request.args.get('days', current_app.config['DEFAULT_DATE_RANGE_DAYS']))
+    except ValueError:
+        days = current_app.config['DEFAULT_DATE_RANGE_DAYS']
+    
+    sort = request.args.get('sort', 'date')
+    if sort not in SORT_COLUMNS:
+        return jsonify({'error': f"Unknown sort column: {sort}"}), 400
+    
+    order = request.args.get('order', 'desc')
+    if order not in ('asc', 'desc'):
+        return jsonify({'error': f"Unknown sort order: {order}"}), 400
+    
+    # Paging, and inclusive min_/max_ bounds per column (dates as YYYY-MM-DD, durations in hours)
+    try:
+        page = int(request.args.get('page', 1))
+        per_page = int(request.args.get('per_page', current_app.config['ITEMS_PER_PAGE']))
+        filters = {}
+        for column, parse in (('date', date.fromisoformat), ('quality', float), ('duration', float)):
+            bounds = tuple(
+                parse(request.args[f'{bound}_{column}']) if request.args.get(f'{bound}_{column}') else None
+                for bound in ('min', 'max')
+            )
+            if bounds != (None, None):
+                filters[column] = bounds
+    except ValueError as e:
+        return jsonify({'error': f"Invalid parameter: {str(e)}"}), 400
+    per_page = max(1, min(per_page, current_app.config['SLEEP_RECORD_TABLE_MAX_PER_PAGE']))
+    
+    end_date = datetime.now()
+    start_date = end_date - timedelta(days=days)
+    
+    try:
+        client = SleepApiClient()
         
-        return jsonify(chart_data)
+        validator_parts = ('records', start_date.date(), end_date.date()) + tuple(
+            sorted(request.args.items(multi=True))
+        )
+        not_modified = _not_modified(
+            client.sleep_data_version(user_id, start_date, end_date, SleepRecord.SUMMARY_FIELDS),
+            *validator_parts
+        )
+        if not_modified is not None:
+            return not_modified
+        
+        table, version = _load_record_table(client, user_id, start_date, end_date)
+        response = jsonify(dict(
+            table.page(page, per_page, sort, order == 'desc', filters),
+            sort=sort,
+            order=order
+        ))
+        return _with_validators(response, version, *validator_parts) if version else response
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -151,31 +628,24 @@ def view_record(record_id):
         return redirect(url_for('main.index'))
     
     try:
-        # Get sleep data for this user
+        # Get the record from the client's record index
         client = SleepApiClient()
-        sleep_data_response = client.get_sleep_data(
-            user_id=user_id,
-            limit=100
-        )
-        
-        # Find the specific record
-        record = next(
-            (r for r in sleep_data_response.get('records', []) if r.get('record_id') == record_id), 
-            None
-        )
+        sleep_record = _load_record(client, user_id, record_id)
         
-        if not record:
+        if not sleep_record:
             flash(f"Sleep record not found: {record_id}", 'danger')
             return redirect(url_for('dashboard.view', user_id=user_id))
         
-        # Process record
-        sleep_record = SleepRecord(record)
+        architecture = records_architecture(current_app.config, user_id, [sleep_record])
+        night_features = records_night_features(current_app.config, user_id, [sleep_record])
         
         return render_template(
             'dashboard/record.html',
             title=f'Sleep Record - {sleep_record.date}',
             user_id=user_id,
-            record=sleep_record
+            record=sleep_record,
+            architecture=architecture.get(sleep_record.record_id),
+            night_features=night_features.get(sleep_record.record_id)
         )
         
     except Exception as e:
@@ -183,6 +653,81 @@ def view_record(record_id):
         return redirect(url_for('dashboard.view', user_id=user_id))
 
 
+@dashboard_bp.route('/api/record/<record_id>/timeseries')
+def api_record_timeseries(record_id):
+    """API endpoint for a record's time series, downsampled for charts."""
+    user_id = request.args.get('user_id')
+    if not user_id:
+        return jsonify({'error': 'User ID is required'}), 400
+    
+    try:
+        points = int(request.args.get('points', current_app.config['SLEEP_TIME_SERIES_DEFAULT_POINTS']))
+    except ValueError:
+        points = current_app.config['SLEEP_TIME_SERIES_DEFAULT_POINTS']
+    points = max(3, min(points, current_app.config['SLEEP_TIME_SERIES_MAX_POINTS']))
+    
+    method = request.args.get('method', 'lttb')
+    if method not in DOWNSAMPLING_METHODS:
+        return jsonify({'error': f"Unknown downsampling method: {method}"}), 400
+    
+    # Optional viewport, as naive UTC timestamps
+    try:
+        viewport = [
+            datetime.fromisoformat(request.args[key]) if request.args.get(key) else None
+            for key in ('start', 'end')
+        ]
+    except ValueError as e:
+        return jsonify({'error': f"Invalid viewport: {str(e)}"}), 400
+    
+    try:
+        client = SleepApiClient()
+        sleep_record = _load_record(client, user_id, record_id)
+        
+        if not sleep_record:
+            return jsonify({'error': f"Sleep record not found: {record_id}"}), 404
+        
+        # Rolling statistics over the whole night, so windows at the viewport edges are complete
+        series = sleep_record.time_series
+        window = series.index_range(*viewport)
+        rolling = rolling_statistics(series, current_app.config['SLEEP_ROLLING_WINDOW_MINUTES'])
+        
+        chart_data = time_series_chart_data(
+            series.between(*viewport), points, method,
+            extra={f'rolling_{name}': values[window] for name, values in rolling.items()}
+        )
+        chart_data['record_id'] = record_id
+        chart_data['night_features'] = records_night_features(
+            current_app.config, user_id, [sleep_record]
+        ).get(record_id)
+        
+        return chart_response(chart_data)
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@dashboard_bp.route('/api/record/<record_id>/architecture')
+def api_record_architecture(record_id):
+    """API endpoint for a record's sleep architecture metrics and hypnogram."""
+    user_id = request.args.get('user_id')
+    if not user_id:
+        return jsonify({'error': 'User ID is required'}), 400
+    
+    try:
+        client = SleepApiClient()
+        sleep_record = _load_record(client, user_id, record_id)
+        
+        if not sleep_record:
+            return jsonify({'error': f"Sleep record not found: {record_id}"}), 404
+        
+        architecture = records_architecture(current_app.config, user_id, [sleep_record])
+        
+        return jsonify(architecture.get(record_id))
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
 @dashboard_bp.route('/analytics')
 def analytics():
     """View in-depth sleep analytics."""
@@ -205,51 +750,163 @@ def analytics():
     start_date = end_date - timedelta(days=days)
     
     try:
-        # Get analytics data
         client = SleepApiClient()
-        analytics_response = client.get_sleep_analytics(
-            user_id=user_id,
-            start_date=start_date,
-            end_date=end_date
-        )
         
-        sleep_analytics = SleepAnalytics(analytics_response)
+        def load() -> Dict[str, Any]:
+            sleep_records, sleep_analytics = _load_records_and_analytics(
+                client, user_id, start_date, end_date
+            )
+            resolution, rollups = _load_rollups(client, user_id, start_date, end_date, days)
+            
+            # Architecture of all nights with time series, computed in one batch
+            architecture = records_architecture(current_app.config, user_id, list(sleep_records))
+            
+            return {
+                'user_id': user_id,
+                'sleep_analytics': sleep_analytics,
+                'sleep_records': sleep_records,
+                'resolution': resolution,
+                'breakdown': [rollup_averages(row) for row in rollups] if rollups is not None else None,
+                'architecture': architecture,
+                'architecture_summary': summarize_architecture(list(architecture.values())),
+                'start_date': start_date,
+                'end_date': end_date
+            }
         
-        # Get sleep data for charts
-        sleep_data_response = client.get_sleep_data(
-            user_id=user_id,
-            start_date=start_date,
-            end_date=end_date,
-            limit=100
-        )
+        # The breakdown comes from the rollups, which are versioned separately;
+        # a page without a breakdown it should have is not cached
+        def version() -> Optional[str]:
+            versions = (
+                _data_version(client, user_id, start_date, end_date),
+                _rollups_version(client, user_id, start_date, end_date, days)
+            )
+            return None if None in versions else ':'.join(versions)
         
-        # Process sleep records
-        sleep_records = [
-            SleepRecord(record) for record in sleep_data_response.get('records', [])
-        ]
+        fragments = cached_fragments(
+            current_app.config, ANALYTICS_FRAGMENTS, user_id, start_date, end_date, version, load
+        )
         
         return render_template(
             'dashboard/analytics.html',
             title=f'Sleep Analytics - {user_id}',
             user_id=user_id,
             days=days,
-            sleep_analytics=sleep_analytics,
-            sleep_records=sleep_records,
-            start_date=start_date,
-            end_date=end_date
+            fragments=fragments
         )
         
     except Exception as e:
         flash(f"Error retrieving sleep analytics: {str(e)}", 'danger')
-        return redirect(url_for('main.index'))    
+        return redirect(url_for('main.index'))
+
+
+@dashboard_bp.route('/export')
+def export():
+    """Stream a user's sleep history as NDJSON or CSV."""
+    user_id = request.args.get('user_id')
+    if not user_id:
+        return jsonify({'error': 'User ID is required'}), 400
+    
+    export_format = request.args.get('format', 'ndjson')
+    if export_format not in EXPORT_FORMATS:
+        return jsonify({'error': f"Unknown export format: {export_format}"}), 400
+    
+    include_time_series = request.args.get('time_series', 'false').lower() == 'true'
+    
+    # Optional date range, as YYYY-MM-DD
+    try:
+        start_date, end_date = [
+            datetime.combine(date.fromisoformat(request.args[key]), day_time) if request.args.get(key) else None
+            for key, day_time in (('start', time.min), ('end', time.max))
+        ]
+    except ValueError as e:
+        return jsonify({'error': f"Invalid date: {str(e)}"}), 400
+    
+    try:
+        client = SleepApiClient()
+        records = client.iter_sleep_data(
+            user_id, start_date, end_date,
+            fields=None if include_time_series else SleepRecord.SUMMARY_FIELDS
+        )
+        
+        # Fetch the first page before responding, so upstream errors still get an error status
+        first = next(records, None)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+    
+    records = chain([first] if first is not None else [], records)
+    body = buffered(
+        export_lines(records, export_format, include_time_series),
+        current_app.config['SLEEP_EXPORT_CHUNK_BYTES']
+    )
+    
+    response = Response(stream_with_context(body), mimetype=EXPORT_FORMATS[export_format])
+    filename = secure_filename(f"sleep-{user_id}{'-time-series' if include_time_series else ''}.{export_format}")
+    response.headers['Content-Disposition'] = f'attachment; filename="{filename}"'
+    # Ask proxies not to buffer the stream
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+
 @dashboard_bp.route('/api/users')
 def api_get_users():
     """API endpoint to get users for dropdown selection."""
+    limit = 50  # Limit to a reasonable number for dropdown
+    return _users_response(request.args.get('q', ''), limit)
+
+
+@dashboard_bp.route('/api/users/search')
+def api_search_users():
+    """Typeahead endpoint returning the users best matching a query, with their record counts."""
+    try:
+        limit = int(request.args.get('limit', current_app.config['SLEEP_USER_SEARCH_LIMIT']))
+    except ValueError:
+        limit = current_app.config['SLEEP_USER_SEARCH_LIMIT']
+    limit = max(1, min(limit, current_app.config['SLEEP_USER_SEARCH_MAX_LIMIT']))
+    
+    return _users_response(request.args.get('q', ''), limit)
+
+
+def _users_response(query: str, limit: int) -> Response:
+    """
+    Build a JSON response listing users from the local user directory.
+
+    Until the directory's first background load completes, users are
+    matched within the first page of the upstream listing instead.
+
+    Args:
+        query: Search text; empty for the users with the most records
+        limit: Maximum number of users
+
+    Returns:
+        JSON list of users with their record counts, best matches first
+    """
     try:
-        # Get users using the API client
         client = SleepApiClient()
-        response = client.get_users(limit=50)  # Limit to a reasonable number for dropdown
+        directory = client.get_user_directory()
+        
+        if not directory.loaded:
+            first_page = client.get_users(limit=current_app.config['SLEEP_API_PAGE_SIZE'])
+            return jsonify(search_users(first_page.get('users', []), query, limit))
         
-        return jsonify(response.get('users', []))
+        validator_parts = ('users', query.strip().lower(), limit)
+        not_modified = _not_modified(directory.version(), *validator_parts)
+        if not_modified is not None:
+            return not_modified
+        
+        users = jsonify(directory.search(query, limit))
+        version = directory.version()
+        return _with_validators(users, version, *validator_parts) if version else users
     except Exception as e:
         return jsonify({'error': str(e)}), 500
+
+
+@dashboard_bp.route('/api/cache-stats')
+def api_cache_stats():
+    """API endpoint exposing upstream response, chart digest, rendered fragment, record table and user directory counters."""
+    client = SleepApiClient()
+    stats = client.cache_stats()
+    stats['chart_digests'] = get_chart_digest_cache(current_app.config).stats()
+    stats['fragments'] = get_fragment_cache(current_app.config).stats()
+    stats['record_tables'] = get_record_table_store(current_app.config).stats()
+    stats['user_directory'] = get_user_directory(current_app.config).stats()
+    return jsonify(stats)
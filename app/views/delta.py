@@ -0,0 +1,131 @@
+"""
+Incremental updates of nightly chart payloads.
+
+Every chart payload gets a version. The digest of each night's values is
+kept in a cache of its own under that version, so a browser holding an
+older version can be sent only the nights that were added or changed since,
+plus the dates that disappeared.
+"""
+import hashlib
+import threading
+from typing import Any, Dict, List, Mapping, Optional
+
+from app.api.cache import ResponseCache
+
+
+def _series_keys(chart_data: Dict[str, Any]) -> List[str]:
+    """Get the keys of the per-night series of a payload, parallel to its dates."""
+    count = len(chart_data['dates'])
+    return sorted(
+        key for key, values in chart_data.items()
+        if key != 'dates' and isinstance(values, list) and len(values) == count
+    )
+
+
+def night_digests(chart_data: Dict[str, Any]) -> Dict[str, str]:
+    """
+    Digest the values of every night of a chart payload.
+
+    Args:
+        chart_data: Payload with 'dates' and per-night series
+
+    Returns:
+        Digest of each night's values by date
+    """
+    keys = _series_keys(chart_data)
+    return {
+        day: hashlib.blake2b(
+            repr([chart_data[key][index] for key in keys]).encode(), digest_size=8
+        ).hexdigest()
+        for index, day in enumerate(chart_data['dates'])
+    }
+
+
+def chart_version(digests: Mapping[str, str]) -> str:
+    """Get the version of a payload from its night digests."""
+    return hashlib.blake2b(repr(sorted(digests.items())).encode(), digest_size=12).hexdigest()
+
+
+def chart_delta(chart_data: Dict[str, Any], previous: Mapping[str, str]) -> Dict[str, Any]:
+    """
+    Get the part of a chart payload that changed since an earlier version.
+
+    Args:
+        chart_data: Current payload
+        previous: Night digests of the earlier version
+
+    Returns:
+        Payload with only the added or changed nights, and the 'removed'
+        dates present in the earlier version but not in the current one
+    """
+    digests = night_digests(chart_data)
+    keys = _series_keys(chart_data)
+    changed = [
+        index for index, day in enumerate(chart_data['dates'])
+        if previous.get(day) != digests[day]
+    ]
+
+    delta = {key: value for key, value in chart_data.items() if key not in keys}
+    delta['dates'] = [chart_data['dates'][index] for index in changed]
+    for key in keys:
+        delta[key] = [chart_data[key][index] for index in changed]
+    delta['removed'] = sorted(day for day in previous if day not in digests)
+
+    return delta
+
+
+def versioned_chart_data(
+    config: Mapping[str, Any],
+    user_id: str,
+    chart_data: Dict[str, Any],
+    since: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    Version a chart payload, reducing it to a delta if the client holds an earlier version.
+
+    Args:
+        config: Flask application config
+        user_id: User identifier
+        chart_data: Current payload
+        since: Version the client holds, if any
+
+    Returns:
+        The payload or its delta, with its 'version' and whether it is a 'delta'
+    """
+    cache = get_chart_digest_cache(config)
+    digests = night_digests(chart_data)
+    version = chart_version(digests)
+    cache.set(('chart_nights', user_id, version), digests, config['SLEEP_CHART_DELTA_TTL'])
+
+    previous = cache.get(('chart_nights', user_id, since)) if since else None
+    if previous is None:
+        return dict(chart_data, version=version, delta=False)
+
+    return dict(chart_delta(chart_data, previous), version=version, delta=True)
+
+
+_chart_digest_cache: Optional[ResponseCache] = None
+_chart_digest_cache_lock = threading.Lock()
+
+
+def get_chart_digest_cache(config: Mapping[str, Any]) -> ResponseCache:
+    """
+    Get the process-wide cache of night digests by chart version, creating it on first use.
+
+    Args:
+        config: Flask application config
+
+    Returns:
+        Shared chart digest cache
+    """
+    global _chart_digest_cache
+
+    if _chart_digest_cache is None:
+        with _chart_digest_cache_lock:
+            if _chart_digest_cache is None:
+                _chart_digest_cache = ResponseCache(
+                    max_entries=config['SLEEP_CHART_DELTA_MAX_ENTRIES'],
+                    max_bytes=config['SLEEP_CHART_DELTA_MAX_BYTES']
+                )
+
+    return _chart_digest_cache
@@ -0,0 +1,187 @@
+"""
+Encoding of dashboard JSON responses.
+
+Chart payloads are mostly long numeric series. They are serialized with
+orjson when it is installed, optionally shipped as base64 typed arrays
+instead of decimal text, and compressed with brotli or gzip as negotiated
+through Accept-Encoding.
+"""
+import base64
+import gzip
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from flask import Response, current_app, request
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Value of the 'encoding' query parameter selecting typed-array payloads
+COMPACT_ENCODING = 'compact'
+
+# Response mimetypes worth compressing
+COMPRESSIBLE_MIMETYPES = frozenset(['application/json', 'application/x-ndjson', 'text/csv'])
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """JSON provider serializing with orjson when available."""
+
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        """
+        Serialize data as JSON.
+
+        Compact output goes through orjson, which also encodes NumPy arrays
+        and scalars and writes NaN as null; pretty-printed output and
+        unsupported options fall back to the standard encoder.
+
+        Args:
+            obj: Data to serialize
+            **kwargs: Options for json.dumps
+
+        Returns:
+            JSON text
+        """
+        if orjson is None or set(kwargs) - {'separators'}:
+            return super().dumps(obj, **kwargs)
+
+        option = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        return orjson.dumps(obj, default=self.default, option=option).decode()
+
+
+def typed_array(values: Any, dtype: str = 'float32', offset: float = 0) -> Dict[str, Any]:
+    """
+    Encode numbers as a base64 typed array.
+
+    Args:
+        values: Numbers, None where missing (float dtypes only)
+        dtype: 'float32', 'float64' or 'int32'
+        offset: Value to subtract before encoding; decoders add it back
+
+    Returns:
+        Dictionary with the dtype, the little-endian array bytes in base64
+        ('bdata') and the offset if not 0; missing values are NaN
+    """
+    array = (np.asarray(values, dtype=np.float64) - offset).astype(np.dtype(dtype).newbyteorder('<'))
+    encoded: Dict[str, Any] = {'dtype': dtype, 'bdata': base64.b64encode(array.tobytes()).decode('ascii')}
+    if offset:
+        encoded['offset'] = offset
+    return encoded
+
+
+def _is_numeric(values: List[Any]) -> bool:
+    """Check whether a list holds only numbers and None, with at least one number."""
+    numbers = [value for value in values if value is not None]
+    return bool(numbers) and len(numbers) == sum(
+        isinstance(value, (int, float)) and not isinstance(value, bool) for value in numbers
+    )
+
+
+def compact_chart_data(data: Any, key: Optional[str] = None) -> Any:
+    """
+    Replace the numeric series of a chart payload with typed arrays.
+
+    Numeric lists become float32 arrays. Timestamp lists under 'x' become
+    milliseconds since the epoch, for date axes, encoded as int32 offsets
+    from the first timestamp. Other values are kept as they are.
+
+    Args:
+        data: Chart payload
+        key: Key the payload is stored under in its parent, if any
+
+    Returns:
+        Payload with typed arrays
+    """
+    if isinstance(data, dict):
+        return {name: compact_chart_data(value, name) for name, value in data.items()}
+
+    if isinstance(data, list):
+        if _is_numeric(data):
+            return typed_array(data)
+        if key == 'x' and data and all(isinstance(value, str) for value in data):
+            milliseconds = np.array(data, dtype='datetime64[ms]').astype(np.int64)
+            return typed_array(milliseconds, 'int32', offset=int(milliseconds[0]))
+
+    return data
+
+
+def chart_response(data: Dict[str, Any]) -> Response:
+    """
+    Build a JSON response for a chart payload in the requested encoding.
+
+    Args:
+        data: Chart payload
+
+    Returns:
+        JSON response; numeric series are typed arrays if the request asks
+        for the compact encoding
+    """
+    if request.args.get('encoding') == COMPACT_ENCODING:
+        data = compact_chart_data(data)
+    return current_app.json.response(data)
+
+
+def _negotiate_encoding() -> Optional[str]:
+    """Choose 'br' or 'gzip' from the request's Accept-Encoding, or None."""
+    accepted = request.accept_encodings
+    gzip_quality = accepted['gzip']
+    brotli_quality = accepted['br'] if brotli is not None else 0
+
+    if brotli_quality and brotli_quality >= gzip_quality:
+        return 'br'
+    if gzip_quality:
+        return 'gzip'
+    return None
+
+
+def compress_response(response: Response) -> Response:
+    """
+    Compress a buffered response body as negotiated with the client.
+
+    Meant for after_request; streamed, small, already encoded and
+    non-compressible responses are passed through unchanged.
+
+    Args:
+        response: Response to send
+
+    Returns:
+        The response, compressed if applicable
+    """
+    config = current_app.config
+    if (
+        not config['SLEEP_COMPRESSION_ENABLED']
+        or response.mimetype not in COMPRESSIBLE_MIMETYPES
+        or response.direct_passthrough
+        or response.is_streamed
+        or response.status_code < 200
+        or response.status_code in (204, 304)
+        or 'Content-Encoding' in response.headers
+    ):
+        return response
+
+    response.vary.add('Accept-Encoding')
+
+    body = response.get_data()
+    if len(body) < config['SLEEP_COMPRESSION_MIN_BYTES']:
+        return response
+
+    encoding = _negotiate_encoding()
+    if encoding == 'br':
+        body = brotli.compress(body, quality=config['SLEEP_COMPRESSION_BROTLI_QUALITY'])
+    elif encoding == 'gzip':
+        body = gzip.compress(body, compresslevel=config['SLEEP_COMPRESSION_GZIP_LEVEL'], mtime=0)
+    else:
+        return response
+
+    response.set_data(body)
+    response.headers['Content-Encoding'] = encoding
+    return response
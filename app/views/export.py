@@ -0,0 +1,175 @@
+"""
+Streaming export of sleep records as NDJSON or CSV.
+
+Records flow through generators from the upstream pager to the response
+body, so memory use does not grow with the length of the history.
+"""
+import csv
+import io
+from typing import Any, Dict, Iterable, Iterator, List
+
+from flask import current_app
+
+EXPORT_FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv'
+}
+
+# Columns of the CSV export, one row per record
+SUMMARY_COLUMNS = (
+    'record_id', 'user_id', 'date', 'sleep_start', 'sleep_end', 'duration_minutes', 'sleep_quality',
+    'deep_sleep_minutes', 'rem_sleep_minutes', 'light_sleep_minutes', 'awake_minutes',
+    'heart_rate_average', 'heart_rate_min', 'heart_rate_max', 'heart_rate_resting'
+)
+
+# Columns of the CSV export with time series, one row per sample
+TIME_SERIES_COLUMNS = (
+    'record_id', 'date', 'timestamp', 'stage', 'heart_rate', 'movement', 'respiration_rate'
+)
+
+# First value of the row ending a CSV export that failed midway
+ERROR_MARKER = '#error'
+
+
+def _summary_row(record: Dict[str, Any]) -> List[Any]:
+    """Flatten a record into the values of SUMMARY_COLUMNS."""
+    phases = record.get('sleep_phases') or {}
+    heart_rate = record.get('heart_rate') or {}
+    return [
+        record.get('record_id'), record.get('user_id'), record.get('date'),
+        record.get('sleep_start'), record.get('sleep_end'),
+        record.get('duration_minutes'), record.get('sleep_quality'),
+        phases.get('deep_sleep_minutes'), phases.get('rem_sleep_minutes'),
+        phases.get('light_sleep_minutes'), phases.get('awake_minutes'),
+        heart_rate.get('average'), heart_rate.get('min'), heart_rate.get('max'), heart_rate.get('resting')
+    ]
+
+
+def _time_series_rows(record: Dict[str, Any]) -> Iterator[List[Any]]:
+    """Yield the values of TIME_SERIES_COLUMNS for every sample of a record."""
+    for point in record.get('time_series') or []:
+        yield [
+            record.get('record_id'), record.get('date'), point.get('timestamp'), point.get('stage'),
+            point.get('heart_rate'), point.get('movement'), point.get('respiration_rate')
+        ]
+
+
+def ndjson_lines(records: Iterable[Dict[str, Any]]) -> Iterator[str]:
+    """
+    Serialize records as newline-delimited JSON.
+
+    If reading the records fails midway, a final {"error": ...} line is
+    written so clients can tell a truncated export from a complete one.
+
+    Args:
+        records: Sleep records
+
+    Yields:
+        One JSON line per record
+    """
+    dumps = current_app.json.dumps
+    try:
+        for record in records:
+            yield dumps(record) + '\n'
+    except Exception as e:
+        current_app.logger.exception(f"Export failed: {str(e)}")
+        yield dumps({'error': str(e)}) + '\n'
+
+
+def csv_lines(records: Iterable[Dict[str, Any]], include_time_series: bool = False) -> Iterator[str]:
+    """
+    Serialize records as CSV with a header row.
+
+    If reading the records fails midway, a final ``#error,<message>`` row is
+    written so clients can tell a truncated export from a complete one, as
+    with the error line of ndjson_lines.
+
+    Args:
+        records: Sleep records
+        include_time_series: Whether to write one row per time series sample
+            instead of one row per record
+
+    Yields:
+        CSV lines
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    def flush() -> str:
+        text = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        return text
+
+    columns = TIME_SERIES_COLUMNS if include_time_series else SUMMARY_COLUMNS
+    writer.writerow(columns)
+    yield flush()
+
+    try:
+        for record in records:
+            if include_time_series:
+                writer.writerows(_time_series_rows(record))
+            else:
+                writer.writerow(_summary_row(record))
+            yield flush()
+    except Exception as e:
+        # The status line is already sent; the export ends with an error row
+        current_app.logger.exception(f"Export failed: {str(e)}")
+        writer.writerow([ERROR_MARKER, str(e)])
+        yield flush()
+
+
+def buffered(chunks: Iterable[str], size: int) -> Iterator[bytes]:
+    """
+    Combine small text chunks into larger encoded blocks.
+
+    The first chunk is passed through on its own so the response starts
+    immediately.
+
+    Args:
+        chunks: Text chunks
+        size: Minimum size of combined blocks in bytes
+
+    Yields:
+        UTF-8 encoded blocks
+    """
+    pending: List[bytes] = []
+    pending_size = 0
+    first = True
+
+    for chunk in chunks:
+        data = chunk.encode('utf-8')
+        if first:
+            first = False
+            yield data
+            continue
+
+        pending.append(data)
+        pending_size += len(data)
+        if pending_size >= size:
+            yield b''.join(pending)
+            pending, pending_size = [], 0
+
+    if pending:
+        yield b''.join(pending)
+
+
+def export_lines(
+    records: Iterable[Dict[str, Any]],
+    export_format: str,
+    include_time_series: bool = False
+) -> Iterator[str]:
+    """
+    Serialize records in an export format.
+
+    Args:
+        records: Sleep records
+        export_format: One of EXPORT_FORMATS
+        include_time_series: Whether records carry time series to export
+
+    Returns:
+        Iterator over text chunks of the export
+    """
+    if export_format == 'csv':
+        return csv_lines(records, include_time_series)
+    return ndjson_lines(records)
@@ -0,0 +1,113 @@
+"""
+Cache of rendered dashboard template fragments.
+
+The summary cards and breakdown tables of the dashboard pages are partial
+templates. Their HTML is cached per user, window and version of the
+underlying data, so repeat page views neither load the records nor loop
+over them in Jinja until the data changes.
+"""
+import threading
+from datetime import datetime
+from typing import Any, Callable, Dict, Hashable, Mapping, Optional
+
+from flask import render_template
+from markupsafe import Markup
+
+from app.api.cache import ResponseCache
+
+
+class FragmentCache(ResponseCache):
+    """Response cache of rendered HTML, keyed by (template, user id, start, end, data version)."""
+
+    def invalidate_user(self, user_id: str) -> int:
+        """
+        Drop the cached fragments of a user.
+
+        Args:
+            user_id: User identifier
+
+        Returns:
+            Number of removed fragments
+        """
+        return self.invalidate(lambda key: key[1] == user_id)
+
+
+def cached_fragments(
+    config: Mapping[str, Any],
+    templates: Mapping[str, str],
+    user_id: str,
+    start_date: datetime,
+    end_date: datetime,
+    version: Callable[[], Optional[Hashable]],
+    load: Callable[[], Dict[str, Any]]
+) -> Dict[str, Markup]:
+    """
+    Get rendered fragments of a dashboard window, rendering them only if not cached.
+
+    Fragments are only cached while the version of their data is known,
+    i.e. while that data is freshly cached itself.
+
+    Args:
+        config: Flask application config
+        templates: Partial template of each fragment by name
+        user_id: User identifier
+        start_date: Start of the window
+        end_date: End of the window
+        version: Returns the current version of the window's data, or None
+            if unknown; must not call upstream
+        load: Loads the context the templates are rendered with; only
+            called if any fragment is not cached
+
+    Returns:
+        Rendered HTML of each fragment by name
+    """
+    cache = get_fragment_cache(config)
+    window = (user_id, start_date.date(), end_date.date())
+
+    current = version()
+    if current is not None:
+        cached = {name: cache.get((template,) + window + (current,)) for name, template in templates.items()}
+        if None not in cached.values():
+            return {name: Markup(html) for name, html in cached.items()}
+
+    context = load()
+
+    # Loading may have fetched the data, making its version known
+    current = version()
+    ttl = config['SLEEP_FRAGMENT_CACHE_TTL']
+
+    fragments = {}
+    for name, template in templates.items():
+        html = render_template(template, **context)
+        if current is not None:
+            cache.set((template,) + window + (current,), html, ttl, size=len(html))
+        fragments[name] = Markup(html)
+
+    return fragments
+
+
+_fragment_cache: Optional[FragmentCache] = None
+_fragment_cache_lock = threading.Lock()
+
+
+def get_fragment_cache(config: Mapping[str, Any]) -> FragmentCache:
+    """
+    Get the process-wide cache of rendered fragments, creating it on first use.
+
+    Args:
+        config: Flask application config
+
+    Returns:
+        Shared fragment cache
+    """
+    global _fragment_cache
+
+    if _fragment_cache is None:
+        with _fragment_cache_lock:
+            if _fragment_cache is None:
+                _fragment_cache = FragmentCache(
+                    max_entries=config['SLEEP_FRAGMENT_CACHE_MAX_ENTRIES'],
+                    max_bytes=config['SLEEP_FRAGMENT_CACHE_MAX_BYTES']
+                )
+
+    return _fragment_cache